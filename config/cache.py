@@ -0,0 +1,42 @@
+"""
+Configurações de Cache
+======================
+Centraliza diretórios e prazos dos caches locais da aplicação.
+"""
+
+import os
+
+
+class ConfiguracaoCache:
+    """Classe para gerenciar configurações dos caches locais"""
+    
+    DIRETORIO_PADRAO = ".cache"
+    VARIAVEL_DIRETORIO = "FORMA_PRECO_CACHE_DIR"
+    
+    # Geocodificação: endereços mudam pouco, prazo longo
+    GEOCODE_TTL_SEGUNDOS = 90 * 24 * 3600
+    GEOCODE_MAX_ENTRADAS = 50000
+    
+    # Rotas (Distance Matrix): compartilhadas entre sessões do mesmo processo
+    ROTA_TTL_SEGUNDOS = 7 * 24 * 3600
+    ROTA_MAX_ENTRADAS = 20000
+    ROTA_CASAS_DECIMAIS = 4  # ~11 m de precisão na chave
+    
+    # Amostras de rota (km da API x linha reta): persistem para calibrar o modo offline
+    AMOSTRAS_ROTA_MAX_ENTRADAS = 20000
+    FATORES_RODOVIARIOS_TTL_SEGUNDOS = 60 * 60
+    
+    # Frete pré-calculado: intervalo mínimo entre atualizações em segundo plano
+    FRETE_PRECALCULADO_INTERVALO_SEGUNDOS = 10 * 60
+    
+    @classmethod
+    def obter_diretorio(cls) -> str:
+        """Retorna (e cria, se necessário) o diretório dos caches locais"""
+        diretorio = os.getenv(cls.VARIAVEL_DIRETORIO) or cls.DIRETORIO_PADRAO
+        os.makedirs(diretorio, exist_ok=True)
+        return diretorio
+    
+    @classmethod
+    def caminho_arquivo(cls, nome_arquivo: str) -> str:
+        """Retorna o caminho completo de um arquivo dentro do diretório de cache"""
+        return os.path.join(cls.obter_diretorio(), nome_arquivo)
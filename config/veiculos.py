@@ -0,0 +1,49 @@
+"""
+Configurações de Veículos
+=========================
+Catálogo dos tipos de veículo com capacidades (caixas, pallets, kg e m³) e
+custo relativo à tarifa de referência da tabela de fretes.
+"""
+
+from typing import Dict, List, Optional
+
+
+class ConfiguracaoVeiculos:
+    """Classe para gerenciar o catálogo de veículos"""
+    
+    # tarifa: coluna da tabela de fretes usada como referência (truck = TBL_TRCK, carreta = TBL_CRRT)
+    # fator: custo da viagem em relação à tarifa de referência
+    CATALOGO = {
+        'vuc':     {'caixas': 180,  'pallets': 6,  'peso': 3000,  'volume': 16,  'tarifa': 'truck',   'fator': 0.45},
+        'toco':    {'caixas': 360,  'pallets': 12, 'peso': 6000,  'volume': 28,  'tarifa': 'truck',   'fator': 0.70},
+        'truck':   {'caixas': 870,  'pallets': 29, 'peso': 12000, 'volume': 36,  'tarifa': 'truck',   'fator': 1.00},
+        'carreta': {'caixas': 1740, 'pallets': 58, 'peso': 28000, 'volume': 76,  'tarifa': 'carreta', 'fator': 1.00},
+        'bitrem':  {'caixas': 2400, 'pallets': 80, 'peso': 37000, 'volume': 100, 'tarifa': 'carreta', 'fator': 1.35},
+    }
+    
+    # Tipos considerados pelo simulador: os que têm tarifa própria na tabela de fretes
+    TIPOS_PADRAO = ['truck', 'carreta']
+    
+    @classmethod
+    def obter_veiculo(cls, nome: str) -> Dict:
+        """Retorna as características de um tipo de veículo"""
+        try:
+            return cls.CATALOGO[nome]
+        except KeyError:
+            raise ValueError(f"Veículo desconhecido: {nome}") from None
+    
+    @classmethod
+    def listar_veiculos(cls, tipos: Optional[List[str]] = None) -> List[Dict]:
+        """Lista os veículos (com o nome) na ordem do catálogo ou na ordem informada"""
+        return [dict(cls.obter_veiculo(nome), nome=nome) for nome in (tipos or list(cls.CATALOGO))]
+    
+    @classmethod
+    def capacidades_caixas(cls, tipos: Optional[List[str]] = None) -> Dict[str, int]:
+        """Capacidade em caixas de cada tipo (padrão: os tipos com tarifa própria)"""
+        return {nome: cls.obter_veiculo(nome)['caixas'] for nome in (tipos or cls.TIPOS_PADRAO)}
+    
+    @classmethod
+    def custo_viagem(cls, nome: str, tarifas: Dict[str, float]) -> float:
+        """Custo de uma viagem a partir das tarifas de referência ({'truck': valor, 'carreta': valor})"""
+        veiculo = cls.obter_veiculo(nome)
+        return float(tarifas.get(veiculo['tarifa'], 0.0) or 0.0) * veiculo['fator']
@@ -0,0 +1,111 @@
+"""
+Recálculo Incremental
+=====================
+Compara o quadro do editor com o anterior e recalcula só as linhas alteradas.
+Os resultados por linha ficam memorizados pelo hash do conteúdo da linha:
+desfazer uma edição ou repetir valores já calculados não recalcula nada.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.calculation_service import CalculadoraResultados
+
+
+def hash_linhas(df: pd.DataFrame, colunas: Optional[List[str]] = None) -> np.ndarray:
+    """Hash (uint64) do conteúdo de cada linha nas colunas informadas, sem o índice"""
+    colunas = [c for c in (colunas if colunas is not None else df.columns) if c in df.columns]
+    if not colunas:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+
+
+def linhas_alteradas(anterior: Optional[pd.DataFrame], atual: pd.DataFrame,
+                     colunas: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Máscara das linhas de `atual` novas ou diferentes de `anterior` (linhas casadas
+    pelo índice). Sem quadro anterior, todas as linhas contam como alteradas.
+    """
+    if anterior is None or anterior.empty:
+        return np.ones(len(atual), dtype=bool)
+    hashes_anteriores = pd.Series(hash_linhas(anterior, colunas), index=anterior.index)
+    if not hashes_anteriores.index.is_unique:
+        return np.ones(len(atual), dtype=bool)
+    posicoes = hashes_anteriores.index.get_indexer(atual.index)
+    iguais = (posicoes >= 0) & (hashes_anteriores.to_numpy()[posicoes] == hash_linhas(atual, colunas))
+    return ~iguais
+
+
+class RecalculoIncremental:
+    """Resultados da CalculadoraResultados com memória por conteúdo de linha"""
+
+    MAX_ENTRADAS = 100000  # acima disso a memória recomeça com as linhas do último cálculo
+
+    def __init__(self, tipo_frete: str = "CIF", max_entradas: Optional[int] = None):
+        self.tipo_frete = tipo_frete
+        self.max_entradas = max_entradas or self.MAX_ENTRADAS
+        self.calculadora = CalculadoraResultados(tipo_frete)
+        # Colunas lidas pela calculadora: só elas entram no hash
+        self.colunas_entrada = (
+            ["Preço de Venda", "Quantidade", "Custo NET", "Custo Fixo", "IPI", "MVA",
+             "ICMS Interno Destino", "FCP"] + CalculadoraResultados.DESPESAS_PERCENTUAIS
+            + (["Frete Caixa"] if tipo_frete == "CIF" else [])
+        )
+        self._assinatura = None
+        self._chaves = pd.Index([], dtype=np.uint64)
+        self._valores = np.empty((0, len(CalculadoraResultados.COLUNAS_RESULTADO)))
+        self.estatisticas = {'calculos': 0, 'linhas_recalculadas': 0, 'linhas_reutilizadas': 0}
+
+    def calcular(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Mesmo resultado de calcular_resultados_dataframe(df), recalculando apenas as
+        linhas cujo conteúdo ainda não está na memória.
+        """
+        colunas = CalculadoraResultados.COLUNAS_RESULTADO
+        if df.empty or "Preço de Venda" not in df.columns or "Quantidade" not in df.columns:
+            return self.calculadora.calcular_resultados_dataframe(df)
+
+        # Mudou o conjunto de colunas ou seus tipos: a memória não vale mais
+        presentes = [c for c in self.colunas_entrada if c in df.columns]
+        assinatura = tuple((c, str(df[c].dtype)) for c in presentes)
+        if assinatura != self._assinatura:
+            self.limpar()
+            self._assinatura = assinatura
+
+        hashes = hash_linhas(df, presentes)
+        posicoes = self._chaves.get_indexer(hashes)
+        faltantes = posicoes < 0
+
+        if faltantes.any():
+            # Linhas repetidas entre as novas são calculadas uma única vez
+            novos, primeiras = np.unique(hashes[faltantes], return_index=True)
+            linhas_novas = df.iloc[np.flatnonzero(faltantes)[primeiras]]
+            calculados = self.calculadora.calcular_resultados_dataframe(linhas_novas)
+            self._memorizar(novos, calculados[colunas].to_numpy(dtype=float), hashes)
+            posicoes = self._chaves.get_indexer(hashes)
+
+        self.estatisticas['calculos'] += 1
+        self.estatisticas['linhas_recalculadas'] += int(faltantes.sum())
+        self.estatisticas['linhas_reutilizadas'] += int((~faltantes).sum())
+        return pd.DataFrame(self._valores[posicoes], index=df.index, columns=colunas)
+
+    def _memorizar(self, chaves: np.ndarray, valores: np.ndarray, hashes_atuais: np.ndarray) -> None:
+        """Acrescenta resultados à memória; no limite, mantém só as linhas do quadro atual"""
+        if len(self._chaves) + len(chaves) > self.max_entradas:
+            manter = self._chaves.isin(hashes_atuais)
+            self._chaves = self._chaves[manter]
+            self._valores = self._valores[manter]
+        self._chaves = self._chaves.append(pd.Index(chaves, dtype=np.uint64))
+        self._valores = np.vstack([self._valores, valores])
+
+    def limpar(self) -> None:
+        """Descarta os resultados memorizados"""
+        self._chaves = pd.Index([], dtype=np.uint64)
+        self._valores = np.empty((0, len(CalculadoraResultados.COLUNAS_RESULTADO)))
+
+    @property
+    def entradas(self) -> int:
+        """Quantidade de linhas memorizadas"""
+        return len(self._chaves)
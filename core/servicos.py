@@ -0,0 +1,179 @@
+"""
+Container de Serviços
+=====================
+Serviços e tabelas de referência construídos uma vez por processo e
+compartilhados entre as sessões. O estado de cada sessão continua no StateManager.
+As tabelas do banco vêm dos caches stale-while-revalidate do DatabaseService
+(único no processo); índice de fretes e LogisticsService são refeitos quando
+uma atualização em segundo plano entrega uma tabela nova.
+"""
+
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from services.database_service import DatabaseService
+from services.geolocation_service import GeolocationService
+from services.frete_precalculado_service import FretePrecalculadoService
+from services.planilha_service import PlanilhaCustosService
+from services.logistics_service import LogisticsService
+from utils.frete_utils import FreightTariffIndex
+from utils.data_utils import extrair_faixas_km_ordenadas
+
+# Importar streamlit apenas quando necessário para evitar problemas de import
+try:
+    import streamlit as st
+    HAS_STREAMLIT = True
+except ImportError:
+    HAS_STREAMLIT = False
+
+ARQUIVO_PLANILHA_PADRAO = "Custo de reposição.xlsx"
+
+
+def _construir_db_service() -> DatabaseService:
+    """Serviço de banco do processo: os caches SWR das consultas vivem nele"""
+    return DatabaseService(DatabaseService.get_default_connection_string())
+
+
+if HAS_STREAMLIT:
+    # Sem prazo: quem atualiza as tabelas são os caches SWR, não a reconstrução do serviço
+    _construir_db_service = st.cache_resource(show_spinner=False)(_construir_db_service)
+
+_DB_SERVICE_LOCAL: Optional[DatabaseService] = None
+
+
+def obter_db_service() -> DatabaseService:
+    """Retorna o DatabaseService único do processo"""
+    global _DB_SERVICE_LOCAL
+    if HAS_STREAMLIT:
+        return _construir_db_service()
+    if _DB_SERVICE_LOCAL is None:
+        _DB_SERVICE_LOCAL = _construir_db_service()
+    return _DB_SERVICE_LOCAL
+
+
+class ContainerServicos:
+    """Serviços e tabelas pesadas (banco, geolocalização, fretes, custos e logística)"""
+    
+    def __init__(self, arquivo_planilha: str = ARQUIVO_PLANILHA_PADRAO,
+                 db_service: Optional[DatabaseService] = None):
+        self.arquivo_planilha = arquivo_planilha
+        # Mensagens da construção, exibidas pelo simulador a cada execução
+        self._mensagens: List[Tuple[str, str]] = []
+        
+        # Serviço de banco de dados (compartilhado pelo processo, sobrevive ao container)
+        self.db_service = db_service if db_service is not None else obter_db_service()
+        
+        # Tabelas de referência e estruturas derivadas (preenchidas em atualizar_referencias)
+        self._lock = threading.Lock()
+        self._tabela_frete_carregada = None
+        self._logistica_carregada = None
+        self._mensagens_frete: List[Tuple[str, str]] = []
+        self._mensagens_logistica: List[Tuple[str, str]] = []
+        self.df_logistica = pd.DataFrame()
+        self.logistics_service: Optional[LogisticsService] = None
+        self.tabela_frete = pd.DataFrame()
+        self.faixas_km_ordenadas: list = []
+        self.indice_frete = FreightTariffIndex(self.tabela_frete)
+        
+        # Serviço de geolocalização
+        api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+        self.geo_service = GeolocationService(api_key)
+        self.geo_service.pre_carregar_origens()
+        if not api_key:
+            self._mensagens.append(
+                ("info", "ℹ️ Google Maps API key não encontrada. Distâncias serão estimadas em modo offline.")
+            )
+        
+        # Planilha de custos e frete pré-calculado
+        self.planilha_service = PlanilhaCustosService()
+        self.frete_precalculado = FretePrecalculadoService(self.geo_service)
+        self.df_padrao = self._carregar_planilha()
+        
+        self.atualizar_referencias()
+    
+    @property
+    def mensagens(self) -> List[Tuple[str, str]]:
+        """Mensagens da construção e da última carga das tabelas de referência"""
+        return self._mensagens + self._mensagens_logistica + self._mensagens_frete
+    
+    def atualizar_referencias(self) -> None:
+        """
+        Lê as tabelas de referência dos caches SWR (chamado a cada execução) e refaz
+        as estruturas derivadas só quando o cache entregou um objeto novo.
+        """
+        with self._lock:
+            # Dados logísticos de capacidade de produtos
+            df_logistica = self.db_service.carregar_produtos_truck_carreta()
+            if df_logistica is not self._logistica_carregada:
+                self._logistica_carregada = df_logistica
+                self.df_logistica = df_logistica if not df_logistica.empty else pd.DataFrame()
+                self.logistics_service = None if self.df_logistica.empty else LogisticsService(self.df_logistica)
+                self._mensagens_logistica = (
+                    [("info", "ℹ️ Dados logísticos não encontrados ou vazios.")] if self.df_logistica.empty else []
+                )
+            
+            # Tabela de fretes (TRANSP_TARGET), faixas e índice para as consultas por IBGE/faixa
+            tabela_frete = self.db_service.carregar_tabela_frete()
+            if tabela_frete is not self._tabela_frete_carregada:
+                self._tabela_frete_carregada = tabela_frete
+                self.tabela_frete = tabela_frete
+                self.faixas_km_ordenadas = (
+                    extrair_faixas_km_ordenadas(tabela_frete) if not tabela_frete.empty else []
+                )
+                self.indice_frete = FreightTariffIndex(tabela_frete)
+                self._mensagens_frete = (
+                    [("success", f"✅ {len(self.faixas_km_ordenadas)} faixas de frete carregadas!")]
+                    if self.faixas_km_ordenadas else []
+                )
+    
+    def _carregar_planilha(self) -> pd.DataFrame:
+        """Carrega a planilha de custos padrão"""
+        if not os.path.exists(self.arquivo_planilha):
+            self._mensagens.append(("warning", f"⚠️ Arquivo padrão '{self.arquivo_planilha}' não encontrado."))
+            return pd.DataFrame()
+        
+        try:
+            df = self.planilha_service.carregar(self.arquivo_planilha)
+            self._mensagens.append(("success", "✅ Planilha base carregada com sucesso!"))
+            return df
+        except Exception as e:
+            self._mensagens.append(("error", f"Erro ao carregar arquivo padrão: {str(e)}"))
+            return pd.DataFrame()
+
+
+def _construir_container(arquivo_planilha: str = ARQUIVO_PLANILHA_PADRAO) -> ContainerServicos:
+    """Constrói o container (uma vez por processo quando há Streamlit)"""
+    return ContainerServicos(arquivo_planilha)
+
+
+if HAS_STREAMLIT:
+    _construir_container = st.cache_resource(show_spinner="Carregando serviços...")(_construir_container)
+
+_CONTAINER_LOCAL: Optional[ContainerServicos] = None
+
+
+def obter_container(arquivo_planilha: str = ARQUIVO_PLANILHA_PADRAO) -> ContainerServicos:
+    """Retorna o container compartilhado do processo, com as tabelas de referência em dia"""
+    global _CONTAINER_LOCAL
+    if HAS_STREAMLIT:
+        container = _construir_container(arquivo_planilha)
+    else:
+        if _CONTAINER_LOCAL is None or _CONTAINER_LOCAL.arquivo_planilha != arquivo_planilha:
+            _CONTAINER_LOCAL = _construir_container(arquivo_planilha)
+        container = _CONTAINER_LOCAL
+    container.atualizar_referencias()
+    return container
+
+
+def limpar_container() -> None:
+    """
+    Descarta o container para que a próxima execução o reconstrua (ex.: após upload).
+    O DatabaseService e seus caches continuam os mesmos.
+    """
+    global _CONTAINER_LOCAL
+    _CONTAINER_LOCAL = None
+    if HAS_STREAMLIT:
+        _construir_container.clear()
@@ -4,6 +4,7 @@ Simulador Principal - VERSÃO CORRIGIDA
 CORREÇÃO: Botão de calcular frete funcionando e instância disponível no layout
 """
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 import os
@@ -11,16 +12,23 @@ from datetime import datetime
 from typing import Optional, Tuple
 
 from .state_manager import StateManager
-from services.database_service import DatabaseService
-from services.geolocation_service import GeolocationService
-from services.calculation_service import CalculadoraResultados, CalculadoraPontoEquilibrio
+from .recalculo_incremental import RecalculoIncremental
+from .servicos import ARQUIVO_PLANILHA_PADRAO, limpar_container, obter_container
+from services.frete_precalculado_service import FretePrecalculadoService
+from services.calculation_service import CalculadoraPontoEquilibrio, CalculadoraPrecoAlvo
+from services.cenarios_service import (
+    COLUNAS_AJUSTE_PRODUTO, calcular_matriz_uf, parametros_da_tela, preparar_dados_cenario
+)
+from services.frota_service import OtimizadorFrota, calcular_frete_frota
 from services.logistics_service import LogisticsService
+from services.sugestao_pedido_service import SugestorQuantidades
 from config.tributaria import ConfiguracaoTributaria
+from config.veiculos import ConfiguracaoVeiculos
 from ui.layout import SimuladorLayout
 from utils.frete_utils import (
-    buscar_frete_inteligente, calcular_frete_otimizado, obter_faixa_km_exata
+    atribuir_faixas_km, buscar_frete_inteligente, obter_faixa_km_exata
 )
-from utils.data_utils import extrair_faixas_km_ordenadas, arredondar_valor
+from utils.data_utils import arredondar_valor
 from utils.format_utils import montar_endereco_geocode
 
 
@@ -31,6 +39,7 @@ class SimuladorSobel:
         # Inicializar gerenciadores principais
         self.state = StateManager()
         self.config_tributaria = ConfiguracaoTributaria()
+        self.parametros_simulacao: dict = {}
         
         # Configurar serviços
         self._configurar_servicos()
@@ -45,51 +54,32 @@ class SimuladorSobel:
         self._carregar_dados_iniciais()
     
     def _configurar_servicos(self):
-        """Configura todos os serviços necessários"""
-        # Serviço de banco de dados
-        connection_string = DatabaseService.get_default_connection_string()
-        self.db_service = DatabaseService(connection_string)
-
-        # Carregar dados logísticos de capacidade de produtos
-        self.df_logistica = self.db_service.carregar_produtos_truck_carreta()
-        if self.df_logistica.empty:
-            self.df_logistica = pd.DataFrame()
-            st.info("ℹ️ Dados logísticos não encontrados ou vazios.")
-        self.logistics_service = None if self.df_logistica.empty else LogisticsService(self.df_logistica)
-        
-        # Serviço de geolocalização
-        api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-        if api_key:
-            self.geo_service = GeolocationService(api_key)
-        else:
-            self.geo_service = None
-            st.warning("⚠️ Google Maps API key não encontrada. Funcionalidades de geolocalização desabilitadas.")
+        """Obtém os serviços compartilhados do processo (construídos uma única vez)"""
+        container = obter_container()
+        for nivel, mensagem in container.mensagens:
+            getattr(st, nivel)(mensagem)
+        
+        self.db_service = container.db_service
+        self.df_logistica = container.df_logistica
+        self.logistics_service = container.logistics_service
+        self.geo_service = container.geo_service
+        self.planilha_service = container.planilha_service
+        self.frete_precalculado = container.frete_precalculado
+        self.df_padrao = container.df_padrao
+        self.tabela_frete = container.tabela_frete
+        self.faixas_km_ordenadas = container.faixas_km_ordenadas
+        self.indice_frete = container.indice_frete
     
     def _carregar_dados_iniciais(self):
         """Carrega dados iniciais necessários"""
-        arquivo_padrao = "Custo de reposição.xlsx"
-        
-        if os.path.exists(arquivo_padrao):
-            try:
-                self.df_padrao = pd.read_excel(arquivo_padrao)
-                self.df_padrao.columns = self.df_padrao.columns.str.strip()
-                st.success("✅ Planilha base carregada com sucesso!")
-            except Exception as e:
-                st.error(f"Erro ao carregar arquivo padrão: {str(e)}")
-                self.df_padrao = pd.DataFrame()
-        else:
-            st.warning("⚠️ Arquivo padrão 'Custo de reposição.xlsx' não encontrado.")
-            self.df_padrao = pd.DataFrame()
-        
-        # Carregar clientes e extrair faixas de frete
+        # Carregar clientes
         self.clientes_df = self.db_service.carregar_clientes_ou_rede()
-        if not self.clientes_df.empty:
-            self.faixas_km_ordenadas = extrair_faixas_km_ordenadas(self.clientes_df)
-            if self.faixas_km_ordenadas:
-                st.success(f"✅ {len(self.faixas_km_ordenadas)} faixas de frete carregadas!")
-        else:
-            self.faixas_km_ordenadas = []
+        if self.clientes_df.empty:
             st.warning("⚠️ Nenhum dado de cliente carregado.")
+        
+        # Atualização incremental do frete pré-calculado (só recalcula CEPs/tarifas alterados)
+        if not self.clientes_df.empty and self.faixas_km_ordenadas:
+            self.frete_precalculado.iniciar_atualizacao(self.clientes_df, self.tabela_frete, self.faixas_km_ordenadas)
     
     def executar(self):
         """Método principal para executar o simulador"""
@@ -171,7 +161,7 @@ class SimuladorSobel:
     def _processar_upload_arquivo(self, uploaded_file):
         """Processa upload de novo arquivo"""
         try:
-            arquivo_padrao = "Custo de reposição.xlsx"
+            arquivo_padrao = ARQUIVO_PLANILHA_PADRAO
             
             # Criar backup se arquivo existe
             if os.path.exists(arquivo_padrao):
@@ -186,9 +176,9 @@ class SimuladorSobel:
             
             st.success("✅ Arquivo atualizado com sucesso!")
             
-            # Recarregar dados
-            self.df_padrao = pd.read_excel(arquivo_padrao)
-            self.df_padrao.columns = self.df_padrao.columns.str.strip()
+            # Recarregar dados e descartar o container com a planilha antiga
+            self.df_padrao = self.planilha_service.carregar(arquivo_padrao)
+            limpar_container()
             
             # Resetar estado
             self.state.reset_all()
@@ -200,9 +190,10 @@ class SimuladorSobel:
     def _processar_simulacao_principal(self, parametros: dict):
         """Processa a simulação principal"""
         uf_destino = parametros['uf_selecionado']
+        self.parametros_simulacao = parametros_da_tela(parametros)
         
         # Preparar dados base
-        df_base = self._preparar_dados_base(uf_destino, parametros)
+        df_base = self._preparar_dados_base(uf_destino, self.parametros_simulacao)
         
         if df_base.empty:
             st.error(f"❌ Nenhum produto encontrado para a UF {uf_destino}")
@@ -212,6 +203,8 @@ class SimuladorSobel:
         acao = self.layout.exibir_controles_principais()
         if acao == 'equilibrio':
             self._calcular_ponto_equilibrio(df_base)
+        elif acao == 'preco_alvo':
+            self._calcular_preco_alvo(df_base)
         elif acao == 'reset':
             self.state.reset_calculation_state()
             st.success("✅ Dados resetados!")
@@ -222,9 +215,6 @@ class SimuladorSobel:
     
     def _preparar_dados_base(self, uf_destino: str, parametros: dict) -> pd.DataFrame:
         """Prepara os dados base para simulação"""
-        # Filtrar por UF
-        df_base = self.df_padrao[self.df_padrao["UF"] == uf_destino].copy()
-        
         # Resetar dados se mudou UF
         df_atual = self.state.get_simulacao('df_atual')
         if df_atual is not None and "UF" in df_atual.columns:
@@ -232,80 +222,13 @@ class SimuladorSobel:
             if len(ufs_atuais) > 0 and ufs_atuais[0] != uf_destino:
                 self.state.reset_calculation_state()
         
-        # Filtrar produtos esperados
+        # Filtrar UF e produtos esperados, ajustar colunas e aplicar parâmetros globais
         produtos_esperados = self.state.get_ui('produtos_esperados', [])
-        df_base = df_base[df_base["Descrição"].isin(produtos_esperados)].copy()
-        
-        # Ajustar colunas necessárias
-        df_base = self._ajustar_colunas_necessarias(df_base, uf_destino)
-        
-        # Aplicar parâmetros globais
-        df_base = self._aplicar_parametros_globais(df_base, parametros)
+        df_base = preparar_dados_cenario(self.df_padrao, uf_destino, parametros, produtos_esperados)
+        self.state.set_edicoes('comissao_global_aplicada', parametros.get('comissao_padrao') is not None)
         
         return df_base
     
-    def _ajustar_colunas_necessarias(self, df: pd.DataFrame, uf_destino: str) -> pd.DataFrame:
-        """Ajusta colunas necessárias no DataFrame"""
-        colunas_necessarias = [
-            "Preço de Venda", "Quantidade", "Frete Caixa", "%Estrategico", "IPI", 
-            "ICMS ST", "ICMS", "MVA", "Comissão", "Bonificação", "COFINS", "PIS", 
-            "Contigência", "ICMS Interestadual", "ICMS Interno Destino", "FCP"
-        ]
-        
-        aliquotas_origem = self.config_tributaria.obter_aliquotas('SP')
-        aliquotas_destino = self.config_tributaria.obter_aliquotas(uf_destino)
-        
-        for col in colunas_necessarias:
-            if col not in df.columns:
-                if col == "Quantidade":
-                    df[col] = 1
-                elif col == "ICMS Interestadual":
-                    df[col] = aliquotas_origem['interestadual']
-                elif col == "ICMS Interno Destino":
-                    df[col] = aliquotas_destino['interna']
-                elif col == "FCP":
-                    df[col] = aliquotas_destino['fcp']
-                else:
-                    df[col] = 0.0
-        
-        return df
-    
-    def _aplicar_parametros_globais(self, df: pd.DataFrame, parametros: dict) -> pd.DataFrame:
-        """Aplica parâmetros globais ao DataFrame"""
-        uf_destino = parametros['uf_selecionado']
-        aliquotas_origem = self.config_tributaria.obter_aliquotas('SP')
-        aliquotas_destino = self.config_tributaria.obter_aliquotas(uf_destino)
-        
-        # Aplicar frete (pode vir do cliente ou manual)
-        frete_padrao = parametros.get('frete_padrao', 1.50)
-        df["Frete Caixa"] = frete_padrao
-        
-        # Outros parâmetros
-        df["Contrato"] = parametros.get('contrato_percentual', 0.01)
-        df["UF Origem"] = 'SP'
-        df["UF Destino"] = uf_destino
-        df["ICMS Interestadual"] = aliquotas_origem['interestadual']
-        df["ICMS Interno Destino"] = aliquotas_destino['interna']
-        df["FCP"] = aliquotas_destino['fcp']
-        
-        # Parâmetros globais condicionais
-        custo_fixo_global = parametros.get('custo_fixo_global', 0.0)
-        if custo_fixo_global > 0:
-            df["Custo Fixo"] = custo_fixo_global
-        
-        comissao_padrao = parametros.get('comissao_padrao', 0.0)
-        if comissao_padrao > 0:
-            df["Comissão"] = comissao_padrao
-            self.state.set_edicoes('comissao_global_aplicada', True)
-        else:
-            self.state.set_edicoes('comissao_global_aplicada', False)
-        
-        bonificacao_global = parametros.get('bonificacao_global', 0.0)
-        if bonificacao_global > 0:
-            df["Bonificação"] = bonificacao_global
-        
-        return df
-    
     def _calcular_ponto_equilibrio(self, df_base: pd.DataFrame):
         """Calcula ponto de equilíbrio para todos os produtos"""
         tipo_frete = self.state.get_simulacao('tipo_frete', 'CIF')
@@ -319,6 +242,28 @@ class SimuladorSobel:
         self.state.set_simulacao('modo_equilibrio', True)
         st.success("✅ Ponto de equilíbrio calculado!")
     
+    def _calcular_preco_alvo(self, df_base: pd.DataFrame):
+        """Calcula o preço que atinge a margem líquida alvo para todos os produtos"""
+        tipo_frete = self.state.get_simulacao('tipo_frete', 'CIF')
+        margem_alvo = self.state.get_simulacao('margem_alvo', 0.10)
+        df_atual = self.state.get_simulacao('df_atual')
+        # Parte dos dados em edição (quantidades e percentuais ajustados) quando houver
+        df_precos = df_atual.copy() if df_atual is not None and len(df_atual) == len(df_base) else df_base.copy()
+        
+        precos = CalculadoraPrecoAlvo(tipo_frete).calcular(df_precos, margem_alvo)
+        atingidos = precos["Situação"] == "OK"
+        df_precos.loc[atingidos, "Preço de Venda"] = precos.loc[atingidos, "Preço Alvo"]
+        
+        inatingiveis = df_precos.loc[~atingidos, "Descrição"].astype(str).tolist() \
+            if "Descrição" in df_precos.columns else []
+        if inatingiveis:
+            st.warning(f"⚠️ Margem de {margem_alvo:.1%} inatingível para: {', '.join(inatingiveis[:20])}"
+                       + (" ..." if len(inatingiveis) > 20 else ""))
+        
+        self.state.set_simulacao('df_atual', df_precos)
+        self.state.set_simulacao('modo_equilibrio', False)
+        st.success(f"✅ Preços calculados para margem líquida de {margem_alvo:.1%} ({int(atingidos.sum())} produtos)")
+    
     def _processar_edicao_e_resultados(self, df_base: pd.DataFrame):
         """Processa a edição de dados e cálculo de resultados"""
         # Determinar DataFrame para edição
@@ -356,9 +301,39 @@ class SimuladorSobel:
         # Armazenar edição temporária
         self.state.set_simulacao('df_edicao_temp', df_final.copy())
         
+        # Sugestões de quantidade (recalculadas a cada edição)
+        self._exibir_sugestoes_pedido(df_final)
+        
         # Calcular e exibir resultados
         self._calcular_e_exibir_resultados(df_final)
     
+    def _exibir_sugestoes_pedido(self, df_final: pd.DataFrame):
+        """Ajustes de quantidade que reduzem o custo de frete por caixa do pedido em edição"""
+        resultado_frete = self.state.get_frete('resultado_frete_completo')
+        if not resultado_frete or df_final.empty:
+            return
+        try:
+            sugestor = SugestorQuantidades(
+                self.logistics_service, resultado_frete, self.state.get_simulacao('tipo_frete', 'CIF'),
+                frota=self._otimizador_frota(resultado_frete)
+            )
+            resultado = sugestor.sugerir(df_final)
+        except ValueError:
+            return
+        self.layout.exibir_sugestoes_pedido(resultado)
+    
+    def _otimizador_frota(self, resultado_frete: dict) -> OtimizadorFrota:
+        """Otimizador de frota mantido na sessão enquanto tarifas e capacidades não mudam"""
+        chave = (
+            tuple(resultado_frete.get(tipo, {}).get('valor', 0.0) for tipo in ('truck', 'carreta')),
+            tuple(sorted(resultado_frete.get('capacidades', {}).items()))
+        )
+        memorizado = self.state.get_frete('otimizador_frota')
+        if memorizado is None or memorizado[0] != chave:
+            memorizado = (chave, OtimizadorFrota.do_frete(resultado_frete))
+            self.state.set_frete('otimizador_frota', memorizado)
+        return memorizado[1]
+    
     def _aplicar_logica_comissao_bonificacao(self, df: pd.DataFrame) -> pd.DataFrame:
         """Aplica lógica híbrida de comissão e bonificação"""
         df_temp = df.copy()
@@ -369,48 +344,41 @@ class SimuladorSobel:
                 df_temp[col] = 0.0
             df_temp[col] = pd.to_numeric(df_temp[col], errors='coerce').fillna(0.0)
         
+        # Produto de cada linha (sem Descrição, o índice)
+        if "Descrição" in df_temp.columns:
+            produtos = df_temp["Descrição"]
+        else:
+            produtos = pd.Series(df_temp.index.astype(str), index=df_temp.index)
+        
         # Armazenar valores originais se ainda não foram armazenados
         valores_originais = self.state.get_edicoes('valores_originais', {})
         if not valores_originais:
-            for index in df_temp.index:
-                produto = df_temp.at[index, "Descrição"] if "Descrição" in df_temp.columns else str(index)
-                valores_originais[produto] = {
-                    'comissao': float(df_temp.at[index, "Comissão"]),
-                    'bonificacao': float(df_temp.at[index, "Bonificação"])
-                }
+            valores_originais = {
+                produto: {'comissao': float(comissao), 'bonificacao': float(bonificacao)}
+                for produto, comissao, bonificacao in zip(
+                    produtos.to_numpy(), df_temp["Comissão"].to_numpy(), df_temp["Bonificação"].to_numpy()
+                )
+            }
             self.state.set_edicoes('valores_originais', valores_originais)
         
-        # Aplicar valores globais se ativos e não editados individualmente
+        # Aplicar valores globais se ativos e não editados individualmente (máscaras sobre todas as linhas)
         comissao_global_aplicada = self.state.get_edicoes('comissao_global_aplicada', False)
-        comissao_padrao = self.state.get_tributario('comissao_padrao', 0.0)
-        bonificacao_global = self.state.get_tributario('bonificacao_global', 0.0)
+        comissao_padrao = self.state.get_tributario('comissao_padrao', 0.0) or 0.0
+        bonificacao_global = self.state.get_tributario('bonificacao_global', 0.0) or 0.0
         comissoes_editadas = self.state.get_edicoes('comissoes_editadas', {})
         bonificacoes_editadas = self.state.get_edicoes('bonificacoes_editadas', {})
         
-        for index in df_temp.index:
-            produto = df_temp.at[index, "Descrição"] if "Descrição" in df_temp.columns else str(index)
-            
-            # Comissão global
-            if (comissao_global_aplicada and 
-                comissao_padrao > 0 and 
-                produto not in comissoes_editadas):
-                df_temp.at[index, "Comissão"] = float(comissao_padrao)
-            
-            # Bonificação global
-            if (bonificacao_global > 0 and 
-                produto not in bonificacoes_editadas):
-                df_temp.at[index, "Bonificação"] = float(bonificacao_global)
+        if comissao_global_aplicada and comissao_padrao > 0:
+            df_temp.loc[~produtos.isin(list(comissoes_editadas)), "Comissão"] = float(comissao_padrao)
+        if bonificacao_global > 0:
+            df_temp.loc[~produtos.isin(list(bonificacoes_editadas)), "Bonificação"] = float(bonificacao_global)
         
         # Aplicar valores editados individualmente (PRIORIDADE MÁXIMA)
-        for produto, valor in comissoes_editadas.items():
-            mask = df_temp["Descrição"] == produto if "Descrição" in df_temp.columns else False
-            if isinstance(mask, pd.Series) and mask.any():
-                df_temp.loc[mask, "Comissão"] = float(valor)
-        
-        for produto, valor in bonificacoes_editadas.items():
-            mask = df_temp["Descrição"] == produto if "Descrição" in df_temp.columns else False
-            if isinstance(mask, pd.Series) and mask.any():
-                df_temp.loc[mask, "Bonificação"] = float(valor)
+        if "Descrição" in df_temp.columns:
+            for coluna, editadas in (("Comissão", comissoes_editadas), ("Bonificação", bonificacoes_editadas)):
+                if editadas:
+                    valores = produtos.map({produto: float(valor) for produto, valor in editadas.items()})
+                    df_temp[coluna] = valores.where(valores.notna(), df_temp[coluna])
         
         # Garantir tipos corretos
         df_temp["Comissão"] = df_temp["Comissão"].astype(float)
@@ -458,10 +426,10 @@ class SimuladorSobel:
                         df_merge["_vol"] = pd.to_numeric(df_merge[volume_col], errors="coerce").fillna(0) * df_merge["Quantidade"] if volume_col else 0
                         total_peso = df_merge["_peso"].sum()
                         total_m3 = df_merge["_vol"].sum()
-                        cap_truck_peso = 12000
-                        cap_carreta_peso = 28000
-                        cap_truck_m3 = 36
-                        cap_carreta_m3 = 76
+                        cap_truck_peso = LogisticsService.PESO_TRUCK
+                        cap_carreta_peso = LogisticsService.PESO_CARRETA
+                        cap_truck_m3 = LogisticsService.VOLUME_TRUCK
+                        cap_carreta_m3 = LogisticsService.VOLUME_CARRETA
                         eq_truck_peso = (total_peso / cap_truck_peso) * resultado_frete_completo["capacidades"]["truck"]
                         eq_carreta_peso = (total_peso / cap_carreta_peso) * resultado_frete_completo["capacidades"]["carreta"]
                         eq_truck_vol = (total_m3 / cap_truck_m3) * resultado_frete_completo["capacidades"]["truck"]
@@ -471,7 +439,7 @@ class SimuladorSobel:
                     st.info(f"Dados logísticos ignorados: {e}")
             
             # Reavalia a otimização com o volume real
-            nova_otimizacao = calcular_frete_otimizado(resultado_frete_completo, volume_total)
+            nova_otimizacao = calcular_frete_frota(resultado_frete_completo, volume_total)
             
             # Verificar se houve mudança na recomendação
             otimizacao_anterior = self.state.get_frete('otimizacao_frete', {})
@@ -500,10 +468,9 @@ class SimuladorSobel:
     def _exibir_resultados_calculados(self, df_final: pd.DataFrame):
         """Exibe resultados calculados"""
         tipo_frete = self.state.get_simulacao('tipo_frete', 'CIF')
-        calculadora = CalculadoraResultados(tipo_frete)
         
-        # Calcular resultados
-        resultados = df_final.apply(calculadora.calcular_resultados_completos, axis=1)
+        # Calcular resultados: só as linhas alteradas desde o último cálculo
+        resultados = self._recalculo_incremental(tipo_frete).calcular(df_final)
         
         # Criar DataFrame para exibição
         df_display = self._criar_dataframe_display(df_final, resultados)
@@ -520,13 +487,45 @@ class SimuladorSobel:
         # Resumo logístico se dados disponíveis
         if self.logistics_service:
             info_log = self.logistics_service.calcular_logistica(df_final)
-            self.layout.exibir_resumo_logistico(info_log)
+            carregamento = self.logistics_service.planejar_carregamento(df_final, self._custos_veiculos())
+            self.layout.exibir_resumo_logistico(info_log, carregamento)
 
         # Exibir detalhamento do cálculo
         self.layout.exibir_detalhamento_calculo(df_final, resultados)
         
         # Seção de exportação
         self.layout.exibir_secao_exportacao(df_final, resultados, df_display)
+        
+        # Comparativo nacional (todas as UFs de destino numa única passada)
+        if self.layout.exibir_opcao_matriz_uf():
+            self._exibir_matriz_uf(df_final)
+    
+    def _custos_veiculos(self) -> dict:
+        """Frete por viagem de truck e carreta do cliente selecionado"""
+        resultado_frete = self.state.get_frete('resultado_frete_completo') or {}
+        return {tipo: resultado_frete.get(tipo, {}).get('valor', 0.0) for tipo in ('truck', 'carreta')}
+    
+    def _exibir_matriz_uf(self, df_final: pd.DataFrame):
+        """
+        Calcula os produtos atuais em todas as UFs, com os mesmos valores por produto da
+        tabela principal (edições, comissão/bonificação híbridas e frete otimizado)
+        """
+        tipo_frete = self.state.get_simulacao('tipo_frete', 'CIF')
+        df_ajustes = self._aplicar_logica_comissao_bonificacao(df_final)
+        colunas_ajuste = [c for c in ["Descrição"] + COLUNAS_AJUSTE_PRODUTO if c in df_ajustes.columns]
+        matriz = calcular_matriz_uf(
+            self.df_padrao, self.parametros_simulacao,
+            produtos=df_ajustes["Descrição"], tipo_frete=tipo_frete, ajustes=df_ajustes[colunas_ajuste]
+        )
+        self.layout.exibir_matriz_uf(matriz)
+    
+    def _recalculo_incremental(self, tipo_frete: str) -> RecalculoIncremental:
+        """Motor incremental da sessão (guardado no estado, pois o simulador é recriado a cada rerun)"""
+        recalculo = self.state.get_simulacao('recalculo_incremental')
+        if recalculo is None or recalculo.tipo_frete != tipo_frete:
+            recalculo = RecalculoIncremental(tipo_frete)
+            self.state.set_simulacao('recalculo_incremental', recalculo)
+        return recalculo
     
     def _exibir_info_otimizacao(self, df_final: pd.DataFrame):
         """Exibe informações de otimização de frete"""
@@ -546,6 +545,21 @@ class SimuladorSobel:
                     st.metric("💰 Economia", f"R$ {otimizacao['economia']:.2f}", delta=f"R$ {otimizacao['economia']:.2f}")
                 else:
                     st.metric("💰 Frete Total", f"R$ {otimizacao['frete_total']:.2f}")
+            
+            self._exibir_curva_frete(df_final["Quantidade"].sum())
+    
+    def _exibir_curva_frete(self, volume_atual: float):
+        """Curva de custo x volume da frota de menor custo (todos os volumes numa única chamada)"""
+        resultado_frete = self.state.get_frete('resultado_frete_completo')
+        if not resultado_frete:
+            return
+        try:
+            otimizador = self._otimizador_frota(resultado_frete)
+        except ValueError:
+            return
+        volume_maximo = max(int(volume_atual) * 2, int(otimizador.capacidades.max()) * 3)
+        curva = otimizador.otimizar(np.arange(1, volume_maximo + 1))
+        self.layout.exibir_curva_frete(curva, otimizador.nomes)
     
     def _criar_dataframe_display(self, df_final: pd.DataFrame, resultados: pd.DataFrame) -> pd.DataFrame:
         """Cria DataFrame para exibição dos resultados"""
@@ -588,48 +602,30 @@ class SimuladorSobel:
             st.error("❌ Serviço de geolocalização não disponível.")
             return
         
+        # Leitura por chave do frete pré-calculado, sem geocodificação nem consulta de rota.
+        # Distância estimada só vale em modo offline: com a API, a rota real é consultada.
+        registro = self.frete_precalculado.obter(dados_cliente.get("A1_COD"), dados_cliente.get("A1_LOJA"), origem)
+        if registro is not None and str(registro["cidade_ibge"]) == str(dados_cliente.get("cidade_ibge")) \
+                and (registro["status"] == 'OK' or self.geo_service.offline):
+            self._aplicar_frete_precalculado(registro, origem, dados_cliente)
+            return
+        
         with st.spinner("🔍 Calculando frete automático..."):
             # Montar endereço de destino
             endereco_destino_completo = montar_endereco_geocode(dados_cliente)
             st.info(f"🔍 Geocodificando endereço: {endereco_destino_completo}")
             
             # Calcular rota completa
-            resultado_rota = self.geo_service.calcular_rota_completa(origem, endereco_destino_completo)
+            resultado_rota = self.geo_service.calcular_rota_completa(
+                origem, endereco_destino_completo, dados_cliente.get("A1_EST")
+            )
             
             if not resultado_rota['sucesso']:
-                # Tentar fallback com coordenadas do banco
-                try:
-                    lat_banco = float(dados_cliente.get("latitude", 0))
-                    lng_banco = float(dados_cliente.get("longitude", 0))
-                    if lat_banco != 0 and lng_banco != 0:
-                        origem_coords = self.geo_service.geocode(origem)
-                        if origem_coords:
-                            distancia, duracao, erro = self.geo_service.calcular_distancia(
-                                origem_coords, (lat_banco, lng_banco)
-                            )
-                            if not erro:
-                                distancia_km = self.geo_service._extrair_km_da_string(distancia)
-                                resultado_rota = {
-                                    'sucesso': True,
-                                    'origem_coords': origem_coords,
-                                    'destino_coords': (lat_banco, lng_banco),
-                                    'distancia': distancia,
-                                    'duracao': duracao,
-                                    'distancia_km': distancia_km
-                                }
-                                st.warning("⚠️ Usando coordenadas do banco como fallback.")
-                            else:
-                                st.error(resultado_rota['erro'])
-                                return
-                        else:
-                            st.error(resultado_rota['erro'])
-                            return
-                    else:
-                        st.error(resultado_rota['erro'])
-                        return
-                except (ValueError, TypeError, KeyError):
+                resultado_fallback = self._calcular_rota_fallback(origem, dados_cliente)
+                if resultado_fallback is None:
                     st.error(resultado_rota['erro'])
                     return
+                resultado_rota = resultado_fallback
             
             # Armazenar resultados no estado
             self.state.update('frete', {
@@ -642,6 +638,83 @@ class SimuladorSobel:
             # Processar frete
             self._processar_calculo_frete(resultado_rota, dados_cliente, tipo_veiculo)
     
+    def _aplicar_frete_precalculado(self, registro: dict, origem: str, dados_cliente: dict):
+        """Aplica ao estado o frete já calculado em segundo plano para o cliente"""
+        destino_coords = None
+        try:
+            destino_coords = (float(dados_cliente["latitude"]), float(dados_cliente["longitude"]))
+        except (KeyError, TypeError, ValueError):
+            pass
+        
+        resultado_rota = {
+            'sucesso': True,
+            'origem_coords': self.geo_service.geocode(origem),
+            'destino_coords': destino_coords,
+            'distancia': registro['distancia'],
+            'duracao': registro['duracao'],
+            'distancia_km': registro['distancia_km']
+        }
+        self.state.update('frete', {
+            'distancia_calculada': resultado_rota['distancia'],
+            'tempo_calculado': resultado_rota['duracao'],
+            'coordenadas_origem': resultado_rota['origem_coords'],
+            'coordenadas_destino': resultado_rota['destino_coords']
+        })
+        
+        resultado_frete = FretePrecalculadoService.resultado_frete(registro)
+        self._aplicar_frete(resultado_rota, resultado_frete, str(registro['cidade_ibge']), registro['faixa_km'])
+    
+    def _calcular_rota_fallback(self, origem: str, dados_cliente: dict) -> Optional[dict]:
+        """Rota a partir das coordenadas do banco: Distance Matrix se possível, senão estimativa offline"""
+        try:
+            destino_coords = (float(dados_cliente.get("latitude", 0)), float(dados_cliente.get("longitude", 0)))
+        except (ValueError, TypeError):
+            return None
+        if destino_coords == (0.0, 0.0):
+            return None
+        
+        origem_coords = self.geo_service.geocode(origem)
+        if origem_coords[0] is None:
+            return None
+        
+        uf = dados_cliente.get("A1_EST")
+        distancia, duracao, erro = self.geo_service.calcular_distancia(origem_coords, destino_coords, uf)
+        if not erro:
+            st.warning("⚠️ Usando coordenadas do banco como fallback.")
+            return {
+                'sucesso': True,
+                'origem_coords': origem_coords,
+                'destino_coords': destino_coords,
+                'distancia': distancia,
+                'duracao': duracao,
+                'distancia_km': self.geo_service._extrair_km_da_string(distancia)
+            }
+        
+        distancia_km = round(self.geo_service.estimar_distancia_offline(origem_coords, destino_coords, uf), 1)
+        st.warning("⚠️ Distância estimada em linha reta x fator rodoviário (modo offline).")
+        return {
+            'sucesso': True,
+            'origem_coords': origem_coords,
+            'destino_coords': destino_coords,
+            'distancia': f"{distancia_km} km (estimada)",
+            'duracao': "N/D",
+            'distancia_km': distancia_km
+        }
+    
+    def calcular_distancias_rede(self, rede: str, origem: str) -> pd.DataFrame:
+        """Calcula distância e faixa de KM de todos os clientes de uma REDE em um único lote"""
+        df_rede = self.db_service.buscar_clientes_por_rede(rede)
+        if df_rede.empty or not self.geo_service:
+            return pd.DataFrame()
+        
+        distancias = self.geo_service.calcular_distancias_lote(origem, df_rede, estimar_sem_rota=True)
+        colunas_cliente = [c for c in ["A1_COD", "A1_LOJA", "A1_NOME", "A1_EST", "cidade_ibge"] if c in df_rede.columns]
+        df_resultado = df_rede[colunas_cliente].join(
+            distancias[["distancia", "duracao", "distancia_km", "status"]]
+        )
+        df_resultado["FAIXA_KM"] = atribuir_faixas_km(df_resultado["distancia_km"], self.faixas_km_ordenadas)
+        return df_resultado
+    
     def _processar_calculo_frete(self, resultado_rota: dict, dados_cliente: dict, tipo_veiculo: str):
         """Processa o cálculo de frete"""
         distancia_km = resultado_rota['distancia_km']
@@ -653,13 +726,16 @@ class SimuladorSobel:
         cidade_ibge = str(dados_cliente["cidade_ibge"])
         
         # Buscar ambos os valores (truck e carreta) para otimização
-        resultado_frete = buscar_frete_inteligente(self.clientes_df, cidade_ibge, faixa_km)
-        
+        resultado_frete = buscar_frete_inteligente(self.indice_frete, cidade_ibge, faixa_km)
+        self._aplicar_frete(resultado_rota, resultado_frete, cidade_ibge, faixa_km)
+    
+    def _aplicar_frete(self, resultado_rota: dict, resultado_frete: dict, cidade_ibge: str, faixa_km: str):
+        """Otimiza o veículo, grava o frete no estado e exibe o resultado"""
         # Calcular volume total estimado
         volume_estimado = 500  # Volume padrão para cálculo inicial
         
-        # Calcular frete otimizado
-        otimizacao = calcular_frete_otimizado(resultado_frete, volume_estimado)
+        # Calcular frete otimizado (inclui frotas mistas)
+        otimizacao = calcular_frete_frota(resultado_frete, volume_estimado)
         
         # Armazenar no estado
         self.state.update('frete', {
@@ -719,14 +795,15 @@ class SimuladorSobel:
         
         truck_info = resultado_frete['truck']
         carreta_info = resultado_frete['carreta']
+        capacidades = resultado_frete.get('capacidades') or ConfiguracaoVeiculos.capacidades_caixas()
         
         comparacao_data = []
         if truck_info['valor'] > 0:
             comparacao_data.append({
                 'Veículo': '🚚 Truck',
                 'Frete Total': f"R$ {truck_info['valor']:,.2f}",
-                'Capacidade': '870 caixas',
-                'Frete/Caixa': f"R$ {truck_info['valor']/870:.2f}",
+                'Capacidade': f"{capacidades['truck']:,} caixas".replace(",", "."),
+                'Frete/Caixa': f"R$ {truck_info['valor']/capacidades['truck']:.2f}",
                 'Método': truck_info['metodo']
             })
         
@@ -734,8 +811,8 @@ class SimuladorSobel:
             comparacao_data.append({
                 'Veículo': '🚛 Carreta',
                 'Frete Total': f"R$ {carreta_info['valor']:,.2f}",
-                'Capacidade': '1.740 caixas',
-                'Frete/Caixa': f"R$ {carreta_info['valor']/1740:.2f}",
+                'Capacidade': f"{capacidades['carreta']:,} caixas".replace(",", "."),
+                'Frete/Caixa': f"R$ {carreta_info['valor']/capacidades['carreta']:.2f}",
                 'Método': carreta_info['metodo']
             })
         
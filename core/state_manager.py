@@ -38,6 +38,8 @@ class StateManager:
             'df_atual': None,
             'df_edicao_temp': None,
             'modo_equilibrio': False,
+            'recalculo_incremental': None,
+            'margem_alvo': 0.10,
             'resultados_atualizados': False,
             'tipo_frete': 'CIF',
             'uf_origem': 'SP',
@@ -69,6 +71,7 @@ class StateManager:
             'coordenadas_destino': None,
             'resultado_frete_completo': None,
             'otimizacao_frete': None,
+            'otimizador_frota': None,
             'tipo_veiculo_usado': 'truck'
         }
         self._set_defaults(namespace, defaults)
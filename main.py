@@ -51,7 +51,8 @@ def verificar_dependencias():
         ('requests', 'requests', True),
         ('python-dotenv', 'dotenv', True),
         ('xlsxwriter', 'xlsxwriter', False),
-        ('openpyxl', 'openpyxl', False)
+        ('openpyxl', 'openpyxl', False),
+        ('pyarrow', 'pyarrow', False)
     ]
     
     problemas_obrigatorios = []
@@ -76,7 +77,7 @@ def verificar_dependencias():
         
         **Para instalar todas:**
         ```bash
-        pip install pandas streamlit pyodbc requests python-dotenv xlsxwriter openpyxl
+        pip install pandas streamlit pyodbc requests python-dotenv xlsxwriter openpyxl pyarrow
         ```
         
         **Para instalar apenas obrigatórias:**
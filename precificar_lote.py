@@ -0,0 +1,201 @@
+"""
+Precificação em Lote (sem Streamlit)
+====================================
+
+Calcula os resultados completos de um arquivo de pedidos (cliente, UF, produto
+e quantidade) contra a planilha de custos e grava a tabela em CSV ou Parquet.
+Lê os pedidos em blocos e distribui os blocos entre todos os núcleos.
+
+Uso:
+    python precificar_lote.py pedidos.csv resultados.parquet \\
+        --planilha "Custo de reposição.xlsx" --frete-padrao 1.8 --comissao 0.03
+
+Colunas do arquivo de pedidos: UF, Descrição e Quantidade (obrigatórias);
+Pedido, Cliente e demais colunas são repassadas à saída como texto. Preço de
+Venda, Custo NET, Custo Fixo, Frete Caixa, Comissão e Bonificação, se presentes,
+substituem os valores da planilha linha a linha. O frete de cada cliente vem da
+coluna Frete Caixa do pedido; células vazias (ou a coluna ausente) usam
+--frete-padrao. Linhas sem preço no pedido e na planilha saem com Situação SEM_PRECO.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+# Bloqueia o import do Streamlit: os serviços caem no modo sem interface (erros no console)
+sys.modules.setdefault("streamlit", None)
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from core.servicos import ARQUIVO_PLANILHA_PADRAO
+from services.cenarios_service import (
+    COLUNAS_AJUSTE_PRODUTO, UF_ORIGEM_PADRAO, pool_com_planilha, precificar_pedidos, precificar_pedidos_do_pool
+)
+from services.planilha_service import PlanilhaCustosService
+
+COLUNAS_OBRIGATORIAS = ["UF", "Descrição", "Quantidade"]
+# Colunas numéricas do pedido; as demais são texto (códigos mantêm zeros à esquerda
+# e cada coluna tem o mesmo tipo em todos os blocos, como o esquema Parquet exige)
+COLUNAS_NUMERICAS = ["Quantidade"] + COLUNAS_AJUSTE_PRODUTO
+TAMANHO_BLOCO_PADRAO = 50000
+
+
+def ler_pedidos_em_blocos(caminho: str, tamanho_bloco: int) -> Iterator[pd.DataFrame]:
+    """Lê o arquivo de pedidos em blocos (CSV e Parquet são lidos sob demanda)"""
+    extensao = Path(caminho).suffix.lower()
+    if extensao == ".parquet":
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+    elif extensao in (".xlsx", ".xls"):
+        # Excel não tem leitura incremental: carrega e fatia
+        df = pd.read_excel(caminho, dtype=str)
+        for inicio in range(0, len(df), tamanho_bloco):
+            yield df.iloc[inicio:inicio + tamanho_bloco]
+    else:
+        with open(caminho, encoding="utf-8-sig") as arquivo:
+            separador = ";" if ";" in arquivo.readline() else ","
+        yield from pd.read_csv(caminho, chunksize=tamanho_bloco, sep=separador,
+                               encoding="utf-8-sig", dtype=str)
+
+
+class EscritorResultados:
+    """Grava os blocos de resultado à medida que ficam prontos (CSV ou Parquet)"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.parquet = Path(caminho).suffix.lower() == ".parquet"
+        self._escritor = None
+        self._esquema = None
+        self.linhas = 0
+
+    def gravar(self, df: pd.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._escritor is None:
+                tabela = pa.Table.from_pandas(df, preserve_index=False)
+                self._esquema = tabela.schema
+                self._escritor = pq.ParquetWriter(self.caminho, self._esquema)
+            else:
+                tabela = pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False)
+            self._escritor.write_table(tabela)
+        else:
+            df.to_csv(self.caminho, mode="w" if self.linhas == 0 else "a",
+                      header=self.linhas == 0, index=False)
+        self.linhas += len(df)
+
+    def fechar(self) -> None:
+        if self._escritor is not None:
+            self._escritor.close()
+
+
+def _validar_colunas(bloco: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza nomes de colunas, confere as obrigatórias e fixa os tipos: numéricas
+    em float e as demais não numéricas em texto, inclusive quando vazias no bloco
+    """
+    bloco = bloco.rename(columns=lambda c: str(c).strip())
+    faltantes = [c for c in COLUNAS_OBRIGATORIAS if c not in bloco.columns]
+    if faltantes:
+        raise ValueError(f"Colunas obrigatórias ausentes no arquivo de pedidos: {', '.join(faltantes)}")
+    for coluna in bloco.columns:
+        if coluna in COLUNAS_NUMERICAS:
+            bloco[coluna] = pd.to_numeric(bloco[coluna], errors="coerce").astype(float)
+        elif not is_numeric_dtype(bloco[coluna]):
+            bloco[coluna] = bloco[coluna].astype("string")
+    bloco["UF"] = bloco["UF"].astype("string").str.strip().str.upper()
+    return bloco
+
+
+def precificar_arquivo(caminho_pedidos: str, caminho_saida: str, df_padrao: pd.DataFrame, parametros: dict,
+                       tipo_frete: str = "CIF", processos: Optional[int] = None,
+                       tamanho_bloco: int = TAMANHO_BLOCO_PADRAO) -> int:
+    """
+    Precifica o arquivo de pedidos bloco a bloco e grava a saída na ordem de
+    entrada. Mantém no máximo dois blocos por processo em andamento. Retorna o
+    número de linhas gravadas.
+    """
+    blocos = (_validar_colunas(bloco) for bloco in ler_pedidos_em_blocos(caminho_pedidos, tamanho_bloco))
+    escritor = EscritorResultados(caminho_saida)
+    processos = processos or os.cpu_count() or 1
+    try:
+        if processos <= 1:
+            for bloco in blocos:
+                escritor.gravar(precificar_pedidos(df_padrao, bloco, parametros, tipo_frete))
+            return escritor.linhas
+
+        with pool_com_planilha(df_padrao, processos) as executor:
+            em_andamento: deque = deque()
+            for bloco in blocos:
+                em_andamento.append(executor.submit(
+                    precificar_pedidos_do_pool, bloco, parametros, tipo_frete, UF_ORIGEM_PADRAO
+                ))
+                if len(em_andamento) >= 2 * processos:
+                    escritor.gravar(em_andamento.popleft().result())
+            while em_andamento:
+                escritor.gravar(em_andamento.popleft().result())
+        return escritor.linhas
+    finally:
+        escritor.fechar()
+
+
+def _argumentos(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Precificação em lote de pedidos, sem interface")
+    parser.add_argument("pedidos", help="Arquivo de pedidos (.csv, .parquet ou .xlsx)")
+    parser.add_argument("saida", help="Arquivo de resultados (.csv ou .parquet)")
+    parser.add_argument("--planilha", default=str(ROOT_DIR / ARQUIVO_PLANILHA_PADRAO), help="Planilha de custos")
+    parser.add_argument("--tipo-frete", choices=["CIF", "FOB"], default="CIF")
+    parser.add_argument("--frete-padrao", type=float, default=1.50,
+                        help="Frete por caixa (R$) das linhas sem Frete Caixa no pedido")
+    parser.add_argument("--contrato", type=float, default=0.01, help="Contrato (fração, ex.: 0.01)")
+    parser.add_argument("--comissao", type=float, default=None,
+                        help="Comissão global (fração; omitida mantém a da planilha)")
+    parser.add_argument("--bonificacao", type=float, default=None,
+                        help="Bonificação global (fração; omitida mantém a da planilha)")
+    parser.add_argument("--custo-fixo", type=float, default=None,
+                        help="Custo fixo global por caixa (R$; omitido mantém o da planilha)")
+    parser.add_argument("--processos", type=int, default=None, help="Processos (padrão: todos os núcleos)")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO_PADRAO, help="Linhas por bloco")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando"""
+    args = _argumentos(argv)
+    if Path(args.saida).suffix.lower() == ".parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("❌ pyarrow não está instalado; use saída .csv ou instale pyarrow", file=sys.stderr)
+            return 1
+
+    parametros = {
+        'frete_padrao': args.frete_padrao,
+        'contrato_percentual': args.contrato,
+        'comissao_padrao': args.comissao,
+        'bonificacao_global': args.bonificacao,
+        'custo_fixo_global': args.custo_fixo,
+    }
+
+    inicio = time.perf_counter()
+    df_padrao = PlanilhaCustosService().carregar(args.planilha)
+    if "Preço de Venda" not in df_padrao.columns or df_padrao["Preço de Venda"].isna().all():
+        print("⚠️ A planilha não tem Preço de Venda: informe a coluna no arquivo de pedidos "
+              "(linhas sem preço saem com Situação SEM_PRECO)", file=sys.stderr)
+    linhas = precificar_arquivo(args.pedidos, args.saida, df_padrao, parametros, args.tipo_frete,
+                                args.processos, args.tamanho_bloco)
+    print(f"✅ {linhas} linhas precificadas em {time.perf_counter() - inicio:.1f}s -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Cache Stale-While-Revalidate
+============================
+Serve imediatamente o último resultado bom e atualiza em segundo plano
+quando o prazo vence; em caso de erro, continua servindo a cópia anterior.
+"""
+
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class CacheSWR:
+    """Cache de um carregador sem argumentos com atualização em segundo plano"""
+    
+    def __init__(self, carregador: Callable[[], Any], ttl_segundos: float = 600, nome: Optional[str] = None):
+        self.carregador = carregador
+        self.ttl_segundos = ttl_segundos
+        self.nome = nome or getattr(carregador, "__name__", "carregador")
+        
+        self._valor: Any = None
+        self._tem_valor = False
+        self._atualizado_em: Optional[float] = None
+        self._tentativa_em: Optional[float] = None
+        self._duracao_ultima_atualizacao: Optional[float] = None
+        self._ultimo_erro: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def obter(self) -> Any:
+        """
+        Retorna o valor em cache. Na primeira chamada (ou após invalidar) carrega de forma
+        síncrona e propaga o erro; depois, valores vencidos são servidos enquanto a
+        atualização roda em segundo plano.
+        """
+        if not self._tem_valor:
+            with self._lock:
+                if not self._tem_valor:
+                    self._atualizar(propagar_erro=True)
+            return self._valor
+        
+        if self.vencido():
+            self._atualizar_em_segundo_plano()
+        return self._valor
+    
+    def vencido(self) -> bool:
+        """Indica se o prazo venceu desde a última tentativa de atualização"""
+        return self._tentativa_em is None or time.time() - self._tentativa_em >= self.ttl_segundos
+    
+    def _atualizar(self, propagar_erro: bool) -> None:
+        """Executa o carregador e troca o valor; em erro mantém o anterior até o próximo prazo"""
+        self._tentativa_em = time.time()
+        inicio = time.perf_counter()
+        try:
+            valor = self.carregador()
+        except Exception as e:
+            self._ultimo_erro = str(e)
+            if propagar_erro:
+                raise
+            return
+        finally:
+            self._duracao_ultima_atualizacao = time.perf_counter() - inicio
+        
+        self._valor = valor
+        self._tem_valor = True
+        self._atualizado_em = time.time()
+        self._ultimo_erro = None
+    
+    def _atualizar_em_segundo_plano(self) -> None:
+        """Dispara uma única atualização em segundo plano por vez"""
+        with self._lock:
+            if not self.vencido() or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._tentativa_em = time.time()
+            self._thread = threading.Thread(
+                target=self._atualizar, args=(False,), name=f"swr-{self.nome}", daemon=True
+            )
+            self._thread.start()
+    
+    def aguardar(self, timeout: Optional[float] = None) -> None:
+        """Aguarda a atualização em segundo plano em andamento (útil em scripts e testes)"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+    
+    def invalidar(self) -> None:
+        """Descarta o valor; a próxima chamada recarrega de forma síncrona"""
+        with self._lock:
+            self._valor = None
+            self._tem_valor = False
+            self._atualizado_em = None
+            self._tentativa_em = None
+    
+    def status(self) -> Dict[str, Any]:
+        """Momento e duração da última atualização, erro mais recente e se está atualizando"""
+        return {
+            'nome': self.nome,
+            'ultima_atualizacao': self._atualizado_em,
+            'idade_segundos': (time.time() - self._atualizado_em) if self._atualizado_em else None,
+            'duracao_ultima_atualizacao': self._duracao_ultima_atualizacao,
+            'vencido': self.vencido(),
+            'atualizando': self._thread is not None and self._thread.is_alive(),
+            'ultimo_erro': self._ultimo_erro
+        }
+
+
+def cache_swr(ttl_segundos: float = 600):
+    """Decorator de método sem argumentos: um CacheSWR por instância e método"""
+    def decorator(func):
+        nome = func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(self):
+            caches = self.__dict__.setdefault('_caches_swr', {})
+            cache = caches.get(nome)
+            if cache is None:
+                cache = caches.setdefault(nome, CacheSWR(lambda: func(self), ttl_segundos, nome))
+            return cache.obter()
+        return wrapper
+    return decorator
+
+
+def status_caches_swr(objeto: Any) -> Dict[str, Dict[str, Any]]:
+    """Status de todos os caches SWR criados para um objeto"""
+    return {nome: cache.status() for nome, cache in getattr(objeto, '_caches_swr', {}).items()}
@@ -4,6 +4,7 @@ Serviço de Cálculos - Versão Corrigida
 Centraliza todos os cálculos tributários e financeiros.
 """
 
+import numpy as np
 import pandas as pd
 from typing import Tuple, Any
 
@@ -31,6 +32,61 @@ def arredondar_valor(valor: Any, decimais: int = 2) -> float:
         return 0.0
 
 
+def arredondar_array(valores: Any, decimais: int = 2) -> np.ndarray:
+    """
+    Versão vetorizada de arredondar_valor com o mesmo resultado de round().
+
+    np.round escala e arredonda o produto já arredondado, o que diverge de
+    round() em valores como 2.675. Aqui o erro da multiplicação é recuperado
+    (produto exato de Dekker) para decidir o desempate sobre o valor exato.
+    """
+    x = np.asarray(valores, dtype=float)
+    escala = 10.0 ** decimais
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        produto = x * escala
+
+        # Erro exato do produto x * escala (divisão de Veltkamp)
+        c = 134217729.0 * x
+        x_alto = c - (c - x)
+        x_baixo = x - x_alto
+        c = 134217729.0 * escala
+        e_alto = c - (c - escala)
+        e_baixo = escala - e_alto
+        erro = ((x_alto * e_alto - produto) + x_alto * e_baixo + x_baixo * e_alto) + x_baixo * e_baixo
+
+        # Meio-para-par sobre o valor exato produto + erro
+        inteiro = np.floor(produto)
+        desvio = (produto - inteiro) - 0.5
+        subir = (desvio > -erro) | ((desvio == -erro) & (np.fmod(inteiro, 2.0) != 0))
+        resultado = np.where(subir, inteiro + 1.0, inteiro) / escala
+
+        # round() preserva o sinal do zero (-0.001 -> -0.0)
+        resultado = np.where(resultado == 0.0, np.copysign(0.0, x), resultado)
+
+        return np.where(np.isfinite(produto) & (np.abs(produto) < 2.0 ** 52), resultado, x)
+
+
+def _coluna_numerica(df: pd.DataFrame, coluna: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converte uma coluna para float como float(row.get(coluna, 0)).
+    Retorna (valores, invalidos): valores não conversíveis viram 0.0 e são
+    marcados em invalidos, pois float() levantaria exceção na versão por linha.
+    """
+    if coluna not in df.columns:
+        return np.zeros(len(df)), np.zeros(len(df), dtype=bool)
+
+    serie = df[coluna]
+    if pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return serie.to_numpy(dtype=float, na_value=np.nan), np.zeros(len(df), dtype=bool)
+
+    convertida = pd.to_numeric(serie, errors='coerce')
+    nan_original = serie.map(lambda v: isinstance(v, float) and v != v).to_numpy(dtype=bool)
+    invalidos = convertida.isna().to_numpy() & ~nan_original
+    valores = np.where(invalidos, 0.0, convertida.to_numpy(dtype=float, na_value=np.nan))
+    return valores, invalidos
+
+
 class CalculadoraTributaria:
     """Classe para realizar cálculos tributários"""
     
@@ -70,6 +126,18 @@ class CalculadoraTributaria:
 
 class CalculadoraResultados:
     """Classe para calcular resultados financeiros"""
+
+    COLUNAS_RESULTADO = [
+        "Preço Venda", "Qtd", "Custo NET", "Custo Fixo", "MVA", "Comissão", "Bonificação",
+        "Subtotal", "IPI", "Base ICMS-ST", "ICMS Próprio", "ICMS-ST", "FCP", "Total NF",
+        "Custo Total", "Frete Total", "Total Despesas", "Lucro Antes IR", "IRPJ", "CSLL",
+        "Lucro Líquido", "Margem Antes IR %", "Margem Líquida %", "Ponto Equilíbrio"
+    ]
+
+    DESPESAS_PERCENTUAIS = [
+        "ICMS Interestadual", "COFINS", "PIS", "Comissão",
+        "Bonificação", "Contigência", "Contrato", "%Estrategico"
+    ]
     
     def __init__(self, tipo_frete: str = "CIF"):
         self.tipo_frete = tipo_frete
@@ -181,15 +249,146 @@ class CalculadoraResultados:
             st_error(f"Erro no cálculo: {str(e)}")
             return self._retornar_serie_vazia()
     
+    def calcular_resultados_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calcula os resultados de todas as linhas de uma vez, em arrays NumPy.
+        Equivalente a df.apply(self.calcular_resultados_completos, axis=1),
+        com o mesmo arredondamento em cada etapa.
+        """
+        if df.empty:
+            return pd.DataFrame(columns=self.COLUNAS_RESULTADO, index=df.index, dtype=float)
+
+        if "Preço de Venda" not in df.columns or "Quantidade" not in df.columns:
+            # Mesmo tratamento de erro da versão por linha
+            return df.apply(self.calcular_resultados_completos, axis=1)
+
+        cif = self.tipo_frete == "CIF"
+        zeros = np.zeros(len(df))
+
+        # Colunas lidas com arredondar_valor: valor inválido vira 0.0
+        preco_venda = arredondar_array(_coluna_numerica(df, "Preço de Venda")[0])
+        qtd = arredondar_array(_coluna_numerica(df, "Quantidade")[0], 0)
+        custo_net = arredondar_array(_coluna_numerica(df, "Custo NET")[0])
+        custo_fixo = arredondar_array(_coluna_numerica(df, "Custo Fixo")[0])
+
+        # Colunas lidas com float(): valor inválido invalida a linha
+        colunas_float = ["IPI", "MVA", "ICMS Interno Destino", "FCP"] + self.DESPESAS_PERCENTUAIS
+        if cif:
+            colunas_float.append("Frete Caixa")
+        valores = {}
+        linhas_invalidas = np.zeros(len(df), dtype=bool)
+        for coluna in colunas_float:
+            valores[coluna], invalidos = _coluna_numerica(df, coluna)
+            linhas_invalidas |= invalidos
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            subtotal = arredondar_array(preco_venda * qtd)
+            custo_total_unit = arredondar_array(custo_net + custo_fixo)
+            custo_total = arredondar_array(custo_total_unit * qtd)
+
+            # Frete
+            if cif:
+                frete_total = arredondar_array(valores["Frete Caixa"] * qtd)
+                frete_unit = arredondar_array(valores["Frete Caixa"])
+            else:
+                frete_total = zeros
+                frete_unit = zeros
+
+            # IPI
+            ipi_total = arredondar_array(subtotal * valores["IPI"])
+
+            # ICMS-ST (mesma sequência de CalculadoraTributaria.calcular_icms_st_completo)
+            mva = valores["MVA"]
+            fcp_aliquota = valores["FCP"]
+            tem_st = ~(mva <= 0)
+            base_sem_mva = arredondar_array(subtotal + ipi_total)
+            base_com_mva = arredondar_array(base_sem_mva * (1 + mva))
+            icms_origem = arredondar_array(base_sem_mva * valores["ICMS Interestadual"])
+            icms_destino = arredondar_array(base_com_mva * valores["ICMS Interno Destino"])
+            diferenca_st = icms_destino - icms_origem
+            icms_st = arredondar_array(np.where(0.0 > diferenca_st, 0.0, diferenca_st))
+            fcp_valor = np.where(fcp_aliquota > 0, arredondar_array(base_sem_mva * fcp_aliquota), 0.0)
+
+            icms_st = np.where(tem_st, icms_st, 0.0)
+            base_icms_st = np.where(tem_st, base_com_mva, 0.0)
+            icms_proprio = np.where(tem_st, icms_origem, 0.0)
+            fcp_valor = np.where(tem_st, fcp_valor, 0.0)
+
+            # Despesas operacionais (+ FCP)
+            despesas_operacionais = zeros
+            for despesa in self.DESPESAS_PERCENTUAIS:
+                despesas_operacionais = despesas_operacionais + arredondar_array(subtotal * valores[despesa])
+            total_despesas_operacionais = despesas_operacionais + fcp_valor
+
+            # Lucro, IRPJ e CSLL
+            lucro_antes_ir = arredondar_array(
+                subtotal - custo_total - total_despesas_operacionais - frete_total
+            )
+            sem_ir = lucro_antes_ir <= 0
+            adicional_irpj = np.where(
+                lucro_antes_ir > 20000, arredondar_array((lucro_antes_ir - 20000) * 0.10), 0.0
+            )
+            irpj = np.where(sem_ir, 0.0, arredondar_array(lucro_antes_ir * 0.15) + adicional_irpj)
+            csll = np.where(sem_ir, 0.0, arredondar_array(lucro_antes_ir * 0.09))
+            lucro_liquido = arredondar_array(lucro_antes_ir - irpj - csll)
+
+            # Margens
+            com_receita = subtotal > 0
+            margem_antes_ir = np.where(com_receita, arredondar_array((lucro_antes_ir / subtotal) * 100, 1), 0.0)
+            margem_liquida = np.where(com_receita, arredondar_array((lucro_liquido / subtotal) * 100, 1), 0.0)
+
+            # Total NF
+            total_nf = arredondar_array(subtotal + ipi_total + icms_st + fcp_valor)
+
+            # Ponto de equilíbrio
+            despesas_diretas = valores[self.DESPESAS_PERCENTUAIS[0]]
+            for despesa in self.DESPESAS_PERCENTUAIS[1:]:
+                despesas_diretas = despesas_diretas + valores[despesa]
+            ponto_equilibrio = np.where(
+                despesas_diretas >= 1.0, 0.0,
+                arredondar_array((custo_total_unit + frete_unit) / (1 - despesas_diretas))
+            )
+
+        resultados = pd.DataFrame({
+            "Preço Venda": preco_venda,
+            "Qtd": qtd,
+            "Custo NET": custo_net,
+            "Custo Fixo": custo_fixo,
+            "MVA": mva,
+            "Comissão": valores["Comissão"],
+            "Bonificação": valores["Bonificação"],
+            "Subtotal": subtotal,
+            "IPI": ipi_total,
+            "Base ICMS-ST": base_icms_st,
+            "ICMS Próprio": icms_proprio,
+            "ICMS-ST": icms_st,
+            "FCP": fcp_valor,
+            "Total NF": total_nf,
+            "Custo Total": custo_total,
+            "Frete Total": frete_total,
+            "Total Despesas": total_despesas_operacionais,
+            "Lucro Antes IR": lucro_antes_ir,
+            "IRPJ": irpj,
+            "CSLL": csll,
+            "Lucro Líquido": lucro_liquido,
+            "Margem Antes IR %": margem_antes_ir,
+            "Margem Líquida %": margem_liquida,
+            "Ponto Equilíbrio": ponto_equilibrio
+        }, index=df.index)
+
+        # Linhas com valores não numéricos seguem pelo caminho por linha (erro + zeros)
+        if linhas_invalidas.any():
+            posicoes = np.flatnonzero(linhas_invalidas)
+            resultados.iloc[posicoes] = df.iloc[posicoes].apply(
+                self.calcular_resultados_completos, axis=1
+            ).astype(float).to_numpy()
+
+        return resultados
+    
     def _calcular_despesas_operacionais(self, row: pd.Series, subtotal: float) -> float:
         """Calcula o total das despesas operacionais"""
-        despesas = [
-            "ICMS Interestadual", "COFINS", "PIS", "Comissão",
-            "Bonificação", "Contigência", "Contrato", "%Estrategico"
-        ]
-        
         total = 0.0
-        for despesa in despesas:
+        for despesa in self.DESPESAS_PERCENTUAIS:
             percentual = float(row.get(despesa, 0))
             total += arredondar_valor(subtotal * percentual)
         
@@ -251,47 +450,239 @@ class CalculadoraResultados:
 class CalculadoraPontoEquilibrio:
     """Classe especializada para cálculo de ponto de equilíbrio"""
     
-    @staticmethod
-    def calcular_para_dataframe(df: pd.DataFrame, tipo_frete: str = "CIF") -> Tuple[pd.DataFrame, list]:
-        """Calcula o ponto de equilíbrio para todos os produtos"""
+    @classmethod
+    def calcular_para_dataframe(cls, df: pd.DataFrame, tipo_frete: str = "CIF") -> Tuple[pd.DataFrame, list]:
+        """
+        Calcula o ponto de equilíbrio para todos os produtos de uma vez, em arrays NumPy.
+        Linhas com valores não numéricos usam o cálculo por linha (mesma mensagem de erro).
+        """
         df_resultado = df.copy()
-        alertas = []
+        if df_resultado.empty:
+            return df_resultado, []
         
-        for index, row in df_resultado.iterrows():
-            try:
-                # Custos base
-                custo_net = float(row.get("Custo NET", 0))
-                custo_fixo = float(row.get("Custo Fixo", 0))
-                custo_total_unit = custo_net + custo_fixo
-                frete_unit = float(row.get("Frete Caixa", 0)) if tipo_frete == "CIF" else 0
-                
-                # Despesas percentuais diretas sobre receita
-                despesas_diretas = (
-                    float(row.get("ICMS Interestadual", 0)) +
-                    float(row.get("COFINS", 0)) +
-                    float(row.get("PIS", 0)) +
-                    float(row.get("Comissão", 0)) +
-                    float(row.get("Bonificação", 0)) +
-                    float(row.get("Contigência", 0)) +
-                    float(row.get("Contrato", 0)) +
-                    float(row.get("%Estrategico", 0))
-                )
-                
-                # Verificar se é possível calcular
-                if despesas_diretas >= 1.0:
-                    alertas.append(f"{row.get('Descrição', 'Produto')}: Despesas = {despesas_diretas:.1%} (≥100%)")
-                    preco_equilibrio = 0.0
-                else:
-                    custos_totais = custo_total_unit + frete_unit
-                    preco_equilibrio = custos_totais / (1 - despesas_diretas)
-                    preco_equilibrio = arredondar_valor(preco_equilibrio, 2)
-                
-                # Garantir que não seja negativo
-                preco_equilibrio = max(0.0, preco_equilibrio)
-                df_resultado.at[index, "Preço de Venda"] = preco_equilibrio
-                
-            except Exception as e:
-                alertas.append(f"Erro no produto {row.get('Descrição', 'N/A')}: {str(e)}")
-                df_resultado.at[index, "Preço de Venda"] = 0.0
+        cif = tipo_frete == "CIF"
+        colunas = ["Custo NET", "Custo Fixo"] + (["Frete Caixa"] if cif else [])
+        colunas += CalculadoraResultados.DESPESAS_PERCENTUAIS
+        valores = {}
+        linhas_invalidas = np.zeros(len(df), dtype=bool)
+        for coluna in colunas:
+            valores[coluna], invalidos = _coluna_numerica(df, coluna)
+            linhas_invalidas |= invalidos
+        
+        # Soma na mesma ordem da versão por linha para o mesmo resultado em ponto flutuante
+        despesas_diretas = valores[CalculadoraResultados.DESPESAS_PERCENTUAIS[0]]
+        for coluna in CalculadoraResultados.DESPESAS_PERCENTUAIS[1:]:
+            despesas_diretas = despesas_diretas + valores[coluna]
+        custos_totais = valores["Custo NET"] + valores["Custo Fixo"]
+        if cif:
+            custos_totais = custos_totais + valores["Frete Caixa"]
+        
+        inviaveis = despesas_diretas >= 1.0
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            precos = arredondar_array(custos_totais / (1 - despesas_diretas), 2)
+        precos = np.where(inviaveis, 0.0, precos)
+        # Como max(0.0, preço): negativos e NaN viram zero
+        precos = np.where(precos > 0, precos, 0.0)
+        
+        descricoes = df["Descrição"] if "Descrição" in df.columns else None
+        alertas_por_linha = {}
+        for posicao in np.flatnonzero(inviaveis & ~linhas_invalidas):
+            descricao = descricoes.iat[posicao] if descricoes is not None else 'Produto'
+            alertas_por_linha[posicao] = (
+                f"{descricao}: Despesas = {float(despesas_diretas[posicao]):.1%} (≥100%)"
+            )
+        for posicao in np.flatnonzero(linhas_invalidas):
+            precos[posicao], alerta = cls._calcular_linha(df.iloc[posicao], tipo_frete)
+            if alerta:
+                alertas_por_linha[posicao] = alerta
+        
+        df_resultado["Preço de Venda"] = precos
+        alertas = [alertas_por_linha[posicao] for posicao in sorted(alertas_por_linha)]
+        return df_resultado, alertas
+    
+    @staticmethod
+    def _calcular_linha(row: pd.Series, tipo_frete: str = "CIF") -> Tuple[float, str]:
+        """Ponto de equilíbrio de um produto; retorna (preço, alerta ou '')"""
+        try:
+            # Custos base
+            custo_net = float(row.get("Custo NET", 0))
+            custo_fixo = float(row.get("Custo Fixo", 0))
+            custo_total_unit = custo_net + custo_fixo
+            frete_unit = float(row.get("Frete Caixa", 0)) if tipo_frete == "CIF" else 0
+            
+            # Despesas percentuais diretas sobre receita
+            despesas_diretas = (
+                float(row.get("ICMS Interestadual", 0)) +
+                float(row.get("COFINS", 0)) +
+                float(row.get("PIS", 0)) +
+                float(row.get("Comissão", 0)) +
+                float(row.get("Bonificação", 0)) +
+                float(row.get("Contigência", 0)) +
+                float(row.get("Contrato", 0)) +
+                float(row.get("%Estrategico", 0))
+            )
+            
+            # Verificar se é possível calcular
+            alerta = ""
+            if despesas_diretas >= 1.0:
+                alerta = f"{row.get('Descrição', 'Produto')}: Despesas = {despesas_diretas:.1%} (≥100%)"
+                preco_equilibrio = 0.0
+            else:
+                custos_totais = custo_total_unit + frete_unit
+                preco_equilibrio = custos_totais / (1 - despesas_diretas)
+                preco_equilibrio = arredondar_valor(preco_equilibrio, 2)
+            
+            # Garantir que não seja negativo
+            return max(0.0, preco_equilibrio), alerta
+            
+        except Exception as e:
+            return 0.0, f"Erro no produto {row.get('Descrição', 'N/A')}: {str(e)}"
+
+
+class CalculadoraPrecoAlvo:
+    """
+    Preço de venda que atinge uma margem líquida alvo no modelo completo de
+    CalculadoraResultados (ICMS-ST, FCP, adicional de IRPJ e arredondamentos).
+    """
+    
+    # Fração do lucro antes do IR que sobra após IRPJ (15% + 10% adicional) e CSLL (9%)
+    FATOR_LUCRO_SEM_ADICIONAL = 1 - 0.15 - 0.09
+    FATOR_LUCRO_COM_ADICIONAL = 1 - 0.15 - 0.10 - 0.09
+    LIMITE_ADICIONAL_IRPJ = 20000.0
+    PASSO_INICIAL_CENTAVOS = 64
+    MAXIMO_EXPANSOES = 40
+    
+    def __init__(self, tipo_frete: str = "CIF"):
+        self.tipo_frete = tipo_frete
+        self.calculadora = CalculadoraResultados(tipo_frete)
+    
+    def calcular(self, df: pd.DataFrame, margem_alvo: Any) -> pd.DataFrame:
+        """
+        Resolve o preço de todos os produtos de uma vez. margem_alvo é a margem líquida
+        (lucro líquido / subtotal) em fração: um valor global ou um por linha.
+        Retorna Preço Alvo (menor preço em centavos que atinge a margem), a margem
+        resultante e a situação: OK, INATINGIVEL ou INVALIDO.
+        """
+        resultado = pd.DataFrame({
+            "Preço Alvo": np.nan, "Margem Líquida %": np.nan, "Lucro Líquido": np.nan,
+            "Situação": "INVALIDO"
+        }, index=df.index)
+        if df.empty:
+            return resultado
+        
+        if isinstance(margem_alvo, pd.Series):
+            margem_alvo = margem_alvo.reindex(df.index)
+        margem = np.broadcast_to(np.asarray(margem_alvo, dtype=float), (len(df),)).copy()
+        precos_fechados, validas = self._preco_forma_fechada(df, margem)
+        resultado.loc[validas & ~np.isfinite(precos_fechados), "Situação"] = "INATINGIVEL"
+        
+        linhas = np.flatnonzero(validas & np.isfinite(precos_fechados))
+        if len(linhas) == 0:
+            return resultado
+        
+        df_calculo = df.iloc[linhas].copy()
+        # Sem quantidade, resolve o preço unitário de um pedido de uma caixa
+        quantidade = _coluna_numerica(df_calculo, "Quantidade")[0]
+        df_calculo["Quantidade"] = np.where(arredondar_array(quantidade, 0) > 0, quantidade, 1.0)
+        
+        centavos, encontrados = self._refinar_centavos(df_calculo, margem[linhas], precos_fechados[linhas])
+        df_calculo["Preço de Venda"] = centavos / 100.0
+        finais = self.calculadora.calcular_resultados_dataframe(df_calculo)
+        
+        posicoes_ok = linhas[encontrados]
+        resultado.iloc[posicoes_ok, resultado.columns.get_loc("Preço Alvo")] = centavos[encontrados] / 100.0
+        resultado.iloc[posicoes_ok, resultado.columns.get_loc("Margem Líquida %")] = \
+            finais["Margem Líquida %"].to_numpy()[encontrados]
+        resultado.iloc[posicoes_ok, resultado.columns.get_loc("Lucro Líquido")] = \
+            finais["Lucro Líquido"].to_numpy()[encontrados]
+        resultado.iloc[posicoes_ok, resultado.columns.get_loc("Situação")] = "OK"
+        resultado.iloc[linhas[~encontrados], resultado.columns.get_loc("Situação")] = "INATINGIVEL"
+        return resultado
+    
+    def _preco_forma_fechada(self, df: pd.DataFrame, margem: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Preço sem arredondamentos: o lucro antes do IR é linear no subtotal S,
+        L = a·S − Q, e o lucro líquido é L, 0,76·L ou 0,66·L + 2.000 conforme a faixa
+        de L. Resolve as três retas e fica com o menor S consistente com sua faixa.
+        """
+        cif = self.tipo_frete == "CIF"
+        colunas = ["Custo NET", "Custo Fixo", "Quantidade", "IPI", "MVA", "FCP"]
+        colunas += CalculadoraResultados.DESPESAS_PERCENTUAIS + (["Frete Caixa"] if cif else [])
+        valores = {}
+        invalidas = np.zeros(len(df), dtype=bool)
+        for coluna in colunas:
+            valores[coluna], invalidos = _coluna_numerica(df, coluna)
+            invalidas |= invalidos
+        if "Preço de Venda" in df.columns:
+            invalidas |= _coluna_numerica(df, "Preço de Venda")[1]
+        
+        quantidade = arredondar_array(valores["Quantidade"], 0)
+        quantidade = np.where(quantidade > 0, quantidade, 1.0)
+        custo_unit = arredondar_array(arredondar_array(valores["Custo NET"]) + arredondar_array(valores["Custo Fixo"]))
+        frete_unit = valores["Frete Caixa"] if cif else 0.0
+        custos = quantidade * (custo_unit + frete_unit)
+        
+        despesas = np.zeros(len(df))
+        for coluna in CalculadoraResultados.DESPESAS_PERCENTUAIS:
+            despesas = despesas + valores[coluna]
+        fcp = np.where(~(valores["MVA"] <= 0) & (valores["FCP"] > 0), (1 + valores["IPI"]) * valores["FCP"], 0.0)
+        a = 1 - despesas - fcp
+        
+        # (fator do lucro líquido, constante, faixa de L)
+        regimes = [
+            (1.0, 0.0, -np.inf, 0.0),
+            (self.FATOR_LUCRO_SEM_ADICIONAL, 0.0, 0.0, self.LIMITE_ADICIONAL_IRPJ),
+            (self.FATOR_LUCRO_COM_ADICIONAL, 0.10 * self.LIMITE_ADICIONAL_IRPJ, self.LIMITE_ADICIONAL_IRPJ, np.inf),
+        ]
+        subtotal = np.full(len(df), np.inf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for fator, constante, minimo, maximo in regimes:
+                # fator·(a·S − Q) + constante = margem·S
+                candidato = (fator * custos - constante) / (fator * a - margem)
+                lucro = a * candidato - custos
+                consistente = (np.isfinite(candidato) & (candidato >= 0)
+                               & (lucro > minimo - 1e-9) & (lucro <= maximo + 1e-9))
+                subtotal = np.where(consistente & (candidato < subtotal), candidato, subtotal)
+        
+        validas = ~invalidas & np.isfinite(margem) & np.isfinite(custos) & np.isfinite(a)
+        return np.where(validas, subtotal / quantidade, np.nan), validas
+    
+    def _atinge(self, df_calculo: pd.DataFrame, centavos: np.ndarray, margem: np.ndarray) -> np.ndarray:
+        """Avalia o modelo completo: o preço em centavos atinge a margem?"""
+        df_calculo["Preço de Venda"] = np.maximum(centavos, 0) / 100.0
+        resultados = self.calculadora.calcular_resultados_dataframe(df_calculo)
+        subtotal = resultados["Subtotal"].to_numpy()
+        lucro_liquido = resultados["Lucro Líquido"].to_numpy()
+        return (centavos >= 0) & (lucro_liquido >= margem * subtotal - 1e-9)
+    
+    def _refinar_centavos(self, df_calculo: pd.DataFrame, margem: np.ndarray,
+                          precos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bisseção em centavos inteiros sobre o modelo completo, começando por um
+        intervalo em volta do preço da forma fechada e ampliando-o até cercar a raiz.
+        """
+        centro = np.ceil(np.round(precos * 100, 6))
+        passo = np.full(len(centro), float(self.PASSO_INICIAL_CENTAVOS))
+        baixo = np.maximum(centro - passo, -1.0)
+        alto = centro + passo
+        
+        for _ in range(self.MAXIMO_EXPANSOES):
+            baixo_atinge = self._atinge(df_calculo, baixo, margem)
+            alto_atinge = self._atinge(df_calculo, alto, margem)
+            pendentes = baixo_atinge | ~alto_atinge
+            if not pendentes.any():
+                break
+            passo = np.where(pendentes, passo * 2, passo)
+            baixo = np.where(baixo_atinge, np.maximum(baixo - passo, -1.0), baixo)
+            alto = np.where(alto_atinge, alto, alto + passo)
+        encontrados = ~baixo_atinge & alto_atinge
         
-        return df_resultado, alertas
\ No newline at end of file
+        while True:
+            abertos = encontrados & (alto - baixo > 1)
+            if not abertos.any():
+                break
+            meio = np.where(abertos, np.floor((baixo + alto) / 2), alto)
+            atinge = self._atinge(df_calculo, meio, margem)
+            alto = np.where(abertos & atinge, meio, alto)
+            baixo = np.where(abertos & ~atinge, meio, baixo)
+        return alto, encontrados
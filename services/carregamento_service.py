@@ -0,0 +1,341 @@
+"""
+Carregamento de Pallets
+=======================
+Distribui os pallets (fechados e incompletos) de um pedido entre os tipos de
+veículo com o menor custo total, respeitando posições de pallet, peso e cubagem.
+Heurística first-fit decreasing para qualquer tamanho de pedido e busca exata
+(branch-and-bound) para pedidos pequenos.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def montar_pallets(produtos, quantidade: np.ndarray, caixas_pallet: np.ndarray,
+                   peso_caixa: np.ndarray, volume_caixa: np.ndarray) -> pd.DataFrame:
+    """
+    Expande cada linha do pedido em pallets: um por pallet fechado e um para o
+    resto de caixas. Retorna produto, caixas, peso e volume de cada pallet.
+    """
+    produtos = np.asarray(produtos, dtype=object)
+    quantidade = np.asarray(quantidade, dtype=float)
+    fechados = (quantidade // caixas_pallet).astype(int)
+    resto = quantidade - fechados * caixas_pallet
+
+    linhas_fechados = np.repeat(np.arange(len(quantidade)), fechados)
+    linhas_resto = np.flatnonzero(resto > 0)
+    linhas = np.concatenate([linhas_fechados, linhas_resto])
+    caixas = np.concatenate([caixas_pallet[linhas_fechados], resto[linhas_resto]])
+
+    return pd.DataFrame({
+        'produto': produtos[linhas],
+        'caixas': caixas,
+        'peso': caixas * peso_caixa[linhas],
+        'volume': caixas * volume_caixa[linhas],
+    })
+
+
+class OtimizadorCarregamento:
+    """Empacota pallets em veículos (nome, pallets, peso, volume, custo) com o menor custo"""
+
+    LIMITE_PALLETS_EXATO = 40     # acima disso apenas a heurística
+    LIMITE_NOS_EXATO = 50000      # nós visitados pela busca exata antes de desistir
+    MAX_PASSADAS_MELHORIA = 3     # varreduras de união e esvaziamento de veículos na heurística
+
+    def __init__(self, veiculos: List[dict]):
+        if not veiculos:
+            raise ValueError("Informe ao menos um tipo de veículo")
+        self.veiculos = veiculos
+        self._nomes = [v['nome'] for v in veiculos]
+        # Capacidades por tipo: posições de pallet, peso (kg) e volume (m³)
+        self._capacidades = np.array([[v['pallets'], v['peso'], v['volume']] for v in veiculos], dtype=float)
+        self._custos = np.array([v['custo'] for v in veiculos], dtype=float)
+
+    def otimizar(self, pallets: pd.DataFrame, exato: Optional[bool] = None) -> dict:
+        """
+        Retorna o plano de carregamento: custo total, quantidade por tipo, lista de
+        veículos com suas cargas e a alocação de cada pallet. Com exato=None a busca
+        exata roda apenas até LIMITE_PALLETS_EXATO pallets.
+        """
+        cargas = np.column_stack([
+            np.ones(len(pallets)),
+            pallets['peso'].to_numpy(dtype=float),
+            pallets['volume'].to_numpy(dtype=float),
+        ]) if len(pallets) else np.zeros((0, 3))
+
+        # Pallets que não cabem em nenhum veículo vão sozinhos no maior e são sinalizados
+        cabe = self._tipos_que_comportam(cargas).any(axis=1)
+        excedentes = np.flatnonzero(~cabe)
+        itens = np.flatnonzero(cabe)
+
+        veiculos, otimo = self._heuristica(cargas, itens), False
+        if exato or (exato is None and len(itens) <= self.LIMITE_PALLETS_EXATO):
+            veiculos, otimo = self._branch_and_bound(cargas, itens, veiculos)
+
+        maior = int(np.argmax(self._capacidades[:, 0]))
+        veiculos = veiculos + [(maior, [int(i)]) for i in excedentes]
+        return self._montar_plano(pallets, cargas, veiculos, otimo, len(excedentes))
+
+    def _tipos_que_comportam(self, cargas: np.ndarray) -> np.ndarray:
+        """Matriz (cargas x tipos) indicando quais tipos comportam cada carga"""
+        return (cargas[:, None, :] <= self._capacidades[None, :, :] + 1e-9).all(axis=2)
+
+    def _tipo_mais_barato(self, carga: np.ndarray) -> int:
+        """Tipo mais barato que comporta a carga (-1 se nenhum)"""
+        cabe = (carga <= self._capacidades + 1e-9).all(axis=1)
+        if not cabe.any():
+            return -1
+        return int(np.flatnonzero(cabe)[np.argmin(self._custos[cabe])])
+
+    def _custos_mais_baratos(self, cargas: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """_tipo_mais_barato de várias cargas de uma vez: tipos (-1 se nenhum) e custos (inf se nenhum)"""
+        custos = np.where(self._tipos_que_comportam(cargas), self._custos[None, :], np.inf)
+        tipos = np.argmin(custos, axis=1)
+        custos = custos[np.arange(len(cargas)), tipos]
+        return np.where(np.isfinite(custos), tipos, -1), custos
+
+    def _custo(self, veiculos: List[Tuple[int, List[int]]]) -> float:
+        return float(sum(self._custos[tipo] for tipo, _ in veiculos))
+
+    def _ordenar(self, cargas: np.ndarray, itens: np.ndarray, capacidade: Optional[np.ndarray] = None) -> np.ndarray:
+        """Itens em ordem decrescente da maior fração de capacidade que ocupam"""
+        if not len(itens):
+            return itens
+        capacidade = self._capacidades.max(axis=0) if capacidade is None else capacidade
+        fracao = (cargas[itens] / capacidade).max(axis=1)
+        return itens[np.argsort(-fracao, kind='stable')]
+
+    def _heuristica(self, cargas: np.ndarray, itens: np.ndarray) -> List[Tuple[int, List[int]]]:
+        """
+        First-fit decreasing em veículos de cada tipo (e em veículos de qualquer tipo);
+        depois cada veículo troca para o tipo mais barato que comporta sua carga, pares
+        são unidos e veículos são esvaziados enquanto sair mais barato. Fica o melhor
+        resultado entre as partidas.
+        """
+        comportam = self._tipos_que_comportam(cargas[itens])
+        partidas = [tipo for tipo in range(len(self.veiculos)) if comportam[:, tipo].all()] + [None]
+        melhor = None
+        for tipo in partidas:
+            ordem = self._ordenar(cargas, itens, None if tipo is None else self._capacidades[tipo])
+            grupos: List[List[int]] = []
+            ocupacao = np.zeros((len(ordem), 3))
+            for item in ordem:
+                # Primeiro veículo aberto que comporta o item (teste vetorizado em todos)
+                novas = ocupacao[:len(grupos)] + cargas[item]
+                if tipo is None:
+                    cabe = self._tipos_que_comportam(novas).any(axis=1)
+                else:
+                    cabe = (novas <= self._capacidades[tipo] + 1e-9).all(axis=1)
+                posicoes = np.flatnonzero(cabe)
+                if len(posicoes):
+                    grupos[posicoes[0]].append(int(item))
+                    ocupacao[posicoes[0]] = novas[posicoes[0]]
+                else:
+                    ocupacao[len(grupos)] = cargas[item]
+                    grupos.append([int(item)])
+
+            ocupacao = ocupacao[:len(grupos)]
+            grupos, ocupacao = self._unir_grupos(grupos, ocupacao)
+            grupos, ocupacao = self._esvaziar_veiculos(cargas, grupos, ocupacao)
+            tipos, _ = self._custos_mais_baratos(ocupacao)
+            veiculos = [(int(t), grupo) for t, grupo in zip(tipos, grupos)]
+            if melhor is None or self._custo(veiculos) < self._custo(melhor):
+                melhor = veiculos
+        return melhor
+
+    def _unir_grupos(self, grupos: List[List[int]], ocupacao: np.ndarray):
+        """
+        Une pares de veículos quando um único veículo sai mais barato que os dois.
+        Cada veículo é comparado com os seguintes de uma vez; após uma união o mesmo
+        veículo é testado de novo, sem recomeçar a varredura (até MAX_PASSADAS_MELHORIA).
+        """
+        _, custos = self._custos_mais_baratos(ocupacao)
+        for _ in range(self.MAX_PASSADAS_MELHORIA):
+            unido = False
+            i = 0
+            while i < len(grupos) - 1:
+                juntas = ocupacao[i] + ocupacao[i + 1:]
+                _, custos_juntas = self._custos_mais_baratos(juntas)
+                vantajosas = np.flatnonzero(custos_juntas < custos[i] + custos[i + 1:] - 1e-9)
+                if not len(vantajosas):
+                    i += 1
+                    continue
+                k = vantajosas[0]
+                j = i + 1 + k
+                grupos[i] = grupos[i] + grupos[j]
+                ocupacao[i], custos[i] = juntas[k], custos_juntas[k]
+                del grupos[j]
+                ocupacao, custos = np.delete(ocupacao, j, axis=0), np.delete(custos, j)
+                unido = True
+            if not unido:
+                break
+        return grupos, ocupacao
+
+    def _esvaziar_veiculos(self, cargas: np.ndarray, grupos: List[List[int]], ocupacao: np.ndarray):
+        """
+        Tenta redistribuir os pallets de cada veículo (do menos ocupado ao mais) entre
+        os demais, aceitando trocar de tipo, e elimina o veículo quando o custo total cai.
+        Uma eliminação não reinicia a varredura; são no máximo MAX_PASSADAS_MELHORIA.
+        """
+        _, custos = self._custos_mais_baratos(ocupacao)
+        for _ in range(self.MAX_PASSADAS_MELHORIA):
+            if len(grupos) <= 1:
+                break
+            melhorou = False
+            ocupacao_relativa = (ocupacao / self._capacidades.max(axis=0)).max(axis=1)
+            for grupo_alvo in [grupos[k] for k in np.argsort(ocupacao_relativa, kind='stable')]:
+                if len(grupos) <= 1:
+                    break
+                alvo = next(k for k, grupo in enumerate(grupos) if grupo is grupo_alvo)
+                nova, novos_custos = ocupacao.copy(), custos.copy()
+                destinos = {}
+                for item in self._ordenar(cargas, np.array(grupo_alvo)):
+                    juntas = nova + cargas[item]
+                    _, custos_juntas = self._custos_mais_baratos(juntas)
+                    aumento = custos_juntas - novos_custos
+                    aumento[alvo] = np.inf
+                    j = int(np.argmin(aumento))
+                    if not np.isfinite(aumento[j]):
+                        break
+                    nova[j], novos_custos[j] = juntas[j], custos_juntas[j]
+                    destinos[int(item)] = j
+                else:
+                    if novos_custos.sum() - novos_custos[alvo] < custos.sum() - 1e-9:
+                        for item, j in destinos.items():
+                            grupos[j].append(item)
+                        del grupos[alvo]
+                        ocupacao, custos = np.delete(nova, alvo, axis=0), np.delete(novos_custos, alvo)
+                        melhorou = True
+            if not melhorou:
+                break
+        return grupos, ocupacao
+
+    def _custo_cobertura(self, demanda: float, dimensao: int) -> float:
+        """Menor custo de uma combinação de veículos cuja capacidade na dimensão cobre a demanda"""
+        if demanda <= 1e-9:
+            return 0.0
+        capacidades = self._capacidades[:, dimensao]
+        custos = self._custos
+
+        def cobrir(tipo: int, falta: float) -> float:
+            if falta <= 1e-9:
+                return 0.0
+            if tipo == len(custos) - 1:
+                return np.ceil(falta / capacidades[tipo] - 1e-9) * custos[tipo]
+            maximo = int(np.ceil(falta / capacidades[tipo] - 1e-9))
+            return min(n * custos[tipo] + cobrir(tipo + 1, falta - n * capacidades[tipo])
+                       for n in range(maximo + 1))
+
+        return float(cobrir(0, demanda))
+
+    def _branch_and_bound(self, cargas: np.ndarray, itens: np.ndarray,
+                          inicial: List[Tuple[int, List[int]]]) -> Tuple[List[Tuple[int, List[int]]], bool]:
+        """
+        Busca exata partindo da heurística. Os veículos abertos não têm tipo fixo:
+        cada um custa o tipo mais barato que comporta a carga atual, o que evita
+        ramificar por tipo. Limite inferior: demanda restante além da folga dos
+        veículos abertos, coberta pela combinação inteira de veículos mais barata
+        em cada dimensão.
+        """
+        ordem = self._ordenar(cargas, itens)
+        n = len(ordem)
+        carga_itens = cargas[ordem]
+        restante = np.vstack([np.cumsum(carga_itens[::-1], axis=0)[::-1], np.zeros((1, 3))])
+        capacidade_maxima = self._capacidades.max(axis=0)
+
+        melhor = {'custo': self._custo(inicial), 'grupos': None}
+        abertos: List[List[int]] = []
+        ocupacao: List[np.ndarray] = []
+        custos: List[float] = []
+        nos = [0]
+
+        def limite_inferior(k: int, custo_atual: float) -> float:
+            folga = sum((capacidade_maxima - carga for carga in ocupacao), np.zeros(3))
+            excesso = np.maximum(restante[k] - folga, 0.0)
+            return custo_atual + max(self._custo_cobertura(excesso[d], d) for d in range(3))
+
+        def buscar(k: int, custo_atual: float) -> None:
+            nos[0] += 1
+            if nos[0] > self.LIMITE_NOS_EXATO:
+                return
+            if k == n:
+                if custo_atual < melhor['custo'] - 1e-9:
+                    melhor['custo'] = custo_atual
+                    melhor['grupos'] = [list(grupo) for grupo in abertos]
+                return
+            if limite_inferior(k, custo_atual) >= melhor['custo'] - 1e-9:
+                return
+
+            carga = carga_itens[k]
+            vistos = set()
+            for i in range(len(abertos)):
+                nova = ocupacao[i] + carga
+                tipo = self._tipo_mais_barato(nova)
+                # Veículos com a mesma ocupação são equivalentes
+                chave = tuple(np.round(ocupacao[i], 6))
+                if tipo < 0 or chave in vistos:
+                    continue
+                vistos.add(chave)
+                anterior, custo_anterior = ocupacao[i], custos[i]
+                abertos[i].append(k)
+                ocupacao[i], custos[i] = nova, self._custos[tipo]
+                buscar(k + 1, custo_atual - custo_anterior + custos[i])
+                abertos[i].pop()
+                ocupacao[i], custos[i] = anterior, custo_anterior
+
+            tipo = self._tipo_mais_barato(carga)
+            abertos.append([k])
+            ocupacao.append(carga.copy())
+            custos.append(self._custos[tipo])
+            buscar(k + 1, custo_atual + custos[-1])
+            abertos.pop()
+            ocupacao.pop()
+            custos.pop()
+
+        buscar(0, 0.0)
+        otimo = nos[0] <= self.LIMITE_NOS_EXATO
+        if melhor['grupos'] is None:
+            return inicial, otimo
+        veiculos = []
+        for grupo in melhor['grupos']:
+            carga = carga_itens[grupo].sum(axis=0)
+            veiculos.append((self._tipo_mais_barato(carga), [int(ordem[k]) for k in grupo]))
+        return veiculos, otimo
+
+    def _montar_plano(self, pallets: pd.DataFrame, cargas: np.ndarray,
+                      veiculos: List[Tuple[int, List[int]]], otimo: bool, excedentes: int) -> dict:
+        """Resumo do carregamento e alocação de cada pallet"""
+        veiculos = sorted(veiculos, key=lambda v: (-self._capacidades[v[0], 0], -len(v[1])))
+        alocacao = np.full(len(pallets), -1)
+        lista = []
+        for numero, (tipo, grupo) in enumerate(veiculos, start=1):
+            carga = cargas[grupo].sum(axis=0)
+            alocacao[grupo] = numero
+            lista.append({
+                'veiculo': numero,
+                'tipo': self._nomes[tipo],
+                'pallets': int(carga[0]),
+                'peso': float(carga[1]),
+                'volume': float(carga[2]),
+                'custo': float(self._custos[tipo]),
+                'ocupacao_pallets': float(carga[0] / self._capacidades[tipo, 0]),
+                'ocupacao_peso': float(carga[1] / self._capacidades[tipo, 1]),
+                'ocupacao_volume': float(carga[2] / self._capacidades[tipo, 2]),
+            })
+
+        quantidades: Dict[str, int] = {nome: 0 for nome in self._nomes}
+        for veiculo in lista:
+            quantidades[veiculo['tipo']] += 1
+
+        detalhes = pallets.copy()
+        detalhes['veiculo'] = alocacao
+        return {
+            'custo_total': float(sum(v['custo'] for v in lista)),
+            'quantidades': quantidades,
+            'veiculos': lista,
+            'alocacao': detalhes,
+            'otimo': otimo,
+            'pallets_excedentes': excedentes,
+        }
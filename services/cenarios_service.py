@@ -0,0 +1,332 @@
+"""
+Serviço de Cenários
+===================
+Prepara a base de cálculo de uma ou várias UFs de destino, calcula os
+resultados de todos os produtos em todas as UFs numa única passada vetorizada
+e avalia grades de cenários (comissão, frete, custo fixo...) em paralelo.
+"""
+
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from config.tributaria import ConfiguracaoTributaria
+from services.calculation_service import CalculadoraResultados
+
+UF_ORIGEM_PADRAO = 'SP'
+
+COLUNAS_NECESSARIAS = [
+    "Preço de Venda", "Quantidade", "Frete Caixa", "%Estrategico", "IPI",
+    "ICMS ST", "ICMS", "MVA", "Comissão", "Bonificação", "COFINS", "PIS",
+    "Contigência", "ICMS Interestadual", "ICMS Interno Destino", "FCP"
+]
+
+# Colunas por produto da tela (editadas, comissão/bonificação híbridas e frete otimizado
+# pelo volume) que podem ser repetidas em todas as UFs da matriz
+COLUNAS_AJUSTE_PRODUTO = [
+    "Preço de Venda", "Quantidade", "Custo NET", "Custo Fixo", "Frete Caixa", "Comissão", "Bonificação"
+]
+
+# Parâmetros globais opcionais -> coluna substituída (None ou ausente = mantém a planilha)
+PARAMETROS_OPCIONAIS = {
+    'custo_fixo_global': "Custo Fixo",
+    'comissao_padrao': "Comissão",
+    'bonificacao_global': "Bonificação",
+}
+
+
+def _aliquotas_por_uf(ufs: pd.Series) -> Dict[str, pd.Series]:
+    """Alíquotas interna e FCP de destino de cada linha, a partir da coluna de UF"""
+    aliquotas = {uf: ConfiguracaoTributaria.obter_aliquotas(str(uf)) for uf in ufs.unique()}
+    return {
+        chave: ufs.map({uf: valores[chave] for uf, valores in aliquotas.items()}).astype(float)
+        for chave in ('interna', 'fcp')
+    }
+
+
+def ajustar_colunas_necessarias(df: pd.DataFrame, uf_origem: str = UF_ORIGEM_PADRAO) -> pd.DataFrame:
+    """Cria as colunas de cálculo ausentes; as alíquotas de destino vêm da coluna UF de cada linha"""
+    aliquotas_origem = ConfiguracaoTributaria.obter_aliquotas(uf_origem)
+    aliquotas_destino = _aliquotas_por_uf(df["UF"])
+
+    for col in COLUNAS_NECESSARIAS:
+        if col not in df.columns:
+            if col == "Quantidade":
+                df[col] = 1
+            elif col == "ICMS Interestadual":
+                df[col] = aliquotas_origem['interestadual']
+            elif col == "ICMS Interno Destino":
+                df[col] = aliquotas_destino['interna']
+            elif col == "FCP":
+                df[col] = aliquotas_destino['fcp']
+            else:
+                df[col] = 0.0
+
+    return df
+
+
+def parametros_da_tela(parametros: dict) -> dict:
+    """Na tela, 0 nos parâmetros opcionais significa "não informado": vira None"""
+    return {
+        chave: (None if chave in PARAMETROS_OPCIONAIS and not (valor or 0) > 0 else valor)
+        for chave, valor in parametros.items()
+    }
+
+
+def aplicar_parametros_globais(df: pd.DataFrame, parametros: dict, uf_origem: str = UF_ORIGEM_PADRAO) -> pd.DataFrame:
+    """
+    Aplica frete, contrato, alíquotas e percentuais globais. Os opcionais
+    (PARAMETROS_OPCIONAIS) valem sempre que informados, inclusive 0.
+    """
+    aliquotas_origem = ConfiguracaoTributaria.obter_aliquotas(uf_origem)
+    aliquotas_destino = _aliquotas_por_uf(df["UF"])
+
+    # Aplicar frete (pode vir do cliente ou manual)
+    df["Frete Caixa"] = parametros.get('frete_padrao', 1.50)
+
+    # Outros parâmetros
+    df["Contrato"] = parametros.get('contrato_percentual', 0.01)
+    df["UF Origem"] = uf_origem
+    df["UF Destino"] = df["UF"]
+    df["ICMS Interestadual"] = aliquotas_origem['interestadual']
+    df["ICMS Interno Destino"] = aliquotas_destino['interna']
+    df["FCP"] = aliquotas_destino['fcp']
+
+    # Parâmetros globais opcionais: None mantém o valor da planilha
+    for chave, coluna in PARAMETROS_OPCIONAIS.items():
+        valor = parametros.get(chave)
+        if valor is not None:
+            df[coluna] = valor
+
+    return df
+
+
+def preparar_dados_cenario(df_padrao: pd.DataFrame, ufs_destino: Union[str, Iterable[str]], parametros: dict,
+                           produtos: Optional[Iterable[str]] = None,
+                           uf_origem: str = UF_ORIGEM_PADRAO) -> pd.DataFrame:
+    """
+    Base de cálculo das UFs de destino (linhas da planilha de cada UF), com as
+    colunas necessárias e os parâmetros globais aplicados. Não depende do estado da sessão.
+    """
+    ufs = [ufs_destino] if isinstance(ufs_destino, str) else list(ufs_destino)
+    df = df_padrao[df_padrao["UF"].isin(ufs)]
+    if produtos is not None:
+        df = df[df["Descrição"].isin(list(produtos))]
+    df = df.copy()
+
+    df = ajustar_colunas_necessarias(df, uf_origem)
+    return aplicar_parametros_globais(df, parametros, uf_origem)
+
+
+def calcular_matriz_uf(df_padrao: pd.DataFrame, parametros: dict, ufs: Optional[Iterable[str]] = None,
+                       produtos: Optional[Iterable[str]] = None, tipo_frete: str = "CIF",
+                       ajustes: Optional[pd.DataFrame] = None,
+                       uf_origem: str = UF_ORIGEM_PADRAO) -> pd.DataFrame:
+    """
+    Resultados produto × UF em formato longo (UF, Descrição e colunas de
+    CalculadoraResultados), calculados numa única chamada vetorizada.
+
+    ajustes: valores por produto (ex.: preço e quantidade editados na tela),
+    com a coluna Descrição, repetidos em todas as UFs.
+    """
+    if ufs is None:
+        ufs = list(ConfiguracaoTributaria.ICMS_ALIQUOTAS)
+    base = preparar_dados_cenario(df_padrao, ufs, parametros, produtos, uf_origem)
+
+    if ajustes is not None and not base.empty:
+        valores = ajustes.drop_duplicates("Descrição").set_index("Descrição")
+        for coluna in COLUNAS_AJUSTE_PRODUTO:
+            if coluna in valores.columns:
+                ajustado = base["Descrição"].map(valores[coluna])
+                base[coluna] = ajustado.where(ajustado.notna(), base[coluna])
+
+    resultados = CalculadoraResultados(tipo_frete).calcular_resultados_dataframe(base)
+    matriz = pd.concat([base[["UF", "Descrição"]], resultados], axis=1)
+    return matriz.sort_values("UF", kind="mergesort").reset_index(drop=True)
+
+
+def pivotar_matriz(matriz: pd.DataFrame, coluna: str = "Margem Líquida %") -> pd.DataFrame:
+    """Tabela produto × UF de uma coluna de resultado (mapa nacional)"""
+    return matriz.pivot_table(index="Descrição", columns="UF", values=coluna, aggfunc="first", sort=False)
+
+
+def resumir_matriz_por_uf(matriz: pd.DataFrame) -> pd.DataFrame:
+    """Totais por UF de destino e margem líquida ponderada pelo subtotal"""
+    colunas: List[str] = ["Subtotal", "Total NF", "ICMS-ST", "FCP", "Lucro Antes IR", "Lucro Líquido"]
+    resumo = matriz.groupby("UF", sort=True)[colunas].sum()
+    resumo["Margem Líquida %"] = (resumo["Lucro Líquido"] / resumo["Subtotal"].where(resumo["Subtotal"] > 0) * 100).round(1)
+    return resumo.reset_index()
+
+
+# Parâmetros que podem variar numa varredura de cenários
+PARAMETROS_CENARIO = [
+    'comissao_padrao', 'bonificacao_global', 'contrato_percentual',
+    'custo_fixo_global', 'frete_padrao', 'tipo_frete'
+]
+
+# Planilha de custos dos processos de varredura: herdada no fork ou recebida uma vez no initializer
+_TABELA_CUSTOS: Optional[pd.DataFrame] = None
+
+
+def montar_grade_cenarios(base: Optional[dict] = None, **valores: Iterable[Any]) -> List[dict]:
+    """Produto cartesiano dos valores de cada parâmetro, a partir dos parâmetros base"""
+    desconhecidos = set(valores) - set(PARAMETROS_CENARIO)
+    if desconhecidos:
+        raise ValueError(f"Parâmetros de cenário desconhecidos: {', '.join(sorted(desconhecidos))}")
+    
+    nomes = list(valores)
+    return [
+        {**(base or {}), **dict(zip(nomes, combinacao))}
+        for combinacao in itertools.product(*(list(valores[nome]) for nome in nomes))
+    ]
+
+
+def resumir_resultados(resultados: pd.DataFrame) -> Dict[str, float]:
+    """Totais de um cenário e margem líquida ponderada pelo subtotal"""
+    subtotal = float(resultados["Subtotal"].sum())
+    lucro_liquido = float(resultados["Lucro Líquido"].sum())
+    return {
+        'produtos': int(len(resultados)),
+        'subtotal': subtotal,
+        'total_nf': float(resultados["Total NF"].sum()),
+        'custo_total': float(resultados["Custo Total"].sum()),
+        'frete_total': float(resultados["Frete Total"].sum()),
+        'lucro_antes_ir': float(resultados["Lucro Antes IR"].sum()),
+        'lucro_liquido': lucro_liquido,
+        'margem_liquida_pct': round(lucro_liquido / subtotal * 100, 1) if subtotal > 0 else 0.0,
+        'produtos_com_prejuizo': int((resultados["Lucro Líquido"] < 0).sum()),
+    }
+
+
+def avaliar_cenario(df_padrao: pd.DataFrame, cenario: dict, ufs_destino: Union[str, Iterable[str]],
+                    produtos: Optional[Iterable[str]] = None,
+                    uf_origem: str = UF_ORIGEM_PADRAO) -> List[Dict[str, Any]]:
+    """Calcula um cenário e devolve uma linha de resumo por UF de destino"""
+    base = preparar_dados_cenario(df_padrao, ufs_destino, cenario, produtos, uf_origem)
+    resultados = CalculadoraResultados(cenario.get('tipo_frete', 'CIF')).calcular_resultados_dataframe(base)
+    
+    linhas = []
+    for uf, indices in base.groupby("UF", sort=True).groups.items():
+        linhas.append({**cenario, 'UF': uf, **resumir_resultados(resultados.loc[indices])})
+    return linhas
+
+
+def _inicializar_processo(tabela_custos: pd.DataFrame) -> None:
+    """Recebe a planilha uma única vez por processo (métodos de início sem fork)"""
+    global _TABELA_CUSTOS
+    _TABELA_CUSTOS = tabela_custos
+
+
+def _avaliar_lote(cenarios: List[dict], ufs_destino: List[str], produtos: Optional[List[str]],
+                  uf_origem: str) -> List[Dict[str, Any]]:
+    """Avalia um lote de cenários com a planilha do processo"""
+    linhas = []
+    for cenario in cenarios:
+        linhas.extend(avaliar_cenario(_TABELA_CUSTOS, cenario, ufs_destino, produtos, uf_origem))
+    return linhas
+
+
+@contextmanager
+def pool_com_planilha(df_padrao: pd.DataFrame, max_processos: int,
+                      metodo_inicio: Optional[str] = None) -> Iterator[ProcessPoolExecutor]:
+    """
+    Pool de processos em que _TABELA_CUSTOS é a planilha: herdada no fork (cópia
+    sob demanda, sem serialização) ou enviada uma vez por processo pelo initializer.
+    """
+    global _TABELA_CUSTOS
+    # fork com outras threads vivas (ex.: atualizações em segundo plano) pode herdar locks travados
+    if metodo_inicio is None:
+        metodo_inicio = ("fork" if "fork" in multiprocessing.get_all_start_methods()
+                         and threading.active_count() == 1 else "spawn")
+    usar_fork = metodo_inicio == "fork"
+    if usar_fork:
+        inicializador, argumentos = None, ()
+        _TABELA_CUSTOS = df_padrao
+    else:
+        inicializador, argumentos = _inicializar_processo, (df_padrao,)
+    
+    try:
+        with ProcessPoolExecutor(max_workers=max_processos, mp_context=multiprocessing.get_context(metodo_inicio),
+                                 initializer=inicializador, initargs=argumentos) as executor:
+            yield executor
+    finally:
+        if usar_fork:
+            _TABELA_CUSTOS = None
+
+
+def varrer_cenarios(df_padrao: pd.DataFrame, cenarios: List[dict], ufs_destino: Union[str, Iterable[str]],
+                    produtos: Optional[Iterable[str]] = None, max_processos: Optional[int] = None,
+                    tamanho_lote: Optional[int] = None, uf_origem: str = UF_ORIGEM_PADRAO,
+                    metodo_inicio: Optional[str] = None) -> pd.DataFrame:
+    """
+    Avalia uma grade de cenários num pool de processos, uma linha por cenário e UF.
+    Só os parâmetros trafegam por tarefa (a planilha vai uma vez por processo, ver
+    pool_com_planilha). Com um único processo ou poucos cenários, roda no próprio processo.
+    """
+    ufs = [ufs_destino] if isinstance(ufs_destino, str) else list(ufs_destino)
+    produtos = list(produtos) if produtos is not None else None
+    if not cenarios:
+        return pd.DataFrame()
+    
+    max_processos = max_processos or os.cpu_count() or 1
+    max_processos = min(max_processos, len(cenarios))
+    if max_processos <= 1:
+        linhas = [linha for cenario in cenarios
+                  for linha in avaliar_cenario(df_padrao, cenario, ufs, produtos, uf_origem)]
+        return pd.DataFrame(linhas)
+    
+    # Lotes para diluir o custo de cada tarefa, ainda com folga para balancear os processos
+    tamanho_lote = tamanho_lote or max(1, math.ceil(len(cenarios) / (max_processos * 4)))
+    lotes = [cenarios[i:i + tamanho_lote] for i in range(0, len(cenarios), tamanho_lote)]
+    
+    with pool_com_planilha(df_padrao, max_processos, metodo_inicio) as executor:
+        futuros = [executor.submit(_avaliar_lote, lote, ufs, produtos, uf_origem) for lote in lotes]
+        linhas = [linha for futuro in futuros for linha in futuro.result()]
+    return pd.DataFrame(linhas)
+
+
+def precificar_pedidos(df_padrao: pd.DataFrame, pedidos: pd.DataFrame, parametros: dict,
+                       tipo_frete: str = "CIF", uf_origem: str = UF_ORIGEM_PADRAO) -> pd.DataFrame:
+    """
+    Resultados completos de pedidos em formato longo (uma linha por pedido, cliente,
+    UF e produto). Quantidade e as colunas de COLUNAS_AJUSTE_PRODUTO preenchidas no
+    pedido substituem os valores da planilha. Saem com resultados vazios os produtos
+    sem linha na planilha da UF (Situação PRODUTO_NAO_ENCONTRADO) e os que ficaram
+    sem Preço de Venda positivo no pedido e na planilha (Situação SEM_PRECO).
+    """
+    pedidos = pedidos.reset_index(drop=True)
+    base = preparar_dados_cenario(df_padrao, pedidos["UF"].dropna().unique(), parametros, uf_origem=uf_origem)
+    base = base.drop_duplicates(["UF", "Descrição"], keep="first")
+    
+    linhas = pedidos[["UF", "Descrição"]].merge(base, on=["UF", "Descrição"], how="left", indicator=True)
+    for coluna in [c for c in COLUNAS_AJUSTE_PRODUTO if c in pedidos.columns]:
+        # Célula vazia no pedido mantém o valor da planilha
+        linhas[coluna] = pedidos[coluna].where(pedidos[coluna].notna(), linhas.get(coluna))
+    encontrados = (linhas.pop("_merge") == "both").to_numpy()
+    preco = pd.to_numeric(linhas["Preço de Venda"], errors="coerce").to_numpy(dtype=float)
+    sem_preco = encontrados & ~(preco > 0)
+    calcular = encontrados & ~sem_preco
+    
+    resultados = pd.DataFrame(index=pedidos.index, columns=CalculadoraResultados.COLUNAS_RESULTADO, dtype=float)
+    if calcular.any():
+        calculados = CalculadoraResultados(tipo_frete).calcular_resultados_dataframe(linhas[calcular])
+        resultados.loc[calcular] = calculados.to_numpy()
+    
+    situacao = pd.Series(
+        np.select([sem_preco, encontrados], ["SEM_PRECO", "OK"], "PRODUTO_NAO_ENCONTRADO"),
+        index=pedidos.index, name="Situação"
+    )
+    return pd.concat([pedidos, situacao, resultados], axis=1)
+
+
+def precificar_pedidos_do_pool(pedidos: pd.DataFrame, parametros: dict, tipo_frete: str, uf_origem: str) -> pd.DataFrame:
+    """Precifica um lote de pedidos com a planilha do processo"""
+    return precificar_pedidos(_TABELA_CUSTOS, pedidos, parametros, tipo_frete, uf_origem)
@@ -0,0 +1,151 @@
+"""
+Sincronização de Clientes
+=========================
+Mantém um snapshot local dos clientes e aplica apenas as linhas alteradas
+desde a última sincronização (marca d'água), em vez de recarregar tudo.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+
+class SincronizadorClientes:
+    """Snapshot de clientes atualizado de forma incremental, com troca atômica"""
+    
+    CHAVE = ['A1_COD', 'A1_LOJA']
+    COLUNA_MARCA = '_MARCA'   # marca d'água (S_T_A_M_P_, rowversion...) devolvida pelas consultas
+    COLUNA_ATIVO = '_ATIVO'   # 0 = bloqueado, excluído ou fora da tabela de fretes (tombstone)
+    
+    INTERVALO_SINCRONIZACAO = 60            # segundos entre consultas incrementais
+    INTERVALO_RECARGA_COMPLETA = 24 * 3600  # recarga completa periódica para corrigir desvios
+    INTERVALO_SEM_MARCA = 600               # sem coluna de marca: recarga completa como o antigo TTL
+    
+    def __init__(self, carregar_completo: Callable[[], pd.DataFrame],
+                 carregar_alteracoes: Callable[[Any], pd.DataFrame],
+                 intervalo_sincronizacao: Optional[float] = None,
+                 intervalo_recarga_completa: Optional[float] = None,
+                 pos_processar: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None):
+        self.carregar_completo = carregar_completo
+        self.carregar_alteracoes = carregar_alteracoes
+        # Aplicado a cada novo snapshot antes da troca (ex.: compactação de tipos)
+        self.pos_processar = pos_processar
+        self.intervalo_sincronizacao = (intervalo_sincronizacao if intervalo_sincronizacao is not None
+                                        else self.INTERVALO_SINCRONIZACAO)
+        self.intervalo_recarga_completa = (intervalo_recarga_completa if intervalo_recarga_completa is not None
+                                           else self.INTERVALO_RECARGA_COMPLETA)
+        
+        self._snapshot: Optional[pd.DataFrame] = None
+        self._marca: Any = None
+        self._ultima_sincronizacao = 0.0
+        self._ultima_recarga_completa = 0.0
+        self._lock = threading.Lock()
+        self.estatisticas: Dict[str, Any] = {
+            'recargas_completas': 0, 'sincronizacoes_incrementais': 0,
+            'linhas_alteradas': 0, 'tombstones': 0, 'ultimo_erro': None
+        }
+    
+    @property
+    def marca(self) -> Any:
+        """Maior marca d'água já aplicada (None sem coluna de marca)"""
+        return self._marca
+    
+    def obter(self) -> pd.DataFrame:
+        """
+        Retorna o snapshot atual, sincronizando antes se o intervalo venceu.
+        Se outra thread já estiver sincronizando, devolve o snapshot vigente sem esperar.
+        """
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._sincronizar(completa=True)
+            return self._snapshot
+        
+        if self._sincronizacao_vencida() and self._lock.acquire(blocking=False):
+            try:
+                if self._sincronizacao_vencida():
+                    self._sincronizar(completa=self._recarga_completa_vencida())
+            finally:
+                self._lock.release()
+        return self._snapshot
+    
+    def sincronizar(self, completa: bool = False) -> pd.DataFrame:
+        """Força uma sincronização (incremental ou completa) e retorna o novo snapshot"""
+        with self._lock:
+            self._sincronizar(completa=completa or self._snapshot is None or self._marca is None)
+        return self._snapshot
+    
+    def _sincronizacao_vencida(self) -> bool:
+        intervalo = self.intervalo_sincronizacao if self._marca is not None else self.INTERVALO_SEM_MARCA
+        return time.time() - self._ultima_sincronizacao >= intervalo
+    
+    def _recarga_completa_vencida(self) -> bool:
+        return self._marca is None or time.time() - self._ultima_recarga_completa >= self.intervalo_recarga_completa
+    
+    def _sincronizar(self, completa: bool) -> None:
+        """Executa a sincronização (chamado com o lock); em erro mantém o snapshot anterior"""
+        agora = time.time()
+        try:
+            if completa:
+                df = self.carregar_completo()
+                marca = self._maior_marca(df, None)
+                novo = df.drop(columns=[self.COLUNA_MARCA, self.COLUNA_ATIVO], errors='ignore')
+                self._ultima_recarga_completa = agora
+                self.estatisticas['recargas_completas'] += 1
+            else:
+                alteracoes = self.carregar_alteracoes(self._marca)
+                marca = self._maior_marca(alteracoes, self._marca)
+                novo = self.aplicar_alteracoes(self._snapshot, alteracoes)
+                self.estatisticas['sincronizacoes_incrementais'] += 1
+                self.estatisticas['linhas_alteradas'] += len(alteracoes)
+                if self.COLUNA_ATIVO in alteracoes.columns:
+                    self.estatisticas['tombstones'] += int((alteracoes[self.COLUNA_ATIVO] == 0).sum())
+            if self.pos_processar is not None and novo is not self._snapshot:
+                novo = self.pos_processar(novo)
+            self.estatisticas['ultimo_erro'] = None
+        except Exception as e:
+            self.estatisticas['ultimo_erro'] = str(e)
+            if self._snapshot is None:
+                self._snapshot = pd.DataFrame()
+            self._ultima_sincronizacao = agora
+            return
+        
+        # Troca atômica: leitores veem o snapshot antigo ou o novo, nunca um intermediário
+        self._snapshot = novo
+        self._marca = marca
+        self._ultima_sincronizacao = agora
+    
+    @classmethod
+    def _maior_marca(cls, df: pd.DataFrame, atual: Any) -> Any:
+        """Maior marca d'água entre a atual e as linhas recebidas"""
+        if cls.COLUNA_MARCA not in df.columns:
+            return atual
+        marcas = df[cls.COLUNA_MARCA].dropna()
+        if marcas.empty:
+            return atual
+        maior = marcas.max()
+        return maior if atual is None or maior > atual else atual
+    
+    @classmethod
+    def aplicar_alteracoes(cls, snapshot: pd.DataFrame, alteracoes: pd.DataFrame) -> pd.DataFrame:
+        """
+        Substitui todas as linhas das chaves alteradas pelas linhas ativas recebidas;
+        chaves recebidas só como inativas (tombstones) saem do snapshot.
+        """
+        if alteracoes.empty:
+            return snapshot
+        
+        chaves_alteradas = pd.MultiIndex.from_frame(alteracoes[cls.CHAVE].astype(str)).unique()
+        chaves_snapshot = pd.MultiIndex.from_frame(snapshot[cls.CHAVE].astype(str))
+        mantidas = snapshot[~chaves_snapshot.isin(chaves_alteradas)]
+        
+        ativas = alteracoes
+        if cls.COLUNA_ATIVO in alteracoes.columns:
+            ativas = alteracoes[alteracoes[cls.COLUNA_ATIVO] != 0]
+        ativas = ativas.reindex(columns=snapshot.columns)
+        
+        if ativas.empty:
+            return mantidas.reset_index(drop=True)
+        return pd.concat([mantidas, ativas], ignore_index=True)
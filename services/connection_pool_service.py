@@ -0,0 +1,218 @@
+"""
+Pool de Conexões
+================
+Pool limitado e thread-safe de conexões DB-API, com verificação de saúde,
+descarte de conexões ociosas e métricas de uso.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolConexoes:
+    """Reaproveita conexões criadas por uma fábrica (pyodbc.connect, sqlite3.connect, ...)"""
+    
+    TAMANHO_MAXIMO_PADRAO = 5
+    TIMEOUT_ESPERA_PADRAO = 30.0          # segundos aguardando uma conexão livre
+    TEMPO_OCIOSO_MAXIMO_PADRAO = 300.0    # conexões paradas além disso são fechadas
+    INTERVALO_VERIFICACAO_PADRAO = 30.0   # ociosas há mais tempo são testadas antes do uso
+    CONSULTA_SAUDE = "SELECT 1"
+    
+    def __init__(self, fabrica: Callable[[], Any], tamanho_maximo: Optional[int] = None,
+                 timeout_espera: Optional[float] = None, tempo_ocioso_maximo: Optional[float] = None,
+                 intervalo_verificacao: Optional[float] = None):
+        self.fabrica = fabrica
+        self.tamanho_maximo = tamanho_maximo or self.TAMANHO_MAXIMO_PADRAO
+        self.timeout_espera = timeout_espera if timeout_espera is not None else self.TIMEOUT_ESPERA_PADRAO
+        self.tempo_ocioso_maximo = (tempo_ocioso_maximo if tempo_ocioso_maximo is not None
+                                    else self.TEMPO_OCIOSO_MAXIMO_PADRAO)
+        self.intervalo_verificacao = (intervalo_verificacao if intervalo_verificacao is not None
+                                      else self.INTERVALO_VERIFICACAO_PADRAO)
+        
+        self._condicao = threading.Condition()
+        self._ociosas: deque = deque()  # (conexao, momento_devolucao), mais recente à direita
+        self._em_uso = 0
+        self._total = 0
+        # fechar() inicia uma nova geração: conexões emprestadas antes dela são descartadas na devolução
+        self._geracao = 0
+        self._geracoes: Dict[int, int] = {}  # id(conexao emprestada) -> geração
+        
+        # Métricas
+        self._criadas = 0
+        self._tempo_criacao_total = 0.0
+        self._descartadas = 0
+        self._esperas = 0
+        self._tempo_espera_total = 0.0
+        self._emprestimos = 0
+    
+    @contextmanager
+    def conexao(self):
+        """
+        Empresta uma conexão; se o uso for interrompido por qualquer exceção (inclusive
+        as de controle do Streamlit, que não derivam de Exception), ela é descartada
+        em vez de devolvida.
+        """
+        conexao = self.adquirir()
+        descartar = True
+        try:
+            yield conexao
+            descartar = False
+        finally:
+            self.liberar(conexao, descartar=descartar)
+    
+    def adquirir(self) -> Any:
+        """Retorna uma conexão saudável, aguardando até timeout_espera se o pool estiver cheio"""
+        limite = time.monotonic() + self.timeout_espera
+        inicio_espera = None
+        
+        with self._condicao:
+            while True:
+                self._despejar_ociosas()
+                
+                if self._ociosas:
+                    conexao, devolvida_em = self._ociosas.pop()
+                    self._em_uso += 1
+                    self._geracoes[id(conexao)] = self._geracao
+                    break
+                
+                if self._total < self.tamanho_maximo:
+                    # Reserva a vaga; a conexão é criada fora do lock
+                    self._total += 1
+                    self._em_uso += 1
+                    conexao, devolvida_em = None, None
+                    break
+                
+                if inicio_espera is None:
+                    inicio_espera = time.monotonic()
+                    self._esperas += 1
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._tempo_espera_total += time.monotonic() - inicio_espera
+                    raise TimeoutError(
+                        f"Nenhuma conexão livre em {self.timeout_espera:.0f}s "
+                        f"(pool com {self.tamanho_maximo} conexões em uso)"
+                    )
+                self._condicao.wait(restante)
+            
+            if inicio_espera is not None:
+                self._tempo_espera_total += time.monotonic() - inicio_espera
+            self._emprestimos += 1
+        
+        if conexao is not None:
+            if time.time() - devolvida_em < self.intervalo_verificacao or self._saudavel(conexao):
+                return conexao
+            self._fechar(conexao)
+            with self._condicao:
+                self._geracoes.pop(id(conexao), None)
+                self._descartadas += 1
+        
+        return self._criar()
+    
+    def liberar(self, conexao: Any, descartar: bool = False) -> None:
+        """Devolve a conexão ao pool (desfazendo transação aberta) ou a descarta"""
+        with self._condicao:
+            if self._geracoes.pop(id(conexao), self._geracao) != self._geracao:
+                descartar = True
+        
+        if not descartar:
+            try:
+                conexao.rollback()
+            except Exception:
+                descartar = True
+        
+        if descartar:
+            self._fechar(conexao)
+        
+        with self._condicao:
+            self._em_uso -= 1
+            if descartar:
+                self._total -= 1
+                self._descartadas += 1
+            else:
+                self._ociosas.append((conexao, time.time()))
+            self._condicao.notify()
+    
+    def _criar(self) -> Any:
+        """Cria uma conexão para a vaga já reservada em adquirir"""
+        inicio = time.perf_counter()
+        try:
+            conexao = self.fabrica()
+        except Exception:
+            with self._condicao:
+                self._em_uso -= 1
+                self._total -= 1
+                self._condicao.notify()
+            raise
+        
+        with self._condicao:
+            self._criadas += 1
+            self._tempo_criacao_total += time.perf_counter() - inicio
+            self._geracoes[id(conexao)] = self._geracao
+        return conexao
+    
+    def _saudavel(self, conexao: Any) -> bool:
+        """Executa a consulta de saúde na conexão"""
+        try:
+            cursor = conexao.cursor()
+            try:
+                cursor.execute(self.CONSULTA_SAUDE)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+    
+    def _despejar_ociosas(self) -> None:
+        """Fecha conexões ociosas há mais de tempo_ocioso_maximo (chamado com o lock)"""
+        if not self.tempo_ocioso_maximo:
+            return
+        limite = time.time() - self.tempo_ocioso_maximo
+        # As mais antigas ficam à esquerda
+        while self._ociosas and self._ociosas[0][1] < limite:
+            conexao, _ = self._ociosas.popleft()
+            self._fechar(conexao)
+            self._total -= 1
+            self._descartadas += 1
+    
+    @staticmethod
+    def _fechar(conexao: Any) -> None:
+        """Fecha a conexão ignorando erros (ela pode já estar quebrada)"""
+        try:
+            conexao.close()
+        except Exception:
+            pass
+    
+    def metricas(self) -> Dict[str, float]:
+        """Retorna contadores de uso do pool"""
+        with self._condicao:
+            self._despejar_ociosas()
+            return {
+                'tamanho_maximo': self.tamanho_maximo,
+                'abertas': self._total,
+                'em_uso': self._em_uso,
+                'ociosas': len(self._ociosas),
+                'criadas': self._criadas,
+                'descartadas': self._descartadas,
+                'emprestimos': self._emprestimos,
+                'esperas': self._esperas,
+                'tempo_espera_total': self._tempo_espera_total,
+                'tempo_medio_criacao': (self._tempo_criacao_total / self._criadas) if self._criadas else 0.0
+            }
+    
+    def fechar(self) -> None:
+        """
+        Fecha as conexões ociosas; as emprestadas são fechadas (e liberam a vaga)
+        quando devolvidas. O pool continua utilizável.
+        """
+        with self._condicao:
+            while self._ociosas:
+                conexao, _ = self._ociosas.popleft()
+                self._fechar(conexao)
+                self._total -= 1
+                self._descartadas += 1
+            self._geracao += 1
+            self._condicao.notify_all()
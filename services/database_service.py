@@ -4,9 +4,21 @@ Serviço de Banco de Dados - Versão Corrigida
 Gerencia conexões e consultas ao banco de dados.
 """
 
+import re
+
 import pandas as pd
-import pyodbc
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
+
+from services.cache_service import cache_swr, status_caches_swr
+from services.cliente_sync_service import SincronizadorClientes
+from services.connection_pool_service import PoolConexoes
+from utils.data_utils import compactar_clientes, compactar_tabela_frete, relatorio_memoria
+
+try:
+    import pyodbc
+    HAS_PYODBC = True
+except ImportError:
+    HAS_PYODBC = False
 
 # Importar streamlit apenas quando necessário para evitar problemas de import
 try:
@@ -16,15 +28,6 @@ except ImportError:
     HAS_STREAMLIT = False
 
 
-def st_cache_data(ttl=600):
-    """Decorator condicional para cache"""
-    def decorator(func):
-        if HAS_STREAMLIT:
-            return st.cache_data(ttl=ttl)(func)
-        return func
-    return decorator
-
-
 def st_error(message):
     """Função condicional para erro"""
     if HAS_STREAMLIT:
@@ -36,15 +39,11 @@ def st_error(message):
 class DatabaseService:
     """Serviço para gerenciar conexões e consultas ao banco de dados"""
     
-    def __init__(self, connection_string: str):
-        self.connection_string = connection_string
+    # Coluna de alteração do Protheus usada como marca d'água (None = sempre recarga completa)
+    COLUNA_MARCA_PADRAO = "S_T_A_M_P_"
     
-    @st_cache_data(ttl=600)
-    def carregar_clientes_ou_rede(_self) -> pd.DataFrame:
-        """Carrega dados dos clientes do banco de dados"""
-        try:
-            with pyodbc.connect(_self.connection_string) as conexao:
-                query = """
+    # Colunas e junções comuns às consultas de clientes
+    _SELECT_CLIENTES = """
                     SELECT 
                         SA1.A1_COD, 
                         SA1.A1_LOJA,
@@ -55,7 +54,6 @@ class DatabaseService:
                         SA1.A1_RISCO,
                         SA1.A1_ZZCONTR,
                         SA1.A1_LC,
-				        SA1.A1_END,                         
                         SA1.A1_MCOMPRA,
                         SA1.A1_ULTCOM,
                         SA1.A1_EST,
@@ -66,25 +64,148 @@ class DatabaseService:
                         cep.longitude,
                         cep.latitude,
                         cep.nome_logradouro_sem_acento,
-                        ibge.cidade_ibge,
-		        		T.CIDADE,
-		        		T.FAIXA_KM,
-		        		T.TBL_TRCK,
-		        		T.TBL_CRRT
+                        ibge.cidade_ibge{colunas_extras}
                     FROM SA1010 SA1
-                    INNER JOIN cep.dbo.tbl_cep_202504_n_logradouro AS cep 
+                    {tipo_join} cep.dbo.tbl_cep_202504_n_logradouro AS cep 
                         ON cep.cep COLLATE Latin1_General_CI_AS = SA1.A1_CEP COLLATE Latin1_General_CI_AS
-                    INNER JOIN cep.dbo.tbl_cep_202504_n_cidade_ibge AS ibge 
+                    {tipo_join} cep.dbo.tbl_cep_202504_n_cidade_ibge AS ibge 
                         ON ibge.id_cidade = cep.cidade_id
-                    INNER JOIN BISOBEL.dbo.TRANSP_TARGET T ON T.COD_IBGE COLLATE Latin1_General_CI_AS = ibge.cidade_ibge 
+    """
+    _EXISTE_TARIFA = """EXISTS (
+                          SELECT 1 FROM BISOBEL.dbo.TRANSP_TARGET T
+                          WHERE T.COD_IBGE COLLATE Latin1_General_CI_AS = ibge.cidade_ibge
+                      )"""
+    
+    def __init__(self, connection_string: str, fabrica_conexao: Optional[Callable[[], Any]] = None,
+                 tamanho_pool: Optional[int] = None, coluna_marca: Optional[str] = COLUNA_MARCA_PADRAO):
+        self.connection_string = connection_string
+        # Fábrica plugável: em testes pode ser, por exemplo, sqlite3.connect
+        self.pool = PoolConexoes(fabrica_conexao or self._conectar_pyodbc, tamanho_maximo=tamanho_pool)
+        
+        if coluna_marca and not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", coluna_marca):
+            raise ValueError(f"Nome de coluna de marca inválido: {coluna_marca}")
+        self.coluna_marca = coluna_marca
+        self.relatorio_memoria_clientes: Optional[Dict[str, Any]] = None
+        self.sincronizador_clientes = SincronizadorClientes(
+            self._consultar_clientes_completo, self._consultar_clientes_alterados,
+            pos_processar=self._compactar_clientes
+        )
+    
+    def _conectar_pyodbc(self):
+        """Abre uma nova conexão ODBC (usada pelo pool)"""
+        if not HAS_PYODBC:
+            raise ImportError("pyodbc não está instalado")
+        return pyodbc.connect(self.connection_string)
+    
+    def metricas_pool(self) -> Dict[str, float]:
+        """Métricas do pool de conexões (em uso, esperas, tempo de criação...)"""
+        return self.pool.metricas()
+    
+    def carregar_clientes_ou_rede(self) -> pd.DataFrame:
+        """Carrega dados dos clientes (snapshot local sincronizado de forma incremental)"""
+        df = self.sincronizador_clientes.obter()
+        erro = self.sincronizador_clientes.estatisticas['ultimo_erro']
+        if erro:
+            st_error(f"Erro ao carregar dados dos clientes: {erro}")
+        return df
+    
+    def _compactar_clientes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Compacta cada novo snapshot de clientes e guarda o relatório de memória"""
+        compactado = compactar_clientes(df)
+        self.relatorio_memoria_clientes = relatorio_memoria(df, compactado)
+        return compactado
+    
+    def _consultar_clientes_completo(self) -> pd.DataFrame:
+        """Carga completa dos clientes ativos, com a marca d'água quando a coluna existe"""
+        filtro = f"""
                     WHERE SA1.A1_MSBLQL = '2'
                       AND SA1.D_E_L_E_T_ = ''
-                """
-                return pd.read_sql(query, conexao)
+                      AND {self._EXISTE_TARIFA}
+        """
+        with self.pool.conexao() as conexao:
+            if self.coluna_marca:
+                try:
+                    query = self._SELECT_CLIENTES.format(
+                        colunas_extras=f",\n                        SA1.{self.coluna_marca} AS _MARCA",
+                        tipo_join="INNER JOIN"
+                    ) + filtro
+                    return pd.read_sql(query, conexao)
+                except Exception as e:
+                    # Só a ausência da coluna desativa a marca; falhas transitórias sobem
+                    if not self._coluna_inexistente(e):
+                        raise
+                    # Sem a coluna de marca: segue com recargas completas
+                    st_error(f"Coluna de marca {self.coluna_marca} indisponível, sincronização incremental desativada: {e}")
+                    self.coluna_marca = None
+                    conexao.rollback()
+            
+            query = self._SELECT_CLIENTES.format(colunas_extras="", tipo_join="INNER JOIN") + filtro
+            return pd.read_sql(query, conexao)
+    
+    @staticmethod
+    def _coluna_inexistente(erro: BaseException) -> bool:
+        """
+        Erro de coluna inválida (SQLSTATE 42S22 / "Invalid column name" no SQL Server,
+        "no such column" no SQLite), inclusive quando embrulhado pelo pandas
+        """
+        while erro is not None:
+            argumentos = getattr(erro, 'args', ())
+            if argumentos and argumentos[0] == '42S22':
+                return True
+            mensagem = str(erro).lower()
+            if '42s22' in mensagem or 'invalid column name' in mensagem or 'no such column' in mensagem:
+                return True
+            erro = erro.__cause__ or erro.__context__
+        return False
+    
+    def _consultar_clientes_alterados(self, marca) -> pd.DataFrame:
+        """
+        Linhas alteradas desde a marca, incluindo bloqueadas/excluídas e sem CEP ou
+        tarifa (LEFT JOIN), marcadas com _ATIVO = 0 para serem removidas do snapshot.
+        """
+        colunas_extras = f""",
+                        SA1.{self.coluna_marca} AS _MARCA,
+                        CASE WHEN SA1.A1_MSBLQL = '2' AND SA1.D_E_L_E_T_ = ''
+                                  AND ibge.cidade_ibge IS NOT NULL AND {self._EXISTE_TARIFA}
+                             THEN 1 ELSE 0 END AS _ATIVO"""
+        # >= para não perder linhas gravadas no mesmo instante da marca (reaplicar é idempotente)
+        query = self._SELECT_CLIENTES.format(colunas_extras=colunas_extras, tipo_join="LEFT JOIN") + \
+            f"\n                    WHERE SA1.{self.coluna_marca} >= ?"
+        if isinstance(marca, pd.Timestamp):
+            marca = marca.to_pydatetime()
+        with self.pool.conexao() as conexao:
+            return pd.read_sql(query, conexao, params=[marca])
+    
+    def carregar_tabela_frete(self) -> pd.DataFrame:
+        """Carrega a tabela de fretes TRANSP_TARGET, uma linha por (IBGE, faixa de KM)"""
+        try:
+            return self._consultar_tabela_frete()
         except Exception as e:
-            st_error(f"Erro ao carregar dados dos clientes: {e}")
+            st_error(f"Erro ao carregar tabela de fretes: {e}")
             return pd.DataFrame()
     
+    @cache_swr(ttl_segundos=600)
+    def _consultar_tabela_frete(self) -> pd.DataFrame:
+        """
+        Consulta a TRANSP_TARGET (cache stale-while-revalidate). A ordem é fixa para que
+        a carga seja reproduzível: quando um (IBGE, faixa) tem tarifas conflitantes,
+        fica a linha de maior tarifa de truck (e depois de carreta), a opção conservadora.
+        """
+        with self.pool.conexao() as conexao:
+            query = """
+                SELECT
+                    T.COD_IBGE AS cidade_ibge,
+                    T.CIDADE,
+                    T.FAIXA_KM,
+                    T.TBL_TRCK,
+                    T.TBL_CRRT
+                FROM BISOBEL.dbo.TRANSP_TARGET T
+                ORDER BY T.COD_IBGE, T.FAIXA_KM, T.TBL_TRCK DESC, T.TBL_CRRT DESC, T.CIDADE
+            """
+            df = pd.read_sql(query, conexao)
+            df = df.drop_duplicates(['cidade_ibge', 'FAIXA_KM'], keep='first').reset_index(drop=True)
+            return compactar_tabela_frete(df)
+    
     def buscar_cliente_por_codigo(self, codigo: str, loja: str) -> Optional[dict]:
         """Busca cliente específico por código e loja"""
         try:
@@ -121,8 +242,8 @@ class DatabaseService:
     def get_faixas_frete_disponiveis(self) -> list:
         """Retorna lista das faixas de frete disponíveis no banco"""
         try:
-            df_clientes = self.carregar_clientes_ou_rede()
-            faixas = df_clientes['FAIXA_KM'].dropna().unique().tolist()
+            df_fretes = self.carregar_tabela_frete()
+            faixas = df_fretes['FAIXA_KM'].dropna().unique().tolist()
             return sorted(faixas)
         except Exception as e:
             st_error(f"Erro ao buscar faixas de frete: {e}")
@@ -131,7 +252,7 @@ class DatabaseService:
     def verificar_conexao(self) -> bool:
         """Verifica se a conexão com o banco está funcionando"""
         try:
-            with pyodbc.connect(self.connection_string) as conexao:
+            with self.pool.conexao() as conexao:
                 cursor = conexao.cursor()
                 cursor.execute("SELECT 1")
                 return True
@@ -139,25 +260,39 @@ class DatabaseService:
             st_error(f"Erro na conexão com banco: {e}")
             return False
 
-    @st_cache_data(ttl=600)
-    def carregar_produtos_truck_carreta(_self) -> pd.DataFrame:
+    def carregar_produtos_truck_carreta(self) -> pd.DataFrame:
         """Carrega tabela de logística de produtos"""
         try:
-            with pyodbc.connect(_self.connection_string) as conexao:
-                query = "SELECT * FROM BISOBEL.dbo.PRODUTOS_TRUCK_CARRETA"
-                df = pd.read_sql(query, conexao)
-                df.columns = df.columns.str.strip()
-
-                # Normalizar campos importantes
-                for col in ["CXS_PLT", "PESO", "PESO_KG", "VOLUME", "VOLUME_M3"]:
-                    if col in df.columns:
-                        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-                return df
+            return self._consultar_produtos_truck_carreta()
         except Exception as e:
             st_error(f"Erro ao carregar dados logísticos: {e}")
             return pd.DataFrame()
     
+    @cache_swr(ttl_segundos=600)
+    def _consultar_produtos_truck_carreta(self) -> pd.DataFrame:
+        """Consulta a PRODUTOS_TRUCK_CARRETA (cache stale-while-revalidate)"""
+        with self.pool.conexao() as conexao:
+            query = "SELECT * FROM BISOBEL.dbo.PRODUTOS_TRUCK_CARRETA"
+            df = pd.read_sql(query, conexao)
+            df.columns = df.columns.str.strip()
+
+            # Normalizar campos importantes
+            for col in ["CXS_PLT", "PESO", "PESO_KG", "VOLUME", "VOLUME_M3"]:
+                if col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors="coerce")
+
+            return df
+    
+    def status_caches(self) -> dict:
+        """Última atualização, duração e erros dos caches de consultas e da sincronização de clientes"""
+        status = status_caches_swr(self)
+        status['clientes'] = dict(self.sincronizador_clientes.estatisticas)
+        if self.relatorio_memoria_clientes:
+            relatorio = self.relatorio_memoria_clientes
+            status['clientes'].update({chave: relatorio[chave] for chave in
+                                       ('total_antes', 'total_depois', 'reducao_percentual')})
+        return status
+    
     @staticmethod
     def get_default_connection_string() -> str:
         """Retorna string de conexão padrão"""
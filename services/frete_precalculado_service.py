@@ -0,0 +1,306 @@
+"""
+Serviço de Frete Pré-calculado
+==============================
+Tabela local cliente x origem -> distância, faixa de KM e fretes truck/carreta,
+atualizada de forma incremental em segundo plano.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.cache import ConfiguracaoCache
+from config.veiculos import ConfiguracaoVeiculos
+from utils.frete_utils import FreightTariffIndex, atribuir_faixas_km
+
+# (início, fim, rótulo) como retornado por extrair_faixas_km_ordenadas
+FaixaKm = Tuple[float, float, str]
+
+# Atualizações em andamento por arquivo (o simulador é recriado a cada rerun do Streamlit)
+_EXECUCOES: Dict[str, dict] = {}
+_EXECUCOES_LOCK = threading.Lock()
+
+
+class FretePrecalculadoService:
+    """Pré-calcula o frete de todos os clientes ativos para cada origem disponível"""
+    
+    COLUNAS_ASSINATURA_CLIENTE = ['A1_CEP', 'latitude', 'longitude', 'cidade_ibge', 'A1_EST']
+    COLUNAS_TARIFA = ['cidade_ibge', 'FAIXA_KM', 'TBL_TRCK', 'TBL_CRRT']
+    
+    def __init__(self, geo_service, caminho: Optional[str] = None):
+        self.geo_service = geo_service
+        self.caminho = caminho or ConfiguracaoCache.caminho_arquivo("frete_precalculado.sqlite")
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS frete_precalculado (
+                a1_cod TEXT NOT NULL,
+                a1_loja TEXT NOT NULL,
+                origem TEXT NOT NULL,
+                cidade_ibge TEXT,
+                distancia TEXT,
+                duracao TEXT,
+                distancia_km REAL,
+                status TEXT,
+                faixa_km TEXT,
+                truck_valor REAL,
+                truck_faixa TEXT,
+                truck_metodo TEXT,
+                carreta_valor REAL,
+                carreta_faixa TEXT,
+                carreta_metodo TEXT,
+                assinatura_cliente TEXT NOT NULL,
+                assinatura_tarifa TEXT NOT NULL,
+                tarifa_global INTEGER NOT NULL,
+                atualizado_em REAL NOT NULL,
+                PRIMARY KEY (a1_cod, a1_loja, origem)
+            )
+        """)
+        self._conexao.commit()
+    
+    @classmethod
+    def assinar_clientes(cls, clientes: pd.DataFrame) -> pd.Series:
+        """Hash dos campos que definem a rota do cliente (CEP, coordenadas, IBGE e UF)"""
+        colunas = [c for c in cls.COLUNAS_ASSINATURA_CLIENTE if c in clientes.columns]
+        hashes = pd.util.hash_pandas_object(clientes[colunas].astype(str), index=False)
+        return hashes.map('{:016x}'.format)
+    
+    @classmethod
+    def assinar_tarifas(cls, tabela_frete: pd.DataFrame,
+                        faixas_km: Optional[List[FaixaKm]] = None) -> Dict[str, str]:
+        """
+        Hash das linhas de tarifa de cada IBGE, mais a chave '*' para a tabela inteira.
+        A lista de faixas entra em todas as assinaturas: ela decide a faixa de qualquer cliente.
+        """
+        prefixo = repr([tuple(faixa) for faixa in faixas_km or []])
+        if tabela_frete.empty:
+            return {'*': ''}
+        
+        colunas = [c for c in cls.COLUNAS_TARIFA if c in tabela_frete.columns]
+        tabela = tabela_frete[colunas].astype(str).sort_values(colunas)
+        hashes = pd.util.hash_pandas_object(tabela, index=False).map('{:016x}'.format)
+        
+        assinaturas = {
+            ibge: hashlib.sha1((prefixo + ''.join(grupo)).encode()).hexdigest()
+            for ibge, grupo in hashes.groupby(tabela['cidade_ibge'].to_numpy(), sort=False)
+        }
+        assinaturas['*'] = hashlib.sha1((prefixo + ''.join(hashes)).encode()).hexdigest()
+        return assinaturas
+    
+    def obter(self, codigo: str, loja: str, origem: str) -> Optional[dict]:
+        """Leitura por chave do frete pré-calculado (None se ainda não calculado)"""
+        with self._lock:
+            cursor = self._conexao.execute(
+                "SELECT * FROM frete_precalculado WHERE a1_cod = ? AND a1_loja = ? AND origem = ?",
+                (str(codigo), str(loja), origem)
+            )
+            linha = cursor.fetchone()
+            if linha is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], linha))
+    
+    @staticmethod
+    def resultado_frete(registro: dict) -> dict:
+        """Converte o registro no mesmo formato retornado por buscar_frete_inteligente"""
+        resultado = {'capacidades': ConfiguracaoVeiculos.capacidades_caixas()}
+        for tipo in ('truck', 'carreta'):
+            resultado[tipo] = {
+                'valor': registro[f'{tipo}_valor'],
+                'faixa_usada': registro[f'{tipo}_faixa'],
+                'metodo': registro[f'{tipo}_metodo']
+            }
+        return resultado
+    
+    def _registros_existentes(self, origem: str) -> pd.DataFrame:
+        """Assinaturas já gravadas para a origem"""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT a1_cod, a1_loja, cidade_ibge, status, assinatura_cliente, assinatura_tarifa, tarifa_global "
+                "FROM frete_precalculado WHERE origem = ?",
+                self._conexao, params=(origem,)
+            )
+    
+    def clientes_pendentes(self, clientes: pd.DataFrame, assinaturas_tarifa: Dict[str, str],
+                           origem: str) -> pd.DataFrame:
+        """
+        Clientes novos, com CEP/coordenadas alteradas, cuja tarifa mudou ou cuja
+        distância não veio da API (estimada): esses são tentados de novo a cada atualização.
+        """
+        existentes = self._registros_existentes(origem)
+        if existentes.empty:
+            return clientes
+        
+        # Merge à esquerda com chave única à direita: preserva ordem e tamanho de `clientes`
+        comparacao = clientes[['A1_COD', 'A1_LOJA', '_assinatura']].merge(
+            existentes, how='left', left_on=['A1_COD', 'A1_LOJA'], right_on=['a1_cod', 'a1_loja']
+        )
+        
+        tarifa_esperada = np.where(
+            comparacao['tarifa_global'] == 1,
+            assinaturas_tarifa['*'],
+            comparacao['cidade_ibge'].map(assinaturas_tarifa).fillna('')
+        )
+        pendente = (
+            comparacao['a1_cod'].isna()
+            | (comparacao['status'] != 'OK')
+            | (comparacao['assinatura_cliente'] != comparacao['_assinatura'])
+            | (comparacao['assinatura_tarifa'] != tarifa_esperada)
+        )
+        return clientes[pendente.to_numpy()]
+    
+    def atualizar(self, clientes: pd.DataFrame, tabela_frete: pd.DataFrame, faixas_km: List[FaixaKm],
+                  origens: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Recalcula apenas os clientes pendentes para cada origem e remove os inativos.
+        Clientes sem distância (sem coordenadas ou sem rota) não são gravados; os de
+        distância estimada são gravados e voltam a ser tentados na próxima atualização.
+        """
+        estatisticas = {'recalculados': 0, 'mantidos': 0, 'removidos': 0}
+        if clientes.empty:
+            return estatisticas
+        
+        origens = origens or list(self.geo_service.ORIGENS_DISPONIVEIS.values())
+        indice = FreightTariffIndex(tabela_frete)
+        assinaturas_tarifa = self.assinar_tarifas(tabela_frete, faixas_km)
+        
+        clientes = clientes.drop_duplicates(['A1_COD', 'A1_LOJA']).reset_index(drop=True)
+        clientes['A1_COD'] = clientes['A1_COD'].astype(str)
+        clientes['A1_LOJA'] = clientes['A1_LOJA'].astype(str)
+        clientes['_assinatura'] = self.assinar_clientes(clientes)
+        
+        for origem in origens:
+            pendentes = self.clientes_pendentes(clientes, assinaturas_tarifa, origem)
+            estatisticas['mantidos'] += len(clientes) - len(pendentes)
+            if not pendentes.empty:
+                estatisticas['recalculados'] += self._gravar(
+                    self._calcular(origem, pendentes, indice, faixas_km, assinaturas_tarifa)
+                )
+            estatisticas['removidos'] += self._remover_inativos(origem, clientes)
+        
+        return estatisticas
+    
+    def _calcular(self, origem: str, clientes: pd.DataFrame, indice: FreightTariffIndex,
+                  faixas_km: List[FaixaKm], assinaturas_tarifa: Dict[str, str]) -> pd.DataFrame:
+        """Distância em lote, faixa de KM e fretes de cada combinação (IBGE, faixa) distinta"""
+        distancias = self.geo_service.calcular_distancias_lote(origem, clientes, estimar_sem_rota=True)
+        
+        registros = pd.DataFrame({
+            'a1_cod': clientes['A1_COD'],
+            'a1_loja': clientes['A1_LOJA'],
+            'origem': origem,
+            'cidade_ibge': clientes['cidade_ibge'].astype(str),
+            'distancia': distancias['distancia'],
+            'duracao': distancias['duracao'],
+            'distancia_km': distancias['distancia_km'],
+            'status': distancias['status'],
+            'assinatura_cliente': clientes['_assinatura'],
+        })
+        registros = registros[registros['distancia_km'].notna()].copy()
+        registros['faixa_km'] = atribuir_faixas_km(registros['distancia_km'], faixas_km)
+        
+        fretes = {}
+        for chave in set(zip(registros['cidade_ibge'], registros['faixa_km'])):
+            fretes[chave] = {tipo: indice.buscar(chave[0], chave[1], tipo) for tipo in ('truck', 'carreta')}
+        chaves = list(zip(registros['cidade_ibge'], registros['faixa_km']))
+        for tipo in ('truck', 'carreta'):
+            for posicao, campo in enumerate(('valor', 'faixa', 'metodo')):
+                registros[f'{tipo}_{campo}'] = [fretes[chave][tipo][posicao] for chave in chaves]
+        
+        # Fallback regional ou sem tarifa depende da tabela inteira, não só do IBGE
+        tarifa_global = (
+            registros['truck_metodo'].str.startswith(('regional', 'não encontrado'))
+            | registros['carreta_metodo'].str.startswith(('regional', 'não encontrado'))
+        )
+        registros['tarifa_global'] = tarifa_global.astype(int)
+        registros['assinatura_tarifa'] = np.where(
+            tarifa_global, assinaturas_tarifa['*'], registros['cidade_ibge'].map(assinaturas_tarifa).fillna('')
+        )
+        registros['atualizado_em'] = time.time()
+        return registros
+    
+    def _gravar(self, registros: pd.DataFrame) -> int:
+        """Grava (substituindo) os registros calculados"""
+        if registros.empty:
+            return 0
+        
+        colunas = list(registros.columns)
+        sql = (f"INSERT OR REPLACE INTO frete_precalculado ({', '.join(colunas)}) "
+               f"VALUES ({', '.join('?' * len(colunas))})")
+        linhas = registros.astype(object).where(registros.notna(), None).itertuples(index=False, name=None)
+        with self._lock:
+            self._conexao.executemany(sql, linhas)
+            self._conexao.commit()
+        return len(registros)
+    
+    def _remover_inativos(self, origem: str, clientes: pd.DataFrame) -> int:
+        """Remove registros de clientes que não estão mais na carteira ativa"""
+        existentes = self._registros_existentes(origem)
+        ativos = set(zip(clientes['A1_COD'], clientes['A1_LOJA']))
+        inativos = [(cod, loja) for cod, loja in zip(existentes['a1_cod'], existentes['a1_loja'])
+                    if (cod, loja) not in ativos]
+        if inativos:
+            with self._lock:
+                self._conexao.executemany(
+                    "DELETE FROM frete_precalculado WHERE a1_cod = ? AND a1_loja = ? AND origem = ?",
+                    [(cod, loja, origem) for cod, loja in inativos]
+                )
+                self._conexao.commit()
+        return len(inativos)
+    
+    def iniciar_atualizacao(self, clientes: pd.DataFrame, tabela_frete: pd.DataFrame,
+                            faixas_km: List[FaixaKm], origens: Optional[List[str]] = None,
+                            intervalo_minimo: Optional[int] = None) -> bool:
+        """
+        Dispara a atualização em segundo plano, uma por arquivo de cada vez e
+        respeitando o intervalo mínimo desde a última execução. Retorna se iniciou.
+        """
+        if intervalo_minimo is None:
+            intervalo_minimo = ConfiguracaoCache.FRETE_PRECALCULADO_INTERVALO_SEGUNDOS
+        
+        with _EXECUCOES_LOCK:
+            execucao = _EXECUCOES.get(self.caminho, {})
+            if execucao.get('thread') is not None and execucao['thread'].is_alive():
+                return False
+            if time.time() - execucao.get('fim', 0.0) < intervalo_minimo:
+                return False
+            
+            thread = threading.Thread(
+                target=self._executar_atualizacao,
+                args=(clientes.copy(), tabela_frete.copy(), list(faixas_km), origens),
+                name="frete-precalculado",
+                daemon=True
+            )
+            _EXECUCOES[self.caminho] = {'thread': thread, 'fim': execucao.get('fim', 0.0)}
+            thread.start()
+            return True
+    
+    def _executar_atualizacao(self, clientes, tabela_frete, faixas_km, origens) -> None:
+        """Corpo da thread: registra resultado ou erro da última execução"""
+        execucao = {'inicio': time.time()}
+        try:
+            execucao['resultado'] = self.atualizar(clientes, tabela_frete, faixas_km, origens)
+        except Exception as e:
+            execucao['erro'] = str(e)
+        execucao['fim'] = time.time()
+        with _EXECUCOES_LOCK:
+            _EXECUCOES[self.caminho].update(execucao)
+    
+    def status_atualizacao(self) -> dict:
+        """Situação da última atualização em segundo plano deste arquivo"""
+        with _EXECUCOES_LOCK:
+            execucao = dict(_EXECUCOES.get(self.caminho, {}))
+        thread = execucao.pop('thread', None)
+        execucao['em_execucao'] = thread is not None and thread.is_alive()
+        return execucao
+    
+    def aguardar(self, timeout: Optional[float] = None) -> None:
+        """Aguarda o término da atualização em andamento (útil em scripts e testes)"""
+        with _EXECUCOES_LOCK:
+            thread = _EXECUCOES.get(self.caminho, {}).get('thread')
+        if thread is not None:
+            thread.join(timeout)
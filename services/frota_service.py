@@ -0,0 +1,178 @@
+"""
+Otimização de Frota
+===================
+Combinação de tipos de veículo (mistos) de menor custo para transportar um
+volume de caixas. Programação dinâmica sobre a capacidade em caixas, calculada
+em blocos vetorizados; uma única chamada avalia muitos volumes (curvas de custo).
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.veiculos import ConfiguracaoVeiculos
+from utils.frete_utils import calcular_frete_otimizado
+
+
+class OtimizadorFrota:
+    """Menor custo para levar N caixas com qualquer mistura dos veículos informados"""
+
+    def __init__(self, veiculos: List[dict], perfil: Optional[Dict[str, float]] = None):
+        """
+        veiculos: dicts com nome, caixas, custo e, opcionalmente, pallets, peso e volume.
+        perfil: caixas_pallet, peso_caixa e volume_caixa da carga; limita a capacidade
+        em caixas de cada veículo pelas posições de pallet, peso e cubagem.
+        """
+        veiculos = [v for v in veiculos if v.get('custo', 0) > 0]
+        capacidades = np.array([self._capacidade_efetiva(v, perfil or {}) for v in veiculos], dtype=np.int64)
+        validos = capacidades > 0
+        if not validos.any():
+            raise ValueError("Nenhum veículo com custo e capacidade válidos")
+
+        # Maiores primeiro: em empate de custo a DP fica com menos veículos
+        ordem = np.argsort(-capacidades[validos], kind='stable')
+        self.veiculos = [veiculos[i] for i in np.flatnonzero(validos)[ordem]]
+        self.nomes = [v['nome'] for v in self.veiculos]
+        self.capacidades = capacidades[validos][ordem]
+        self.custos = np.array([v['custo'] for v in self.veiculos], dtype=float)
+
+        self._custo = np.zeros(1)                   # menor custo para cada volume 0..N
+        self._escolha = np.zeros(1, dtype=np.int64)  # veículo da última viagem na solução ótima
+
+    @classmethod
+    def do_frete(cls, resultado_frete: dict, tipos: Optional[List[str]] = None,
+                 perfil: Optional[Dict[str, float]] = None) -> 'OtimizadorFrota':
+        """
+        Monta o otimizador com as capacidades do catálogo e os custos sobre as tarifas
+        truck/carreta de um resultado de buscar_frete_inteligente (tipos sem tarifa ficam de fora).
+        """
+        tarifas = {tipo: resultado_frete.get(tipo, {}).get('valor', 0.0) for tipo in ('truck', 'carreta')}
+        veiculos = []
+        for veiculo in ConfiguracaoVeiculos.listar_veiculos(tipos or ConfiguracaoVeiculos.TIPOS_PADRAO):
+            veiculo['custo'] = ConfiguracaoVeiculos.custo_viagem(veiculo['nome'], tarifas)
+            veiculos.append(veiculo)
+        return cls(veiculos, perfil)
+
+    @staticmethod
+    def _capacidade_efetiva(veiculo: dict, perfil: Dict[str, float]) -> int:
+        """Caixas que cabem no veículo respeitando pallets, peso e cubagem do perfil"""
+        limites = [veiculo['caixas']]
+        if perfil.get('caixas_pallet') and veiculo.get('pallets'):
+            limites.append(veiculo['pallets'] * perfil['caixas_pallet'])
+        if perfil.get('peso_caixa') and veiculo.get('peso'):
+            limites.append(veiculo['peso'] / perfil['peso_caixa'])
+        if perfil.get('volume_caixa') and veiculo.get('volume'):
+            limites.append(veiculo['volume'] / perfil['volume_caixa'])
+        return int(np.floor(min(limites) + 1e-9))
+
+    def _estender(self, volume_maximo: int) -> None:
+        """
+        Estende a tabela da DP até volume_maximo. custo[v] = min_t(custo_t + custo[v - cap_t]);
+        como toda capacidade é >= à menor, cada bloco desse tamanho depende só dos anteriores
+        e é calculado de uma vez.
+        """
+        inicio = len(self._custo)
+        if volume_maximo < inicio:
+            return
+        custo = np.concatenate([self._custo, np.empty(volume_maximo + 1 - inicio)])
+        escolha = np.concatenate([self._escolha, np.empty(volume_maximo + 1 - inicio, dtype=np.int64)])
+        bloco = int(self.capacidades.min())
+        for a in range(inicio, volume_maximo + 1, bloco):
+            volumes = np.arange(a, min(a + bloco, volume_maximo + 1))
+            candidatos = self.custos[:, None] + custo[np.maximum(volumes[None, :] - self.capacidades[:, None], 0)]
+            escolha[volumes] = np.argmin(candidatos, axis=0)
+            custo[volumes] = candidatos[escolha[volumes], np.arange(len(volumes))]
+        self._custo, self._escolha = custo, escolha
+
+    def custo_minimo(self, volumes) -> np.ndarray:
+        """Menor custo de frete para cada volume (caixas, arredondadas para cima)"""
+        volumes = self._normalizar(volumes)
+        self._estender(int(volumes.max()) if len(volumes) else 0)
+        return self._custo[volumes]
+
+    def otimizar(self, volumes) -> pd.DataFrame:
+        """
+        Para cada volume: custo total, quantidade de cada tipo de veículo, capacidade
+        contratada, ocupação, frete por caixa e custo por caixa. O frete por caixa segue a
+        convenção da tabela de frete (custo total / capacidade contratada), a mesma de
+        calcular_frete_otimizado; o custo por caixa é o custo real de cada caixa embarcada
+        (custo total / volume), que cai à medida que a frota enche.
+        """
+        volumes = self._normalizar(volumes)
+        custo = self.custo_minimo(volumes)
+
+        # Reconstrução vetorizada: retira a última viagem de todos os volumes ao mesmo tempo
+        quantidades = np.zeros((len(volumes), len(self.nomes)), dtype=np.int64)
+        restante = volumes.copy()
+        ativos = np.flatnonzero(restante > 0)
+        while len(ativos):
+            tipo = self._escolha[restante[ativos]]
+            np.add.at(quantidades, (ativos, tipo), 1)
+            restante[ativos] = np.maximum(restante[ativos] - self.capacidades[tipo], 0)
+            ativos = ativos[restante[ativos] > 0]
+
+        capacidade = quantidades @ self.capacidades
+        resultado = pd.DataFrame({'volume': volumes, 'custo_total': custo})
+        for i, nome in enumerate(self.nomes):
+            resultado[nome] = quantidades[:, i]
+        resultado['veiculos'] = quantidades.sum(axis=1)
+        resultado['capacidade_total'] = capacidade
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resultado['ocupacao'] = np.where(capacidade > 0, volumes / capacidade * 100, 0.0)
+            resultado['frete_por_caixa'] = np.where(capacidade > 0, custo / capacidade, 0.0)
+            resultado['custo_por_caixa'] = np.where(volumes > 0, custo / volumes, 0.0)
+        return resultado
+
+    @staticmethod
+    def _normalizar(volumes) -> np.ndarray:
+        volumes = np.atleast_1d(np.asarray(volumes, dtype=float))
+        return np.ceil(np.nan_to_num(np.maximum(volumes, 0))).astype(np.int64)
+
+
+def descrever_composicao(linha: pd.Series, nomes: List[str]) -> str:
+    """Texto da composição da frota, ex.: '1 carreta + 1 truck'"""
+    return " + ".join(f"{int(linha[nome])} {nome}" for nome in nomes if linha[nome] > 0)
+
+
+def calcular_frete_frota(resultado_frete: dict, quantidade_total: float,
+                         tipos: Optional[List[str]] = None) -> dict:
+    """
+    calcular_frete_otimizado considerando também frotas mistas: quando a combinação
+    de tipos diferentes sai mais barata, vira a recomendação ('frota_mista').
+    """
+    resultado = calcular_frete_otimizado(resultado_frete, quantidade_total)
+    if resultado['veiculo_otimo'] == 'nenhum':
+        return resultado
+
+    try:
+        otimizador = OtimizadorFrota.do_frete(resultado_frete, tipos)
+    except ValueError:
+        return resultado
+    linha = otimizador.otimizar([quantidade_total]).iloc[0]
+    usados = [nome for nome in otimizador.nomes if linha[nome] > 0]
+    if len(usados) < 2 or linha['custo_total'] >= resultado['frete_total'] - 0.005:
+        return resultado
+
+    composicao = descrever_composicao(linha, otimizador.nomes)
+    cenario = {
+        'frete_total': float(linha['custo_total']),
+        'frete_por_caixa': float(linha['frete_por_caixa']),
+        'viagens': int(linha['veiculos']),
+        'composicao': {nome: int(linha[nome]) for nome in usados},
+        'capacidade_usada': quantidade_total,
+        'capacidade_total': int(linha['capacidade_total']),
+        'ocupacao': float(linha['ocupacao'])
+    }
+    cenarios = dict(resultado['detalhes']['cenarios'], frota_mista=cenario)
+    referencia = cenarios.get('carreta', resultado['detalhes']['melhor_cenario'])
+    economia = referencia['frete_total'] - cenario['frete_total']
+
+    return {
+        'veiculo_otimo': 'frota_mista',
+        'frete_total': cenario['frete_total'],
+        'frete_por_caixa': cenario['frete_por_caixa'],
+        'economia': economia,
+        'alerta': f"✅ OTIMIZAÇÃO: FROTA MISTA ({composicao}) para {quantidade_total} caixas. Economia de R$ {economia:.2f}",
+        'detalhes': dict(resultado['detalhes'], cenarios=cenarios, melhor_cenario=cenario)
+    }
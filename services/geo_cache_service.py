@@ -0,0 +1,283 @@
+"""
+Cache de Geolocalização
+=======================
+Caches das consultas de geocodificação e de distância ao Google Maps.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config.cache import ConfiguracaoCache
+
+
+class GeocodeCache:
+    """Cache em SQLite de endereço normalizado -> coordenadas, com TTL e despejo LRU"""
+    
+    def __init__(self, caminho: Optional[str] = None, ttl_segundos: Optional[int] = None,
+                 max_entradas: Optional[int] = None):
+        self.caminho = caminho or ConfiguracaoCache.caminho_arquivo("geocode.sqlite")
+        self.ttl_segundos = ttl_segundos if ttl_segundos is not None else ConfiguracaoCache.GEOCODE_TTL_SEGUNDOS
+        self.max_entradas = max_entradas if max_entradas is not None else ConfiguracaoCache.GEOCODE_MAX_ENTRADAS
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS geocode (
+                endereco TEXT PRIMARY KEY,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                criado_em REAL NOT NULL,
+                ultimo_acesso REAL NOT NULL
+            )
+        """)
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_geocode_acesso ON geocode (ultimo_acesso)")
+        self._conexao.commit()
+    
+    @staticmethod
+    def normalizar_endereco(endereco: str) -> str:
+        """Normaliza o endereço para uso como chave (sem acentos, caixa e espaços extras)"""
+        texto = unicodedata.normalize("NFKD", str(endereco))
+        texto = "".join(c for c in texto if not unicodedata.combining(c))
+        texto = re.sub(r"\s+", " ", texto.casefold())
+        texto = re.sub(r"\s*,\s*", ", ", texto)
+        return texto.strip(" ,")
+    
+    def obter(self, endereco: str) -> Optional[Tuple[float, float]]:
+        """Retorna as coordenadas em cache ou None (conta hit/miss)"""
+        chave = self.normalizar_endereco(endereco)
+        agora = time.time()
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT latitude, longitude, criado_em FROM geocode WHERE endereco = ?", (chave,)
+            ).fetchone()
+            
+            if linha is None:
+                self.misses += 1
+                return None
+            
+            latitude, longitude, criado_em = linha
+            if self.ttl_segundos and agora - criado_em > self.ttl_segundos:
+                self._conexao.execute("DELETE FROM geocode WHERE endereco = ?", (chave,))
+                self._conexao.commit()
+                self.misses += 1
+                return None
+            
+            self._conexao.execute("UPDATE geocode SET ultimo_acesso = ? WHERE endereco = ?", (agora, chave))
+            self._conexao.commit()
+            self.hits += 1
+            return latitude, longitude
+    
+    def gravar(self, endereco: str, latitude: float, longitude: float) -> None:
+        """Grava as coordenadas e despeja as entradas menos usadas acima do limite"""
+        chave = self.normalizar_endereco(endereco)
+        agora = time.time()
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO geocode (endereco, latitude, longitude, criado_em, ultimo_acesso) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chave, float(latitude), float(longitude), agora, agora)
+            )
+            if self.max_entradas:
+                self._conexao.execute("""
+                    DELETE FROM geocode WHERE endereco IN (
+                        SELECT endereco FROM geocode ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entradas,))
+            self._conexao.commit()
+    
+    def contem(self, endereco: str) -> bool:
+        """Verifica se o endereço está em cache e válido, sem alterar contadores"""
+        chave = self.normalizar_endereco(endereco)
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT criado_em FROM geocode WHERE endereco = ?", (chave,)
+            ).fetchone()
+        if linha is None:
+            return False
+        return not self.ttl_segundos or time.time() - linha[0] <= self.ttl_segundos
+    
+    def estatisticas(self) -> Dict[str, float]:
+        """Retorna contadores de hit/miss e quantidade de entradas"""
+        with self._lock:
+            entradas = self._conexao.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        consultas = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'taxa_acerto': (self.hits / consultas) if consultas else 0.0,
+            'entradas': entradas
+        }
+    
+    def limpar(self) -> None:
+        """Remove todas as entradas e zera os contadores"""
+        with self._lock:
+            self._conexao.execute("DELETE FROM geocode")
+            self._conexao.commit()
+            self.hits = 0
+            self.misses = 0
+
+
+class RotaCache:
+    """Cache em memória de rotas (origem, destino) -> distância, compartilhado no processo"""
+    
+    def __init__(self, ttl_segundos: Optional[int] = None, max_entradas: Optional[int] = None,
+                 casas_decimais: Optional[int] = None):
+        self.ttl_segundos = ttl_segundos if ttl_segundos is not None else ConfiguracaoCache.ROTA_TTL_SEGUNDOS
+        self.max_entradas = max_entradas if max_entradas is not None else ConfiguracaoCache.ROTA_MAX_ENTRADAS
+        self.casas_decimais = casas_decimais if casas_decimais is not None else ConfiguracaoCache.ROTA_CASAS_DECIMAIS
+        self.hits = 0
+        self.misses = 0
+        self.versao = 0  # muda a cada gravação: invalida cálculos derivados das rotas
+        self._lock = threading.Lock()
+        self._rotas: "OrderedDict[Tuple[float, float, float, float], dict]" = OrderedDict()
+    
+    def chave(self, origem_coords: Tuple[float, float], destino_coords: Tuple[float, float]) -> Tuple[float, float, float, float]:
+        """Monta a chave com as coordenadas arredondadas"""
+        d = self.casas_decimais
+        return (round(float(origem_coords[0]), d), round(float(origem_coords[1]), d),
+                round(float(destino_coords[0]), d), round(float(destino_coords[1]), d))
+    
+    def obter(self, origem_coords: Tuple[float, float], destino_coords: Tuple[float, float]) -> Optional[dict]:
+        """Retorna {'distancia', 'duracao', 'distancia_km', ...} ou None se ausente/expirado"""
+        chave = self.chave(origem_coords, destino_coords)
+        with self._lock:
+            rota = self._rotas.get(chave)
+            if rota is None or (self.ttl_segundos and time.time() - rota['criado_em'] > self.ttl_segundos):
+                self._rotas.pop(chave, None)
+                self.misses += 1
+                return None
+            self._rotas.move_to_end(chave)
+            self.hits += 1
+            return dict(rota)
+    
+    def gravar(self, origem_coords: Tuple[float, float], destino_coords: Tuple[float, float],
+               distancia: str, duracao: str, distancia_km: Optional[float], **extras) -> None:
+        """Grava a rota e despeja as menos usadas acima do limite"""
+        chave = self.chave(origem_coords, destino_coords)
+        rota = {
+            'origem_coords': chave[:2],
+            'destino_coords': chave[2:],
+            'distancia': distancia,
+            'duracao': duracao,
+            'distancia_km': distancia_km,
+            'criado_em': time.time()
+        }
+        rota.update(extras)
+        with self._lock:
+            self._rotas[chave] = rota
+            self._rotas.move_to_end(chave)
+            self.versao += 1
+            while self.max_entradas and len(self._rotas) > self.max_entradas:
+                self._rotas.popitem(last=False)
+    
+    def listar(self) -> List[dict]:
+        """Retorna uma cópia das rotas válidas em cache"""
+        agora = time.time()
+        with self._lock:
+            return [
+                dict(rota) for rota in self._rotas.values()
+                if not self.ttl_segundos or agora - rota['criado_em'] <= self.ttl_segundos
+            ]
+    
+    def estatisticas(self) -> Dict[str, float]:
+        """Retorna contadores de hit/miss e quantidade de entradas"""
+        consultas = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'taxa_acerto': (self.hits / consultas) if consultas else 0.0,
+            'entradas': len(self._rotas)
+        }
+    
+    def limpar(self) -> None:
+        """Remove todas as rotas e zera os contadores"""
+        with self._lock:
+            self._rotas.clear()
+            self.versao += 1
+            self.hits = 0
+            self.misses = 0
+
+
+class AmostrasRota:
+    """
+    Amostras em SQLite de rotas da API (coordenadas, km e UF do destino), gravadas ao
+    lado do cache de geocodificação. Sobrevivem ao processo e alimentam a calibração
+    do fator rodoviário do modo offline.
+    """
+    
+    def __init__(self, caminho: Optional[str] = None, max_entradas: Optional[int] = None,
+                 casas_decimais: Optional[int] = None):
+        self.caminho = caminho or ConfiguracaoCache.caminho_arquivo("geocode.sqlite")
+        self.max_entradas = max_entradas if max_entradas is not None else ConfiguracaoCache.AMOSTRAS_ROTA_MAX_ENTRADAS
+        self.casas_decimais = casas_decimais if casas_decimais is not None else ConfiguracaoCache.ROTA_CASAS_DECIMAIS
+        self.versao = 0  # muda a cada gravação neste processo
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(self.caminho, check_same_thread=False)
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS amostras_rota (
+                lat_origem REAL NOT NULL,
+                lng_origem REAL NOT NULL,
+                lat_destino REAL NOT NULL,
+                lng_destino REAL NOT NULL,
+                distancia_km REAL NOT NULL,
+                uf TEXT,
+                criado_em REAL NOT NULL,
+                PRIMARY KEY (lat_origem, lng_origem, lat_destino, lng_destino)
+            )
+        """)
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_amostras_criado ON amostras_rota (criado_em)")
+        self._conexao.commit()
+    
+    def gravar(self, amostras: List[Tuple[Tuple[float, float], Tuple[float, float], float, Optional[str]]]) -> None:
+        """Grava (origem_coords, destino_coords, distancia_km, uf) numa transação e despeja as mais antigas"""
+        d = self.casas_decimais
+        agora = time.time()
+        linhas = [
+            (round(float(o[0]), d), round(float(o[1]), d), round(float(t[0]), d), round(float(t[1]), d),
+             float(km), uf, agora)
+            for o, t, km, uf in amostras if km is not None
+        ]
+        if not linhas:
+            return
+        with self._lock:
+            self._conexao.executemany(
+                "INSERT OR REPLACE INTO amostras_rota "
+                "(lat_origem, lng_origem, lat_destino, lng_destino, distancia_km, uf, criado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", linhas
+            )
+            if self.max_entradas:
+                self._conexao.execute("""
+                    DELETE FROM amostras_rota WHERE rowid IN (
+                        SELECT rowid FROM amostras_rota ORDER BY criado_em DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entradas,))
+            self._conexao.commit()
+            self.versao += 1
+    
+    def listar(self) -> List[dict]:
+        """Retorna as amostras no mesmo formato de RotaCache.listar()"""
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT lat_origem, lng_origem, lat_destino, lng_destino, distancia_km, uf FROM amostras_rota"
+            ).fetchall()
+        return [
+            {'origem_coords': (lat_o, lng_o), 'destino_coords': (lat_d, lng_d), 'distancia_km': km, 'uf': uf}
+            for lat_o, lng_o, lat_d, lng_d, km, uf in linhas
+        ]
+    
+    def limpar(self) -> None:
+        """Remove todas as amostras"""
+        with self._lock:
+            self._conexao.execute("DELETE FROM amostras_rota")
+            self._conexao.commit()
+            self.versao += 1
+
+
+# Instância única por processo: todas as sessões do Streamlit reaproveitam as rotas
+ROTA_CACHE_COMPARTILHADO = RotaCache()
@@ -5,10 +5,32 @@ Gerencia operações de geolocalização usando Google Maps API.
 """
 
 import math
+import time
 import requests
 import urllib.parse
-import streamlit as st
-from typing import Tuple, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, Tuple, Optional, Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from config.cache import ConfiguracaoCache
+from .geo_cache_service import AmostrasRota, GeocodeCache, RotaCache, ROTA_CACHE_COMPARTILHADO
+
+# Importar streamlit apenas quando necessário
+try:
+    import streamlit as st
+    HAS_STREAMLIT = True
+except ImportError:
+    HAS_STREAMLIT = False
+
+
+def st_error(message):
+    """Função condicional para erro"""
+    if HAS_STREAMLIT:
+        st.error(message)
+    else:
+        print(f"ERROR: {message}")
 
 
 class GeolocationService:
@@ -19,34 +41,89 @@ class GeolocationService:
         "Filial (Atibaia)": "Estrada das Flores 450, Atibaia - SP, 12948-326"
     }
     
-    def __init__(self, api_key: str):
+    # Coordenadas aproximadas das origens: usadas quando o cache não tem o endereço
+    # e a API não está disponível (instalação nova em modo offline)
+    COORDENADAS_ORIGENS = {
+        "Matriz (SP)": (-23.4766, -46.5835),
+        "Filial (Atibaia)": (-23.0925, -46.5905)
+    }
+    
+    # Limite da Distance Matrix API: 25 destinos (e 100 elementos) por requisição
+    MAX_DESTINOS_POR_REQUISICAO = 25
+    
+    # Modo offline: distância em linha reta x fator de sinuosidade das rodovias
+    FATOR_RODOVIARIO_PADRAO = 1.3
+    MIN_AMOSTRAS_CALIBRACAO = 3
+    
+    def __init__(self, api_key: Optional[str], cache_geocode: Optional[GeocodeCache] = None,
+                 http_get: Optional[Callable] = None, cache_rotas: Optional[RotaCache] = None,
+                 amostras_rota: Optional[AmostrasRota] = None):
         self.api_key = api_key
+        # Sem chave da API: apenas caches e estimativas por haversine
+        self.offline = not api_key
+        # Camada HTTP injetável (permite testes sem rede)
+        self._http_get = http_get or requests.get
+        self.cache_geocode = cache_geocode if cache_geocode is not None else GeocodeCache()
+        self.cache_rotas = cache_rotas if cache_rotas is not None else ROTA_CACHE_COMPARTILHADO
+        # Amostras persistentes para calibrar o modo offline (mesmo arquivo do geocode)
+        self.amostras_rota = amostras_rota if amostras_rota is not None else AmostrasRota(self.cache_geocode.caminho)
+        self._fatores_calibrados: Optional[Tuple[tuple, float, Dict[str, float]]] = None
     
     def geocode(self, endereco: str) -> Tuple[Optional[float], Optional[float]]:
-        """Converte endereço ou CEP em coordenadas (lat, lng)"""
+        """Converte endereço ou CEP em coordenadas (lat, lng), consultando o cache antes da API"""
+        coords_cache = self.cache_geocode.obter(endereco)
+        if coords_cache is not None:
+            return coords_cache
+        
+        if self.offline:
+            return self._coordenadas_origem(endereco)
+        
         try:
             url = f"https://maps.googleapis.com/maps/api/geocode/json?address={urllib.parse.quote(endereco)}&key={self.api_key}"
-            response = requests.get(url, timeout=10)
+            response = self._http_get(url, timeout=10)
             response.raise_for_status()
             
             data = response.json()
             if data["status"] == "OK" and data["results"]:
                 location = data["results"][0]["geometry"]["location"]
+                self.cache_geocode.gravar(endereco, location["lat"], location["lng"])
                 return location["lat"], location["lng"]
-            return None, None
+            return self._coordenadas_origem(endereco)
         except Exception as e:
-            st.error(f"Erro na geocodificação: {str(e)}")
-            return None, None
+            st_error(f"Erro na geocodificação: {str(e)}")
+            return self._coordenadas_origem(endereco)
+    
+    def _coordenadas_origem(self, endereco: str) -> Tuple[Optional[float], Optional[float]]:
+        """Coordenadas fixas de uma origem disponível (não vão para o cache) ou (None, None)"""
+        chave = GeocodeCache.normalizar_endereco(endereco)
+        for nome, endereco_origem in self.ORIGENS_DISPONIVEIS.items():
+            if GeocodeCache.normalizar_endereco(endereco_origem) == chave:
+                return self.COORDENADAS_ORIGENS[nome]
+        return None, None
+    
+    def pre_carregar_origens(self) -> None:
+        """Garante as origens fixas no cache de geocodificação (só consulta a API se faltarem)"""
+        for endereco in self.ORIGENS_DISPONIVEIS.values():
+            if not self.cache_geocode.contem(endereco):
+                self.geocode(endereco)
     
     def calcular_distancia(self, origem_coords: Tuple[float, float], 
-                          destino_coords: Tuple[float, float]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-        """Consulta a Distance Matrix API e retorna distância e tempo"""
+                          destino_coords: Tuple[float, float],
+                          uf: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Consulta a Distance Matrix API e retorna distância e tempo (rotas repetidas vêm do cache)"""
+        rota_cache = self.cache_rotas.obter(origem_coords, destino_coords)
+        if rota_cache is not None:
+            return rota_cache['distancia'], rota_cache['duracao'], None
+        
+        if self.offline:
+            return None, None, "⚠️ Modo offline: Distance Matrix API indisponível"
+        
         try:
             lat_o, lng_o = origem_coords
             lat_d, lng_d = destino_coords
             
             url = f"https://maps.googleapis.com/maps/api/distancematrix/json?origins={lat_o},{lng_o}&destinations={lat_d},{lng_d}&key={self.api_key}"
-            response = requests.get(url, timeout=10)
+            response = self._http_get(url, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -58,12 +135,152 @@ class GeolocationService:
             
             distancia = elemento['distance']['text']
             duracao = elemento['duration']['text']
+            distancia_km = self._extrair_km_seguro(distancia)
+            self.cache_rotas.gravar(origem_coords, destino_coords, distancia, duracao, distancia_km, uf=uf)
+            self.amostras_rota.gravar([(origem_coords, destino_coords, distancia_km, uf)])
             return distancia, duracao, None
             
         except Exception as e:
             return None, None, f"❌ Erro ao processar resposta: {str(e)}"
     
-    def calcular_rota_completa(self, origem: str, destino: str) -> Dict:
+    def calcular_distancias_lote(self, origem: Union[str, Tuple[float, float]],
+                                 destinos: Union[pd.DataFrame, Sequence[Tuple[float, float]]],
+                                 coluna_lat: str = 'latitude', coluna_lng: str = 'longitude',
+                                 coluna_uf: str = 'A1_EST', max_workers: int = 4,
+                                 estimar_sem_rota: bool = False) -> pd.DataFrame:
+        """
+        Calcula a distância da origem até vários destinos em requisições agrupadas.
+        
+        Os destinos são divididos em lotes de até MAX_DESTINOS_POR_REQUISICAO,
+        consultados em paralelo; rotas já em cache não geram requisição.
+        Com `estimar_sem_rota`, destinos sem resposta da API (ou em modo offline)
+        recebem a estimativa por haversine com status 'ESTIMADA'.
+        Retorna um DataFrame alinhado ao índice de `destinos` com as colunas
+        distancia, duracao, distancia_km e status.
+        """
+        if isinstance(destinos, pd.DataFrame):
+            latitudes = pd.to_numeric(destinos[coluna_lat], errors='coerce')
+            longitudes = pd.to_numeric(destinos[coluna_lng], errors='coerce')
+            ufs = destinos[coluna_uf].tolist() if coluna_uf in destinos.columns else [None] * len(destinos)
+            indice = destinos.index
+        else:
+            coords = list(destinos)
+            latitudes = pd.Series([c[0] for c in coords], dtype=float)
+            longitudes = pd.Series([c[1] for c in coords], dtype=float)
+            ufs = [None] * len(coords)
+            indice = pd.RangeIndex(len(coords))
+        
+        resultado = pd.DataFrame({
+            'latitude': latitudes.to_numpy(dtype=float),
+            'longitude': longitudes.to_numpy(dtype=float),
+            'distancia': None,
+            'duracao': None,
+            'distancia_km': np.nan,
+            'status': 'SEM_COORDENADAS'
+        }, index=indice)
+        
+        origem_coords = self.geocode(origem) if isinstance(origem, str) else origem
+        if not origem_coords or origem_coords[0] is None:
+            resultado['status'] = 'ORIGEM_NAO_LOCALIZADA'
+            return resultado
+        
+        # Destinos válidos: primeiro o cache, depois a API (sem repetir coordenadas)
+        validos = resultado['latitude'].notna() & resultado['longitude'].notna() & \
+            ~((resultado['latitude'] == 0) & (resultado['longitude'] == 0))
+        pendentes: Dict[Tuple[float, float, float, float], List[int]] = {}
+        for posicao in np.flatnonzero(validos.to_numpy()):
+            destino_coords = (resultado['latitude'].iat[posicao], resultado['longitude'].iat[posicao])
+            rota = self.cache_rotas.obter(origem_coords, destino_coords)
+            if rota is not None:
+                self._preencher_rota(resultado, posicao, rota['distancia'], rota['duracao'],
+                                     rota['distancia_km'], 'OK')
+            else:
+                chave = self.cache_rotas.chave(origem_coords, destino_coords)
+                pendentes.setdefault(chave, []).append(posicao)
+        
+        if self.offline:
+            for posicoes in pendentes.values():
+                resultado.iloc[posicoes, resultado.columns.get_loc('status')] = 'OFFLINE'
+            pendentes = {}
+        
+        if pendentes:
+            self._consultar_pendentes(resultado, origem_coords, pendentes, ufs, max_workers)
+        
+        if estimar_sem_rota:
+            sem_rota = validos & resultado['distancia_km'].isna()
+            if sem_rota.any():
+                destinos_sem_rota = pd.DataFrame({
+                    'latitude': resultado.loc[sem_rota, 'latitude'],
+                    'longitude': resultado.loc[sem_rota, 'longitude'],
+                    'A1_EST': np.asarray(ufs, dtype=object)[sem_rota.to_numpy()],
+                })
+                estimadas = self.estimar_distancias_offline(origem_coords, destinos_sem_rota).round(1)
+                resultado.loc[sem_rota, 'distancia_km'] = estimadas
+                resultado.loc[sem_rota, 'distancia'] = estimadas.map(lambda km: f"{km} km (estimada)")
+                resultado.loc[sem_rota, 'duracao'] = "N/D"
+                resultado.loc[sem_rota, 'status'] = 'ESTIMADA'
+        
+        return resultado
+    
+    def _consultar_pendentes(self, resultado: pd.DataFrame, origem_coords: Tuple[float, float],
+                             pendentes: Dict[Tuple[float, float, float, float], List[int]],
+                             ufs: List[Optional[str]], max_workers: int) -> None:
+        """Consulta a API para os destinos fora do cache, em lotes paralelos"""
+        chaves = list(pendentes.keys())
+        lotes = [chaves[i:i + self.MAX_DESTINOS_POR_REQUISICAO]
+                 for i in range(0, len(chaves), self.MAX_DESTINOS_POR_REQUISICAO)]
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(lotes)))) as executor:
+            respostas = list(executor.map(
+                lambda lote: self._consultar_lote(origem_coords, [chave[2:] for chave in lote]), lotes
+            ))
+        
+        amostras = []
+        for lote, elementos in zip(lotes, respostas):
+            for chave, (distancia, duracao, status) in zip(lote, elementos):
+                distancia_km = self._extrair_km_seguro(distancia) if status == 'OK' else None
+                if status == 'OK':
+                    uf = ufs[pendentes[chave][0]]
+                    self.cache_rotas.gravar(origem_coords, chave[2:], distancia, duracao, distancia_km, uf=uf)
+                    amostras.append((origem_coords, chave[2:], distancia_km, uf))
+                for posicao in pendentes[chave]:
+                    self._preencher_rota(resultado, posicao, distancia, duracao, distancia_km, status)
+        self.amostras_rota.gravar(amostras)
+    
+    def _consultar_lote(self, origem_coords: Tuple[float, float],
+                        destinos_coords: List[Tuple[float, float]]) -> List[Tuple[Optional[str], Optional[str], str]]:
+        """Consulta uma requisição da Distance Matrix com vários destinos"""
+        try:
+            lat_o, lng_o = origem_coords
+            destinos_param = "|".join(f"{lat},{lng}" for lat, lng in destinos_coords)
+            url = (f"https://maps.googleapis.com/maps/api/distancematrix/json?origins={lat_o},{lng_o}"
+                   f"&destinations={destinos_param}&key={self.api_key}")
+            response = self._http_get(url, timeout=30)
+            response.raise_for_status()
+            
+            elementos = response.json()['rows'][0]['elements']
+            retorno = []
+            for elemento in elementos:
+                status = elemento.get("status", "ERRO")
+                if status == "OK":
+                    retorno.append((elemento['distance']['text'], elemento['duration']['text'], status))
+                else:
+                    retorno.append((None, None, status))
+            return retorno
+        except Exception as e:
+            return [(None, None, f"ERRO: {str(e)}")] * len(destinos_coords)
+    
+    @staticmethod
+    def _preencher_rota(resultado: pd.DataFrame, posicao: int, distancia: Optional[str],
+                        duracao: Optional[str], distancia_km: Optional[float], status: str) -> None:
+        """Preenche uma linha do resultado do lote"""
+        resultado.iat[posicao, resultado.columns.get_loc('distancia')] = distancia
+        resultado.iat[posicao, resultado.columns.get_loc('duracao')] = duracao
+        resultado.iat[posicao, resultado.columns.get_loc('distancia_km')] = \
+            np.nan if distancia_km is None else distancia_km
+        resultado.iat[posicao, resultado.columns.get_loc('status')] = status
+    
+    def calcular_rota_completa(self, origem: str, destino: str, uf: Optional[str] = None) -> Dict:
         """Calcula rota completa incluindo geocodificação e distância"""
         resultado = {
             'sucesso': False,
@@ -75,6 +292,10 @@ class GeolocationService:
             'erro': None
         }
         
+        if self.offline:
+            resultado['erro'] = "⚠️ Modo offline: rota completa requer a Google Maps API."
+            return resultado
+        
         # Geocodificar origem
         origem_coords = self.geocode(origem)
         if not origem_coords:
@@ -88,7 +309,7 @@ class GeolocationService:
             return resultado
         
         # Calcular distância
-        distancia, duracao, erro = self.calcular_distancia(origem_coords, destino_coords)
+        distancia, duracao, erro = self.calcular_distancia(origem_coords, destino_coords, uf)
         if erro:
             resultado['erro'] = erro
             return resultado
@@ -109,6 +330,13 @@ class GeolocationService:
         
         return resultado
     
+    def _extrair_km_seguro(self, distancia_str: str) -> Optional[float]:
+        """Versão de _extrair_km_da_string que retorna None em vez de levantar exceção"""
+        try:
+            return self._extrair_km_da_string(distancia_str)
+        except (ValueError, IndexError, AttributeError):
+            return None
+    
     def _extrair_km_da_string(self, distancia_str: str) -> float:
         """Extrai valor numérico de quilômetros da string de distância"""
         distancia_texto = distancia_str.replace('km', '').strip()
@@ -146,6 +374,94 @@ class GeolocationService:
         
         return R * c
     
+    @staticmethod
+    def haversine_vetorizado(lat1, lon1, lat2, lon2) -> np.ndarray:
+        """Haversine em arrays NumPy (aceita broadcasting entre origem e destinos)"""
+        R = 6371  # Raio da Terra em km
+        
+        lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    
+    def calibrar_fatores_rodoviarios(self) -> Dict[str, float]:
+        """
+        Calcula o fator rodoviário (km por rota / km em linha reta) por UF,
+        usando as rotas da API persistidas e as do cache em memória. UFs com
+        poucas amostras ficam de fora e usam o fator geral (chave '*').
+        O resultado fica guardado até surgirem rotas novas ou vencer o prazo.
+        """
+        marca = (id(self.cache_rotas), self.cache_rotas.versao, self.amostras_rota.versao)
+        if self._fatores_calibrados is not None:
+            marca_anterior, calibrado_em, fatores = self._fatores_calibrados
+            if marca_anterior == marca and \
+                    time.time() - calibrado_em <= ConfiguracaoCache.FATORES_RODOVIARIOS_TTL_SEGUNDOS:
+                return dict(fatores)
+        
+        fatores = self._calcular_fatores_rodoviarios()
+        self._fatores_calibrados = (marca, time.time(), fatores)
+        return dict(fatores)
+    
+    def _calcular_fatores_rodoviarios(self) -> Dict[str, float]:
+        """Mediana da razão rota / linha reta por UF sobre todas as amostras"""
+        rotas = pd.DataFrame(self.amostras_rota.listar() + self.cache_rotas.listar())
+        if rotas.empty:
+            return {}
+        
+        if 'uf' not in rotas.columns:
+            rotas['uf'] = None
+        rotas = rotas[rotas['distancia_km'].notna()]
+        # A mesma rota pode estar nas duas fontes
+        rotas = rotas.drop_duplicates(subset=['origem_coords', 'destino_coords'], keep='last')
+        if rotas.empty:
+            return {}
+        
+        origens = np.array(rotas['origem_coords'].tolist(), dtype=float)
+        destinos = np.array(rotas['destino_coords'].tolist(), dtype=float)
+        linha_reta = self.haversine_vetorizado(origens[:, 0], origens[:, 1], destinos[:, 0], destinos[:, 1])
+        
+        # Rotas muito curtas distorcem a razão
+        validas = linha_reta > 1.0
+        razoes = pd.Series(rotas['distancia_km'].to_numpy(dtype=float)[validas] / linha_reta[validas],
+                           index=rotas['uf'].to_numpy()[validas])
+        razoes = razoes[razoes >= 1.0]
+        if razoes.empty:
+            return {}
+        
+        por_uf = razoes.groupby(level=0).agg(['median', 'count'])
+        fatores = por_uf.loc[por_uf['count'] >= self.MIN_AMOSTRAS_CALIBRACAO, 'median'].to_dict()
+        fatores['*'] = float(razoes.median())
+        return fatores
+    
+    def estimar_distancias_offline(self, origem_coords: Tuple[float, float], destinos: pd.DataFrame,
+                                   coluna_lat: str = 'latitude', coluna_lng: str = 'longitude',
+                                   coluna_uf: str = 'A1_EST') -> pd.Series:
+        """Estima a distância rodoviária de todos os destinos sem rede (linha reta x fator da UF)"""
+        fatores = self.calibrar_fatores_rodoviarios()
+        fator_geral = fatores.get('*', self.FATOR_RODOVIARIO_PADRAO)
+        
+        latitudes = pd.to_numeric(destinos[coluna_lat], errors='coerce').to_numpy(dtype=float)
+        longitudes = pd.to_numeric(destinos[coluna_lng], errors='coerce').to_numpy(dtype=float)
+        linha_reta = self.haversine_vetorizado(origem_coords[0], origem_coords[1], latitudes, longitudes)
+        
+        if coluna_uf in destinos.columns:
+            fator = destinos[coluna_uf].map(fatores).astype(float).fillna(fator_geral).to_numpy()
+        else:
+            fator = fator_geral
+        
+        # Coordenadas zeradas no cadastro equivalem a ausentes
+        sem_coordenadas = (latitudes == 0) & (longitudes == 0)
+        distancias = np.where(sem_coordenadas, np.nan, linha_reta * fator)
+        return pd.Series(distancias, index=destinos.index, name='distancia_km')
+    
+    def estimar_distancia_offline(self, origem_coords: Tuple[float, float],
+                                  destino_coords: Tuple[float, float], uf: Optional[str] = None) -> float:
+        """Estima a distância rodoviária de um único destino sem rede"""
+        destino = pd.DataFrame({'latitude': [destino_coords[0]], 'longitude': [destino_coords[1]], 'A1_EST': [uf]})
+        return float(self.estimar_distancias_offline(origem_coords, destino).iloc[0])
+    
     def gerar_url_mapa_embed(self, origem_coords: Tuple[float, float], 
                            destino_coords: Tuple[float, float]) -> str:
         """Gera URL do mapa embed com rota"""
@@ -1,14 +1,30 @@
+import hashlib
 import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
 import pandas as pd
 
+from config.veiculos import ConfiguracaoVeiculos
+from services.carregamento_service import OtimizadorCarregamento, montar_pallets
+
+_TRUCK = ConfiguracaoVeiculos.obter_veiculo('truck')
+_CARRETA = ConfiguracaoVeiculos.obter_veiculo('carreta')
+
 
 class LogisticsService:
     """Realiza cálculos logísticos de pallets e veículos"""
 
-    PALLET_TRUCK = 29
-    PALLET_CARRETA = 58
-    PESO_TRUCK = 12000  # kg
-    PESO_CARRETA = 28000  # kg
+    # Capacidades do catálogo de veículos
+    PALLET_TRUCK = _TRUCK['pallets']
+    PALLET_CARRETA = _CARRETA['pallets']
+    PESO_TRUCK = _TRUCK['peso']  # kg
+    PESO_CARRETA = _CARRETA['peso']  # kg
+    VOLUME_TRUCK = _TRUCK['volume']  # m³
+    VOLUME_CARRETA = _CARRETA['volume']  # m³
+    MAX_PLANOS_MEMORIZADOS = 64  # planos de carregamento guardados por conteúdo do pedido
 
     def __init__(self, df_logistica: pd.DataFrame):
         self.df_logistica = df_logistica if df_logistica is not None else pd.DataFrame()
@@ -16,6 +32,40 @@ class LogisticsService:
         self.pallet_col = next((c for c in ['CXS_PLT', 'CX_PALLET', 'CAIXAS_PALLET'] if c in self.df_logistica.columns), None)
         self.peso_col = next((c for c in ['PESO', 'PESO_KG'] if c in self.df_logistica.columns), None)
         self.volume_col = next((c for c in ['VOLUME', 'VOLUME_M3', 'CUBAGEM'] if c in self.df_logistica.columns), None)
+        self._indexar_capacidades()
+        # O serviço é compartilhado pelas sessões: reruns com o mesmo pedido não reempacotam
+        self._planos: "OrderedDict[str, dict]" = OrderedDict()
+        self._planos_lock = threading.Lock()
+
+    def _indexar_capacidades(self):
+        """
+        Normaliza a tabela de capacidades uma única vez: índice por código e arrays
+        tipados de caixas/pallet, peso e volume. A última posição é a linha padrão
+        dos produtos sem cadastro (1 caixa por pallet, sem peso e sem volume).
+        """
+        self._indice = pd.Index([])
+        if self.df_logistica.empty or not self.codigo_col or not self.pallet_col:
+            return
+
+        # Códigos repetidos: vale o primeiro cadastro
+        tabela = self.df_logistica.drop_duplicates(self.codigo_col, keep='first').reset_index(drop=True)
+        tabela[self.pallet_col] = pd.to_numeric(tabela[self.pallet_col], errors='coerce').fillna(1)
+        if self.peso_col:
+            tabela[self.peso_col] = pd.to_numeric(tabela[self.peso_col], errors='coerce').fillna(0)
+        if self.volume_col:
+            tabela[self.volume_col] = pd.to_numeric(tabela[self.volume_col], errors='coerce').fillna(0)
+
+        padrao = {self.pallet_col: 1.0}
+        padrao.update({col: 0.0 for col in (self.peso_col, self.volume_col) if col})
+        self._tabela = pd.concat([tabela, pd.DataFrame([padrao])], ignore_index=True)
+        self._indice = pd.Index(tabela[self.codigo_col])
+
+        caixas_pallet = self._tabela[self.pallet_col].to_numpy(dtype=float)
+        # Sem caixas por pallet válidas, cada caixa conta como um pallet
+        self._caixas_pallet = np.where(caixas_pallet > 0, caixas_pallet, 1.0)
+        zeros = np.zeros(len(self._tabela))
+        self._peso = self._tabela[self.peso_col].to_numpy(dtype=float) if self.peso_col else zeros
+        self._volume = self._tabela[self.volume_col].to_numpy(dtype=float) if self.volume_col else zeros
 
     def calcular_logistica(self, df_produtos: pd.DataFrame) -> dict:
         """Calcula pallets fechados e veículos necessários"""
@@ -28,8 +78,8 @@ class LogisticsService:
                 'detalhes': pd.DataFrame()
             }
 
-        codigo_prod = next((c for c in ['CODIGO', 'Codigo', 'SKU', 'Produto', 'Descrição', 'DESCRICAO'] if c in df_produtos.columns), None)
-        if not codigo_prod or 'Quantidade' not in df_produtos.columns:
+        resolvido = self._resolver_pedido(df_produtos)
+        if resolvido is None:
             return {
                 'peso_total': 0.0,
                 'truck_qtd': 0,
@@ -37,27 +87,16 @@ class LogisticsService:
                 'sugestoes': [],
                 'detalhes': pd.DataFrame()
             }
+        codigo_prod, posicoes, quantidade = resolvido
+        caixas_pallet = self._caixas_pallet[posicoes]
 
-        df_merge = df_produtos[[codigo_prod, 'Quantidade']].merge(
-            self.df_logistica,
-            left_on=codigo_prod,
-            right_on=self.codigo_col,
-            how='left'
-        )
-
-        df_merge[self.pallet_col] = pd.to_numeric(df_merge[self.pallet_col], errors='coerce').fillna(1)
-        if self.peso_col:
-            df_merge[self.peso_col] = pd.to_numeric(df_merge[self.peso_col], errors='coerce').fillna(0)
-        if self.volume_col:
-            df_merge[self.volume_col] = pd.to_numeric(df_merge[self.volume_col], errors='coerce').fillna(0)
+        pallets_fechados = (quantidade // caixas_pallet).astype(int)
+        resto_caixas = (quantidade % caixas_pallet).astype(int)
+        peso_total = quantidade * self._peso[posicoes]
+        volume_total = quantidade * self._volume[posicoes]
 
-        df_merge['pallets_fechados'] = (df_merge['Quantidade'] // df_merge[self.pallet_col]).astype(int)
-        df_merge['resto_caixas'] = (df_merge['Quantidade'] % df_merge[self.pallet_col]).astype(int)
-        df_merge['peso_total'] = df_merge['Quantidade'] * (df_merge[self.peso_col] if self.peso_col else 0)
-        df_merge['volume_total'] = df_merge['Quantidade'] * (df_merge[self.volume_col] if self.volume_col else 0)
-
-        total_pallets = (df_merge['pallets_fechados'] + (df_merge['resto_caixas'] > 0).astype(int)).sum()
-        total_peso = df_merge['peso_total'].sum()
+        total_pallets = int((pallets_fechados + (resto_caixas > 0)).sum())
+        total_peso = peso_total.sum()
 
         trucks_pallet = math.ceil(total_pallets / self.PALLET_TRUCK) if total_pallets > 0 else 0
         trucks_peso = math.ceil(total_peso / self.PESO_TRUCK) if total_peso > 0 else 0
@@ -67,16 +106,100 @@ class LogisticsService:
         carretas_peso = math.ceil(total_peso / self.PESO_CARRETA) if total_peso > 0 else 0
         carretas = max(carretas_pallet, carretas_peso)
 
-        sugestoes = []
-        for _, row in df_merge.iterrows():
-            if row['resto_caixas'] > 0:
-                faltam = int(row[self.pallet_col] - row['resto_caixas'])
-                sugestoes.append({'produto': row[codigo_prod], 'quantidade': faltam})
+        # Pallets incompletos: caixas que faltam para fechar
+        incompletos = np.flatnonzero(resto_caixas > 0)
+        faltam = (caixas_pallet[incompletos] - resto_caixas[incompletos]).astype(int)
+        produtos = df_produtos[codigo_prod].to_numpy()[incompletos]
+        sugestoes = [{'produto': produto, 'quantidade': int(qtd)} for produto, qtd in zip(produtos, faltam)]
+
+        detalhes = self._montar_detalhes(df_produtos, codigo_prod, posicoes)
+        detalhes['pallets_fechados'] = pallets_fechados
+        detalhes['resto_caixas'] = resto_caixas
+        detalhes['peso_total'] = peso_total
+        detalhes['volume_total'] = volume_total
 
         return {
             'peso_total': float(total_peso),
             'truck_qtd': int(trucks),
             'carreta_qtd': int(carretas),
             'sugestoes': sugestoes,
-            'detalhes': df_merge
+            'detalhes': detalhes
         }
+
+    def _resolver_pedido(self, df_produtos: pd.DataFrame):
+        """Coluna de código do pedido, posição de cada linha no cadastro e quantidades"""
+        codigo_prod = next((c for c in ['CODIGO', 'Codigo', 'SKU', 'Produto', 'Descrição', 'DESCRICAO'] if c in df_produtos.columns), None)
+        if not codigo_prod or 'Quantidade' not in df_produtos.columns:
+            return None
+
+        # Busca indexada: uma posição por produto (a linha padrão quando não há cadastro)
+        posicoes = self._indice.get_indexer(df_produtos[codigo_prod])
+        posicoes = np.where(posicoes >= 0, posicoes, len(self._indice))
+        quantidade = pd.to_numeric(df_produtos['Quantidade'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        return codigo_prod, posicoes, quantidade
+
+    @classmethod
+    def veiculos_padrao(cls, custos: Optional[Dict[str, float]] = None) -> list:
+        """
+        Truck e carreta com as capacidades da classe. Custos por viagem vêm de
+        `custos` ({'truck': valor, 'carreta': valor}); tipos sem valor ficam de fora.
+        Sem nenhum valor, o custo é a capacidade em pallets (minimiza posições ociosas).
+        """
+        veiculos = [
+            {chave: v[chave] for chave in ('nome', 'pallets', 'peso', 'volume')}
+            for v in ConfiguracaoVeiculos.listar_veiculos(ConfiguracaoVeiculos.TIPOS_PADRAO)
+        ]
+        custos = {nome: valor for nome, valor in (custos or {}).items() if valor and valor > 0}
+        if not custos:
+            return [dict(v, custo=float(v['pallets'])) for v in veiculos]
+        return [dict(v, custo=float(custos[v['nome']])) for v in veiculos if v['nome'] in custos]
+
+    def planejar_carregamento(self, df_produtos: pd.DataFrame, custos: Optional[Dict[str, float]] = None,
+                              exato: Optional[bool] = None) -> dict:
+        """
+        Distribui os pallets fechados e incompletos de cada produto na combinação de
+        trucks e carretas de menor custo, respeitando pallets, peso e cubagem. O plano
+        fica memorizado pelo conteúdo dos pallets, dos veículos e do modo de busca.
+        """
+        veiculos = self.veiculos_padrao(custos)
+        resolvido = None
+        if not self.df_logistica.empty and self.codigo_col and self.pallet_col:
+            resolvido = self._resolver_pedido(df_produtos)
+        if resolvido is None:
+            pallets = pd.DataFrame(columns=['produto', 'caixas', 'peso', 'volume'])
+        else:
+            codigo_prod, posicoes, quantidade = resolvido
+            pallets = montar_pallets(
+                df_produtos[codigo_prod].to_numpy(), quantidade, self._caixas_pallet[posicoes],
+                self._peso[posicoes], self._volume[posicoes]
+            )
+
+        chave = self._chave_plano(pallets, veiculos, exato)
+        with self._planos_lock:
+            plano = self._planos.get(chave)
+            if plano is not None:
+                self._planos.move_to_end(chave)
+        if plano is None:
+            plano = OtimizadorCarregamento(veiculos).otimizar(pallets, exato=exato)
+            with self._planos_lock:
+                self._planos[chave] = plano
+                while len(self._planos) > self.MAX_PLANOS_MEMORIZADOS:
+                    self._planos.popitem(last=False)
+        # Cópia rasa: quem recebe pode alterar a tabela de alocação sem afetar a memória
+        return dict(plano, alocacao=plano['alocacao'].copy())
+
+    @staticmethod
+    def _chave_plano(pallets: pd.DataFrame, veiculos: list, exato: Optional[bool]) -> str:
+        """Hash do conteúdo dos pallets, dos veículos (com custos) e do modo de busca"""
+        conteudo = hashlib.sha1(repr((sorted(tuple(sorted(v.items())) for v in veiculos), exato)).encode())
+        if len(pallets):
+            conteudo.update(pd.util.hash_pandas_object(pallets.astype(str), index=False).to_numpy().tobytes())
+        return conteudo.hexdigest()
+
+    def _montar_detalhes(self, df_produtos: pd.DataFrame, codigo_prod: str, posicoes: np.ndarray) -> pd.DataFrame:
+        """Produto e quantidade do pedido lado a lado com o cadastro logístico de cada linha"""
+        pedido = df_produtos[[codigo_prod, 'Quantidade']].reset_index(drop=True)
+        cadastro = self._tabela.take(posicoes).reset_index(drop=True)
+        if codigo_prod == self.codigo_col:
+            cadastro = cadastro.drop(columns=[self.codigo_col])
+        return pd.concat([pedido, cadastro], axis=1)
@@ -0,0 +1,105 @@
+"""
+Serviço de Planilha de Custos
+=============================
+Leitura tipada da planilha de custos com cópia colunar em cache (Feather),
+evitando o parse do Excel pelo openpyxl a cada rerun.
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+from typing import Optional
+
+import pandas as pd
+
+from config.cache import ConfiguracaoCache
+
+try:
+    import pyarrow.feather as feather
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+class PlanilhaCustosService:
+    """Carrega a planilha de custos uma vez e reaproveita a versão tipada enquanto o arquivo não mudar"""
+    
+    COLUNAS_TEXTO = ['Descrição', 'UF']
+    VERSAO_FORMATO = 1  # Incrementar ao mudar a normalização para invalidar os caches antigos
+    
+    def __init__(self, diretorio_cache: Optional[str] = None):
+        self.diretorio_cache = diretorio_cache or ConfiguracaoCache.obter_diretorio()
+        self.extensao = "feather" if HAS_PYARROW else "pkl"
+    
+    @classmethod
+    def normalizar(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """Limpa nomes de colunas e converte colunas numéricas lidas como texto"""
+        df = df.copy()
+        df.columns = df.columns.astype(str).str.strip()
+        
+        for coluna in df.columns:
+            if coluna in cls.COLUNAS_TEXTO or pd.api.types.is_numeric_dtype(df[coluna]):
+                continue
+            if df[coluna].dtype == object or pd.api.types.is_string_dtype(df[coluna]):
+                convertida = pd.to_numeric(df[coluna], errors='coerce')
+                # Só converte se nenhum valor preenchido for perdido na conversão
+                if convertida.notna().sum() == df[coluna].notna().sum():
+                    df[coluna] = convertida
+        
+        return df.reset_index(drop=True)
+    
+    def _prefixo_cache(self, caminho_planilha: str) -> str:
+        """Prefixo dos arquivos de cache de uma planilha (um por caminho absoluto)"""
+        chave = hashlib.sha1(os.path.abspath(caminho_planilha).encode()).hexdigest()[:12]
+        return os.path.join(self.diretorio_cache, f"planilha_{chave}")
+    
+    def caminho_cache(self, caminho_planilha: str) -> str:
+        """Arquivo de cache válido para a versão atual da planilha (mtime + tamanho)"""
+        info = os.stat(caminho_planilha)
+        return (f"{self._prefixo_cache(caminho_planilha)}_v{self.VERSAO_FORMATO}"
+                f"_{info.st_mtime_ns}_{info.st_size}.{self.extensao}")
+    
+    def carregar(self, caminho_planilha: str) -> pd.DataFrame:
+        """Lê do cache colunar se atualizado; senão faz o parse do Excel e grava o cache"""
+        caminho_cache = self.caminho_cache(caminho_planilha)
+        if os.path.exists(caminho_cache):
+            try:
+                return self._ler_cache(caminho_cache)
+            except Exception:
+                os.remove(caminho_cache)
+        
+        df = self.normalizar(pd.read_excel(caminho_planilha))
+        self.invalidar(caminho_planilha)
+        self._gravar_cache(df, caminho_cache)
+        return df
+    
+    def invalidar(self, caminho_planilha: str) -> None:
+        """Remove os caches da planilha (versões antigas inclusive)"""
+        for arquivo in glob.glob(f"{glob.escape(self._prefixo_cache(caminho_planilha))}_*"):
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+    
+    def _ler_cache(self, caminho_cache: str) -> pd.DataFrame:
+        """Lê o cache; o Feather é mapeado em memória em vez de copiado"""
+        if caminho_cache.endswith(".feather"):
+            return feather.read_table(caminho_cache, memory_map=True).to_pandas()
+        with open(caminho_cache, "rb") as f:
+            return pickle.load(f)
+    
+    def _gravar_cache(self, df: pd.DataFrame, caminho_cache: str) -> None:
+        """Grava o cache de forma atômica (arquivo temporário + rename)"""
+        temporario = f"{caminho_cache}.tmp"
+        try:
+            if caminho_cache.endswith(".feather"):
+                feather.write_feather(df, temporario, compression="uncompressed")
+            else:
+                with open(temporario, "wb") as f:
+                    pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, caminho_cache)
+        except Exception:
+            # Cache é só otimização: falha ao gravar não impede o uso da planilha
+            if os.path.exists(temporario):
+                os.remove(temporario)
@@ -0,0 +1,199 @@
+"""
+Sugestões de Quantidade do Pedido
+=================================
+Propõe pequenos ajustes de quantidade por produto (completar pallets, retirar
+pallets incompletos, completar o veículo ou liberar um veículo) e avalia todos
+os vetores de quantidade vizinhos de uma vez. As sugestões são ordenadas pelo
+custo real por caixa embarcada (custo da frota / caixas); a margem líquida é
+calculada pela CalculadoraResultados com o frete por caixa da tabela (custo da
+frota / capacidade contratada), o mesmo valor que o simulador grava em
+"Frete Caixa" ao aplicar a sugestão.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.calculation_service import CalculadoraResultados
+from services.frota_service import OtimizadorFrota
+
+
+class SugestorQuantidades:
+    """Ajustes de quantidade que reduzem o custo de frete por caixa embarcada"""
+
+    LIMITE_AJUSTE_PERCENTUAL = 0.15   # variação máxima de caixas em relação ao pedido
+    MAX_SUGESTOES = 5
+
+    def __init__(self, logistics_service, resultado_frete: dict, tipo_frete: str = "CIF",
+                 tipos_veiculo: Optional[List[str]] = None, frota: Optional[OtimizadorFrota] = None):
+        """frota: otimizador já montado para o resultado_frete (reaproveita a tabela da DP)"""
+        self.logistics_service = logistics_service
+        self.frota = frota or OtimizadorFrota.do_frete(resultado_frete, tipos_veiculo)
+        self.calculadora = CalculadoraResultados(tipo_frete)
+
+    def sugerir(self, df_pedido: pd.DataFrame, max_sugestoes: Optional[int] = None) -> dict:
+        """
+        Retorna o pedido atual ('base') e as melhores sugestões ('sugestoes'), ordenadas
+        pelo custo por caixa embarcada. Só entram sugestões com custo por caixa menor que o atual.
+        """
+        quantidade = pd.to_numeric(df_pedido["Quantidade"], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+        produtos = df_pedido["Descrição"].astype(str).to_numpy()
+        caixas_pallet, resto = self._pallets(df_pedido, len(quantidade))
+
+        candidatos, descricoes = self._gerar_candidatos(produtos, quantidade, caixas_pallet, resto)
+        avaliacao = self._avaliar(df_pedido, candidatos)
+
+        base = avaliacao.iloc[0]
+        avaliacao['sugestao'] = descricoes
+        avaliacao['caixas_ajustadas'] = candidatos.sum(axis=1) - quantidade.sum()
+        avaliacao['variacao_custo_caixa'] = avaliacao['custo_por_caixa'] - base['custo_por_caixa']
+        avaliacao['variacao_margem_pct'] = avaliacao['margem_liquida_pct'] - base['margem_liquida_pct']
+
+        melhores = avaliacao.iloc[1:]
+        melhores = melhores[melhores['variacao_custo_caixa'] < -0.005]
+        melhores = melhores.sort_values(['custo_por_caixa', 'margem_liquida_pct'], ascending=[True, False], kind='stable')
+        melhores = melhores.head(max_sugestoes or self.MAX_SUGESTOES).copy()
+        # Ajustes por produto só das sugestões devolvidas
+        melhores['ajustes'] = [
+            {produtos[i]: int(delta[i]) for i in np.flatnonzero(delta)}
+            for delta in candidatos[melhores.index.to_numpy()] - quantidade
+        ]
+        colunas = ['sugestao', 'ajustes', 'caixas_ajustadas', 'volume', 'veiculos', 'frete_total', 'custo_por_caixa',
+                   'variacao_custo_caixa', 'frete_por_caixa', 'lucro_liquido', 'margem_liquida_pct', 'variacao_margem_pct']
+        return {
+            'base': base[['volume', 'veiculos', 'frete_total', 'custo_por_caixa', 'frete_por_caixa',
+                          'lucro_liquido', 'margem_liquida_pct']].to_dict(),
+            'sugestoes': melhores[colunas].reset_index(drop=True)
+        }
+
+    def _pallets(self, df_pedido: pd.DataFrame, linhas: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Caixas por pallet e resto de caixas de cada linha (via calcular_logistica)"""
+        if self.logistics_service is None:
+            return np.ones(linhas, dtype=np.int64), np.zeros(linhas, dtype=np.int64)
+        info = self.logistics_service.calcular_logistica(df_pedido)
+        detalhes = info['detalhes']
+        if detalhes.empty:
+            return np.ones(linhas, dtype=np.int64), np.zeros(linhas, dtype=np.int64)
+        caixas_pallet = pd.to_numeric(detalhes[self.logistics_service.pallet_col], errors='coerce').fillna(1)
+        caixas_pallet = np.maximum(caixas_pallet.to_numpy(), 1).astype(np.int64)
+        return caixas_pallet, detalhes['resto_caixas'].to_numpy(dtype=np.int64)
+
+    def _gerar_candidatos(self, produtos: np.ndarray, quantidade: np.ndarray, caixas_pallet: np.ndarray,
+                          resto: np.ndarray) -> Tuple[np.ndarray, List[str]]:
+        """Matriz de vetores de quantidade vizinhos (a primeira linha é o pedido atual)"""
+        n = len(quantidade)
+        total = int(quantidade.sum())
+        ajustes: List[np.ndarray] = [np.zeros(n, dtype=np.int64)]
+        descricoes = ["Pedido atual"]
+
+        def adicionar(delta: np.ndarray, descricao: str) -> None:
+            ajustes.append(delta)
+            descricoes.append(descricao)
+
+        def unitario(i: int, valor: int) -> np.ndarray:
+            delta = np.zeros(n, dtype=np.int64)
+            delta[i] = valor
+            return delta
+
+        # Pallets incompletos: completar ou retirar, um produto por vez e todos juntos
+        incompletos = np.flatnonzero(resto > 0)
+        faltam = np.where(resto > 0, caixas_pallet - resto, 0)
+        for i in incompletos:
+            adicionar(unitario(i, faltam[i]), f"Completar pallet de {produtos[i]} (+{faltam[i]})")
+            if quantidade[i] > resto[i]:
+                adicionar(unitario(i, -resto[i]), f"Retirar pallet incompleto de {produtos[i]} (-{resto[i]})")
+        if len(incompletos) > 1:
+            adicionar(faltam, "Completar todos os pallets")
+            retirar = np.where(quantidade > resto, -resto, 0)
+            if retirar.any():
+                adicionar(retirar, "Retirar todos os pallets incompletos")
+
+        if total > 0:
+            frota = self.frota.otimizar([total]).iloc[0]
+
+            # Completar o veículo: sobra da frota atual num produto ou proporcional ao pedido
+            sobra = int(frota['capacidade_total']) - total
+            if sobra > 0:
+                for i in np.flatnonzero(quantidade > 0):
+                    adicionar(unitario(i, sobra), f"Completar veículo com {produtos[i]} (+{sobra})")
+                proporcional = np.floor(sobra * quantidade / total).astype(np.int64)
+                proporcional[np.argmax(quantidade)] += sobra - proporcional.sum()
+                adicionar(proporcional, f"Completar veículo proporcionalmente (+{sobra})")
+
+            # Liberar um veículo: menor redução que leva a uma frota mais barata
+            limite = int(total * self.LIMITE_AJUSTE_PERCENTUAL)
+            volumes = np.arange(max(total - limite, 1), total)
+            if len(volumes):
+                mais_baratos = volumes[self.frota.custo_minimo(volumes) < frota['custo_total'] - 0.005]
+                if len(mais_baratos):
+                    excesso = total - int(mais_baratos.max())
+                    for i in np.flatnonzero(quantidade >= excesso):
+                        adicionar(unitario(i, -excesso), f"Reduzir {produtos[i]} para liberar um veículo (-{excesso})")
+
+        candidatos = quantidade + np.vstack(ajustes)
+        variacao = np.abs(candidatos - quantidade).sum(axis=1)
+        validos = (candidatos >= 0).all(axis=1) & (variacao <= max(total * self.LIMITE_AJUSTE_PERCENTUAL, 1))
+        validos[0] = True
+        candidatos = candidatos[validos]
+        descricoes = [d for d, valido in zip(descricoes, validos) if valido]
+
+        # Candidatos repetidos: fica o primeiro (chave pelos bytes da linha, sem ordenar a matriz)
+        primeiros: dict = {}
+        for i, linha in enumerate(candidatos):
+            primeiros.setdefault(linha.tobytes(), i)
+        manter = np.fromiter(primeiros.values(), dtype=np.int64, count=len(primeiros))
+        return candidatos[manter], [descricoes[i] for i in manter]
+
+    def _avaliar(self, df_pedido: pd.DataFrame, candidatos: np.ndarray) -> pd.DataFrame:
+        """
+        Frete da frota ótima e margem líquida de todos os candidatos. Os resultados são
+        por linha: o pedido atual é calculado uma vez por frete por caixa distinto e, de
+        cada candidato, só as linhas com quantidade alterada (custo linear em produtos)
+        """
+        k, n = candidatos.shape
+        atual = candidatos[0]
+        volumes = candidatos.sum(axis=1)
+        frota = self.frota.otimizar(volumes)
+        frete_por_caixa = frota['frete_por_caixa'].to_numpy()
+        fretes, indice_frete = np.unique(frete_por_caixa, return_inverse=True)
+
+        # Pedido atual com cada frete por caixa distinto (poucos: um por composição de frota)
+        base = df_pedido.iloc[np.tile(np.arange(n), len(fretes))].reset_index(drop=True)
+        base["Quantidade"] = np.tile(atual, len(fretes))
+        base["Frete Caixa"] = np.repeat(fretes, n)
+        subtotal_base, lucro_base = (valores.reshape(len(fretes), n) for valores in self._subtotal_lucro(base))
+        subtotal = subtotal_base.sum(axis=1)[indice_frete]
+        lucro = lucro_base.sum(axis=1)[indice_frete]
+
+        # Diferença das linhas alteradas por cada candidato
+        candidato, linha = np.nonzero(candidatos != atual)
+        if len(candidato):
+            alteradas = df_pedido.iloc[linha].reset_index(drop=True)
+            alteradas["Quantidade"] = candidatos[candidato, linha]
+            alteradas["Frete Caixa"] = frete_por_caixa[candidato]
+            subtotal_novo, lucro_novo = self._subtotal_lucro(alteradas)
+            anteriores = indice_frete[candidato], linha
+            subtotal = subtotal + np.bincount(candidato, subtotal_novo - subtotal_base[anteriores], minlength=k)
+            lucro = lucro + np.bincount(candidato, lucro_novo - lucro_base[anteriores], minlength=k)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margem = np.where(subtotal > 0, lucro / subtotal * 100, 0.0)
+
+        return pd.DataFrame({
+            'volume': volumes,
+            'veiculos': frota['veiculos'].to_numpy(),
+            'frete_total': frota['custo_total'].to_numpy(),
+            'custo_por_caixa': frota['custo_por_caixa'].to_numpy(),
+            'frete_por_caixa': frete_por_caixa,
+            'lucro_liquido': lucro,
+            'margem_liquida_pct': margem,
+        })
+
+    def _subtotal_lucro(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Subtotal e lucro líquido de cada linha pela CalculadoraResultados"""
+        resultados = self.calculadora.calcular_resultados_dataframe(df)
+        return tuple(
+            pd.to_numeric(resultados[coluna], errors='coerce').fillna(0).to_numpy(dtype=float)
+            for coluna in ("Subtotal", "Lucro Líquido")
+        )
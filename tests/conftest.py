@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _quadro_produtos(n: int = 400, seed: int = 7, **colunas) -> pd.DataFrame:
+    """
+    Quadro de produtos com todas as colunas lidas pela CalculadoraResultados, com
+    valores aleatórios reprodutíveis; `colunas` substitui colunas inteiras.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Descrição': [f'PRODUTO {i}' for i in range(n)],
+        'Preço de Venda': np.round(rng.uniform(1, 60, n), 3),
+        'Quantidade': rng.integers(0, 5000, n).astype(float),
+        'Custo NET': np.round(rng.uniform(1, 40, n), 3),
+        'Custo Fixo': np.round(rng.uniform(0, 5, n), 3),
+        'Frete Caixa': np.round(rng.uniform(0, 3, n), 3),
+        'IPI': rng.choice([0.0, 0.05, 0.1], n),
+        'MVA': rng.choice([0.0, 0.5686, 0.4], n),
+        'ICMS Interestadual': 0.12,
+        'ICMS Interno Destino': rng.choice([0.17, 0.18, 0.22], n),
+        'FCP': rng.choice([0.0, 0.02], n),
+        'COFINS': 0.076,
+        'PIS': 0.0165,
+        'Comissão': rng.choice([0.0, 0.03, 0.05], n),
+        'Bonificação': rng.choice([0.0, 0.01], n),
+        'Contigência': 0.01,
+        'Contrato': 0.01,
+        '%Estrategico': 0.0,
+    })
+    for coluna, valores in colunas.items():
+        df[coluna] = valores
+    return df
+
+
+@pytest.fixture
+def quadro_produtos():
+    """Fábrica de quadros de produtos: quadro_produtos(n, seed, **colunas)"""
+    return _quadro_produtos
@@ -0,0 +1,74 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from services.cache_service import CacheSWR, cache_swr, status_caches_swr
+
+
+class CarregadorFake:
+    def __init__(self):
+        self.chamadas = 0
+        self.falhar = False
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def __call__(self):
+        self.liberar.wait(5)
+        self.chamadas += 1
+        if self.falhar:
+            raise ConnectionError("SQL Server indisponível")
+        return pd.DataFrame({'versao': [self.chamadas]})
+
+
+def test_serve_copia_vencida_enquanto_atualiza():
+    carregador = CarregadorFake()
+    cache = CacheSWR(carregador, ttl_segundos=0)
+    assert cache.obter()['versao'].iat[0] == 1
+
+    # Atualização lenta: a chamada retorna na hora com a cópia anterior
+    carregador.liberar.clear()
+    assert cache.obter()['versao'].iat[0] == 1
+    assert cache.status()['atualizando']
+    carregador.liberar.set()
+    cache.aguardar(5)
+
+    status = cache.status()
+    assert not status['atualizando']
+    assert status['duracao_ultima_atualizacao'] is not None
+    assert status['ultima_atualizacao'] is not None
+    cache.ttl_segundos = 600
+    assert cache.obter()['versao'].iat[0] == 2
+
+
+def test_erro_mantem_copia_anterior():
+    carregador = CarregadorFake()
+    cache = CacheSWR(carregador, ttl_segundos=0)
+    cache.obter()
+
+    carregador.falhar = True
+    cache.obter()
+    cache.aguardar(5)
+    assert cache.obter()['versao'].iat[0] == 1
+    assert 'indisponível' in cache.status()['ultimo_erro']
+
+    # Sem cópia anterior, o erro da primeira carga é propagado
+    cache.invalidar()
+    with pytest.raises(ConnectionError):
+        cache.obter()
+
+
+def test_decorator_um_cache_por_instancia():
+    class Servico:
+        def __init__(self):
+            self.consultas = 0
+
+        @cache_swr(ttl_segundos=600)
+        def carregar(self):
+            self.consultas += 1
+            return self.consultas
+
+    a, b = Servico(), Servico()
+    assert a.carregar() == a.carregar() == 1
+    assert b.carregar() == 1
+    assert list(status_caches_swr(a)) == ['carregar']
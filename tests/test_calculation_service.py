@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.calculation_service import (
+    CalculadoraPontoEquilibrio, CalculadoraPrecoAlvo, CalculadoraResultados, arredondar_array
+)
+
+
+@pytest.fixture
+def produtos(quadro_produtos):
+    def montar(n=400):
+        df = quadro_produtos(n, seed=7)
+        # Casos de borda: despesas >= 100%, receita zero, lucro acima do adicional de IRPJ
+        df.loc[0, 'Comissão'] = 0.9
+        df.loc[1, 'Preço de Venda'] = 0.0
+        df.loc[2, ['Preço de Venda', 'Quantidade']] = [50.0, 4000.0]
+        return df
+    return montar
+
+
+def test_resultados_vetorizados_iguais_ao_calculo_por_linha(produtos):
+    df = produtos()
+    for tipo_frete in ['CIF', 'FOB']:
+        calculadora = CalculadoraResultados(tipo_frete)
+        esperado = df.apply(calculadora.calcular_resultados_completos, axis=1)
+        obtido = calculadora.calcular_resultados_dataframe(df)
+        pd.testing.assert_frame_equal(obtido, esperado.astype(float), check_exact=True)
+
+
+def test_resultados_vetorizados_colunas_ausentes_e_invalidas(produtos):
+    df = produtos(20).drop(columns=['Custo Fixo', 'PIS'])
+    df['IPI'] = df['IPI'].astype(object)
+    df.loc[3, 'IPI'] = 'abc'
+    calculadora = CalculadoraResultados('CIF')
+    esperado = df.apply(calculadora.calcular_resultados_completos, axis=1)
+    obtido = calculadora.calcular_resultados_dataframe(df)
+    pd.testing.assert_frame_equal(obtido, esperado.astype(float), check_exact=True)
+    assert (obtido.loc[3] == 0).all()
+
+
+def test_arredondar_array_igual_round():
+    valores = np.concatenate([
+        np.arange(-20000, 20000) / 1000,
+        [2.675, 1.005, 0.285, -2.675, 0.5, 1.5, 2.5, -0.001, 1e20, np.nan],
+    ])
+    for decimais in (0, 1, 2):
+        esperado = np.array([round(float(v), decimais) for v in valores])
+        obtido = arredondar_array(valores, decimais)
+        np.testing.assert_array_equal(obtido, esperado)
+
+
+def _ponto_equilibrio_por_linha(df, tipo_frete):
+    resultado = df.copy()
+    alertas = []
+    for index, row in resultado.iterrows():
+        preco, alerta = CalculadoraPontoEquilibrio._calcular_linha(row, tipo_frete)
+        if alerta:
+            alertas.append(alerta)
+        resultado.at[index, "Preço de Venda"] = preco
+    return resultado, alertas
+
+
+def test_ponto_equilibrio_vetorizado_igual_ao_calculo_por_linha(produtos):
+    df = produtos()
+    df.loc[3, 'Custo NET'] = -50.0
+    df.loc[4, 'Contrato'] = np.nan
+    df['Custo Fixo'] = df['Custo Fixo'].astype(object)
+    df.loc[5, 'Custo Fixo'] = 'abc'
+    df.loc[6, 'Custo Fixo'] = None
+    for tipo_frete in ['CIF', 'FOB']:
+        esperado, alertas_esperados = _ponto_equilibrio_por_linha(df, tipo_frete)
+        obtido, alertas = CalculadoraPontoEquilibrio.calcular_para_dataframe(df, tipo_frete)
+        pd.testing.assert_frame_equal(obtido, esperado, check_exact=True)
+        assert alertas == alertas_esperados
+        assert alertas[0].startswith('PRODUTO 0: Despesas')
+        assert alertas[1].startswith('Erro no produto PRODUTO 5')
+
+
+def test_preco_alvo_e_o_menor_centavo_que_atinge_a_margem(produtos):
+    df = produtos(300)
+    df['Custo Fixo'] = df['Custo Fixo'].astype(object)
+    df.loc[5, 'Custo Fixo'] = 'abc'
+    margens = np.where(np.arange(len(df)) % 2 == 0, 0.08, 0.15)
+    for tipo_frete in ['CIF', 'FOB']:
+        precos = CalculadoraPrecoAlvo(tipo_frete).calcular(df, pd.Series(margens, index=df.index))
+        assert precos.loc[0, 'Situação'] == 'INATINGIVEL'  # despesas >= 100%
+        assert precos.loc[5, 'Situação'] == 'INVALIDO'
+
+        ok = precos['Situação'] == 'OK'
+        assert ok.sum() == len(df) - 2
+        calculadora = CalculadoraResultados(tipo_frete)
+        df_ok = df[ok].assign(Quantidade=lambda d: d['Quantidade'].where(d['Quantidade'] > 0, 1.0))
+        no_alvo = calculadora.calcular_resultados_dataframe(df_ok.assign(**{'Preço de Venda': precos.loc[ok, 'Preço Alvo']}))
+        abaixo = calculadora.calcular_resultados_dataframe(df_ok.assign(**{'Preço de Venda': precos.loc[ok, 'Preço Alvo'] - 0.01}))
+        alvo = margens[ok.to_numpy()]
+        assert (no_alvo['Lucro Líquido'] >= alvo * no_alvo['Subtotal'] - 1e-9).all()
+        assert (abaixo['Lucro Líquido'] < alvo * abaixo['Subtotal'] - 1e-9).all()
+        # Pedidos grandes caem no adicional de IRPJ
+        assert (no_alvo['Lucro Antes IR'] > 20000).any()
+
+
+def test_preco_alvo_margem_inatingivel(produtos):
+    df = produtos(10)
+    precos = CalculadoraPrecoAlvo('CIF').calcular(df, 0.95)
+    assert (precos['Situação'] == 'INATINGIVEL').all()
+    assert precos['Preço Alvo'].isna().all()
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+from services.carregamento_service import OtimizadorCarregamento, montar_pallets
+from services.logistics_service import LogisticsService
+
+
+def _particoes(itens):
+    if not itens:
+        yield []
+        return
+    primeiro = itens[0]
+    for particao in _particoes(itens[1:]):
+        for i in range(len(particao)):
+            yield particao[:i] + [[primeiro] + particao[i]] + particao[i + 1:]
+        yield [[primeiro]] + particao
+
+
+def _custo_forca_bruta(otimizador, pallets):
+    cargas = np.column_stack([np.ones(len(pallets)), pallets['peso'], pallets['volume']])
+    melhor = np.inf
+    for particao in _particoes(list(range(len(pallets)))):
+        tipos = [otimizador._tipo_mais_barato(cargas[grupo].sum(axis=0)) for grupo in particao]
+        if min(tipos) >= 0:
+            melhor = min(melhor, sum(otimizador._custos[t] for t in tipos))
+    return melhor
+
+
+def test_montar_pallets_fechados_e_resto():
+    pallets = montar_pallets(
+        np.array(['A', 'B']), np.array([75.0, 80.0]), np.array([50.0, 40.0]),
+        np.array([10.0, 8.0]), np.array([0.1, 0.08])
+    )
+    assert pallets['produto'].tolist() == ['A', 'B', 'B', 'A']
+    assert pallets['caixas'].tolist() == [50, 40, 40, 25]
+    assert pallets['peso'].tolist() == [500, 320, 320, 250]
+
+
+def test_busca_exata_igual_forca_bruta():
+    rng = np.random.default_rng(1)
+    for _ in range(15):
+        n = int(rng.integers(3, 8))
+        pallets = pd.DataFrame({
+            'produto': range(n), 'caixas': 1,
+            'peso': rng.uniform(1000, 14000, n), 'volume': rng.uniform(2, 30, n)
+        })
+        custos = {'truck': float(rng.uniform(1000, 3000)), 'carreta': float(rng.uniform(2500, 5000))}
+        otimizador = OtimizadorCarregamento(LogisticsService.veiculos_padrao(custos))
+        plano = otimizador.otimizar(pallets, exato=True)
+        assert plano['otimo']
+        assert abs(plano['custo_total'] - _custo_forca_bruta(otimizador, pallets)) < 1e-6
+        assert (plano['alocacao']['veiculo'] >= 1).all()
+        for veiculo in plano['veiculos']:
+            tipo = next(v for v in otimizador.veiculos if v['nome'] == veiculo['tipo'])
+            assert veiculo['pallets'] <= tipo['pallets']
+            assert veiculo['peso'] <= tipo['peso'] + 1e-6
+            assert veiculo['volume'] <= tipo['volume'] + 1e-6
+
+
+def test_planejar_carregamento_mistura_truck_e_carreta():
+    # 70 pallets de 100 kg: 1 carreta (58) + 1 truck (12) em vez de 2 carretas
+    log_df = pd.DataFrame({'CODIGO': ['A'], 'CXS_PLT': [10], 'PESO': [10.0], 'VOLUME': [0.05]})
+    prod_df = pd.DataFrame({'Descrição': ['A'], 'Quantidade': [700]})
+    service = LogisticsService(log_df)
+
+    plano = service.planejar_carregamento(prod_df, {'truck': 2000.0, 'carreta': 3500.0})
+    assert plano['quantidades'] == {'truck': 1, 'carreta': 1}
+    assert plano['custo_total'] == 5500.0
+    assert len(plano['alocacao']) == 70
+
+    # Sem frete de truck, só carretas
+    plano = service.planejar_carregamento(prod_df, {'truck': 0.0, 'carreta': 3500.0})
+    assert plano['quantidades'] == {'carreta': 2}
+
+
+def test_heuristica_respeita_peso_e_cubagem():
+    rng = np.random.default_rng(7)
+    n = 25
+    log_df = pd.DataFrame({
+        'CODIGO': [f'P{i}' for i in range(n)], 'CXS_PLT': rng.integers(20, 80, n),
+        'PESO': rng.uniform(5, 25, n), 'VOLUME': rng.uniform(0.02, 0.06, n)
+    })
+    prod_df = pd.DataFrame({'Descrição': log_df['CODIGO'], 'Quantidade': rng.integers(10, 200, n)})
+    service = LogisticsService(log_df)
+    info = service.calcular_logistica(prod_df)
+
+    plano = service.planejar_carregamento(prod_df, {'truck': 3000.0, 'carreta': 4500.0}, exato=False)
+    assert plano['alocacao']['caixas'].sum() == prod_df['Quantidade'].sum()
+    assert abs(sum(v['peso'] for v in plano['veiculos']) - info['peso_total']) < 1e-6
+    for veiculo in plano['veiculos']:
+        assert max(veiculo['ocupacao_pallets'], veiculo['ocupacao_peso'], veiculo['ocupacao_volume']) <= 1 + 1e-9
+
+
+def test_heuristica_em_pedido_grande():
+    rng = np.random.default_rng(11)
+    n = 3000
+    pallets = pd.DataFrame({
+        'produto': range(n), 'caixas': 1,
+        'peso': rng.uniform(100, 1500, n), 'volume': rng.uniform(0.3, 2.5, n)
+    })
+    otimizador = OtimizadorCarregamento(LogisticsService.veiculos_padrao({'truck': 2000.0, 'carreta': 3500.0}))
+    plano = otimizador.otimizar(pallets)
+    assert not plano['otimo']
+    assert (plano['alocacao']['veiculo'] >= 1).all()
+    assert abs(sum(v['peso'] for v in plano['veiculos']) - pallets['peso'].sum()) < 1e-6
+    for veiculo in plano['veiculos']:
+        assert max(veiculo['ocupacao_pallets'], veiculo['ocupacao_peso'], veiculo['ocupacao_volume']) <= 1 + 1e-9
+
+
+def test_planejar_carregamento_memoriza_por_conteudo(monkeypatch):
+    log_df = pd.DataFrame({'CODIGO': ['A', 'B'], 'CXS_PLT': [10, 20], 'PESO': [10.0, 8.0], 'VOLUME': [0.05, 0.04]})
+    service = LogisticsService(log_df)
+    chamadas = []
+    otimizar = OtimizadorCarregamento.otimizar
+    monkeypatch.setattr(OtimizadorCarregamento, 'otimizar',
+                        lambda self, *args, **kwargs: chamadas.append(1) or otimizar(self, *args, **kwargs))
+    custos = {'truck': 2000.0, 'carreta': 3500.0}
+
+    pedido = pd.DataFrame({'Descrição': ['A', 'B'], 'Quantidade': [700, 300]})
+    plano = service.planejar_carregamento(pedido, custos)
+    plano['alocacao']['veiculo'] = 0
+    repetido = service.planejar_carregamento(pedido.copy(), dict(custos))
+    assert len(chamadas) == 1
+    assert repetido['custo_total'] == plano['custo_total']
+    assert (repetido['alocacao']['veiculo'] >= 1).all()
+
+    # Quantidade, custo do veículo ou modo de busca diferentes: novo plano
+    service.planejar_carregamento(pedido.assign(Quantidade=[700, 320]), custos)
+    service.planejar_carregamento(pedido, {'truck': 2100.0, 'carreta': 3500.0})
+    service.planejar_carregamento(pedido, custos, exato=False)
+    assert len(chamadas) == 4
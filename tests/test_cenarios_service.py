@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.tributaria import ConfiguracaoTributaria
+from services.calculation_service import CalculadoraResultados
+from services.cenarios_service import (
+    avaliar_cenario, calcular_matriz_uf, montar_grade_cenarios, parametros_da_tela, pivotar_matriz,
+    preparar_dados_cenario, resumir_matriz_por_uf, varrer_cenarios
+)
+
+PARAMETROS = {'frete_padrao': 2.0, 'contrato_percentual': 0.02, 'comissao_padrao': 0.03}
+
+
+def _planilha(ufs=('SP', 'RJ', 'MG', 'CE', 'RO'), produtos=4):
+    linhas = []
+    for i, uf in enumerate(ufs):
+        for p in range(produtos):
+            linhas.append({
+                'UF': uf, 'Descrição': f'PRODUTO {p}', 'Preço de Venda': 20.0 + p + i,
+                'Quantidade': 100.0 * (p + 1), 'Custo NET': 10.0 + p, 'Custo Fixo': 1.5,
+                'IPI': 0.05, 'MVA': 0.4 if uf != 'SP' else 0.0, 'COFINS': 0.076, 'PIS': 0.0165,
+            })
+    return pd.DataFrame(linhas)
+
+
+def test_preparar_dados_cenario_aplica_aliquotas_e_parametros_da_uf():
+    base = preparar_dados_cenario(_planilha(), 'CE', PARAMETROS, ['PRODUTO 1', 'PRODUTO 2'])
+
+    assert base['Descrição'].tolist() == ['PRODUTO 1', 'PRODUTO 2']
+    aliquotas = ConfiguracaoTributaria.obter_aliquotas('CE')
+    assert (base['ICMS Interno Destino'] == aliquotas['interna']).all()
+    assert (base['FCP'] == aliquotas['fcp']).all()
+    assert (base['ICMS Interestadual'] == 0.12).all()
+    assert (base['Frete Caixa'] == 2.0).all() and (base['Contrato'] == 0.02).all()
+    assert (base['Comissão'] == 0.03).all() and (base['Bonificação'] == 0.0).all()
+    assert (base['UF Destino'] == 'CE').all()
+
+
+def test_matriz_uf_igual_ao_calculo_uf_a_uf():
+    planilha = _planilha()
+    matriz = calcular_matriz_uf(planilha, PARAMETROS, tipo_frete='CIF')
+
+    assert sorted(matriz['UF'].unique()) == ['CE', 'MG', 'RJ', 'RO', 'SP']
+    for uf, grupo in matriz.groupby('UF'):
+        base = preparar_dados_cenario(planilha, uf, PARAMETROS)
+        esperado = CalculadoraResultados('CIF').calcular_resultados_dataframe(base)
+        np.testing.assert_array_equal(grupo[esperado.columns].to_numpy(), esperado.to_numpy())
+
+    mapa = pivotar_matriz(matriz, 'Margem Líquida %')
+    assert mapa.shape == (4, 5)
+    resumo = resumir_matriz_por_uf(matriz)
+    assert resumo['Subtotal'].sum() == matriz['Subtotal'].sum()
+
+
+def test_matriz_uf_repete_ajustes_do_produto_em_todas_as_ufs():
+    ajustes = pd.DataFrame({'Descrição': ['PRODUTO 0'], 'Preço de Venda': [99.0], 'Quantidade': [7.0]})
+    matriz = calcular_matriz_uf(_planilha(), PARAMETROS, ufs=['RJ', 'MG'], ajustes=ajustes)
+
+    produto0 = matriz[matriz['Descrição'] == 'PRODUTO 0']
+    assert (produto0['Preço Venda'] == 99.0).all() and (produto0['Qtd'] == 7.0).all()
+    assert (matriz.loc[matriz['Descrição'] == 'PRODUTO 1', 'Qtd'] == 200.0).all()
+
+
+def test_linha_da_uf_atual_igual_a_tabela_principal():
+    # Quadro da tela: frete otimizado pelo volume e comissão/custos diferentes da planilha
+    planilha = _planilha()
+    tela = preparar_dados_cenario(planilha, 'RJ', PARAMETROS)
+    tela['Frete Caixa'] = 1.37
+    tela['Comissão'] = [0.05, 0.03, 0.0, 0.03]
+    tela.loc[tela.index[2], ['Custo NET', 'Custo Fixo']] = [9.0, 0.5]
+    ajustes = tela[['Descrição', 'Preço de Venda', 'Quantidade', 'Custo NET', 'Custo Fixo',
+                    'Frete Caixa', 'Comissão', 'Bonificação']]
+
+    matriz = calcular_matriz_uf(planilha, PARAMETROS, ufs=['RJ', 'MG'], ajustes=ajustes)
+    esperado = CalculadoraResultados('CIF').calcular_resultados_dataframe(tela)
+    np.testing.assert_array_equal(matriz.loc[matriz['UF'] == 'RJ', esperado.columns].to_numpy(), esperado.to_numpy())
+
+
+def test_montar_grade_cenarios():
+    grade = montar_grade_cenarios({'frete_padrao': 1.5}, comissao_padrao=[0.0, 0.03], tipo_frete=['CIF', 'FOB'])
+    assert len(grade) == 4
+    assert grade[1] == {'frete_padrao': 1.5, 'comissao_padrao': 0.0, 'tipo_frete': 'FOB'}
+    with pytest.raises(ValueError):
+        montar_grade_cenarios(desconto=[0.1])
+
+
+def test_varredura_aplica_zero_explicito():
+    planilha = _planilha().assign(**{'Comissão': 0.04, 'Bonificação': 0.02})
+    grade = montar_grade_cenarios({'frete_padrao': 1.5}, comissao_padrao=[0.0, None], custo_fixo_global=[0.0])
+    sem_comissao, comissao_planilha = (preparar_dados_cenario(planilha, 'RJ', cenario) for cenario in grade)
+
+    assert (sem_comissao['Comissão'] == 0.0).all() and (sem_comissao['Custo Fixo'] == 0.0).all()
+    assert (comissao_planilha['Comissão'] == 0.04).all() and (comissao_planilha['Bonificação'] == 0.02).all()
+    resumo = varrer_cenarios(planilha, grade, 'RJ', max_processos=1)
+    assert resumo.loc[0, 'lucro_liquido'] > resumo.loc[1, 'lucro_liquido']
+
+
+def test_parametros_da_tela_tratam_zero_como_nao_informado():
+    tela = {'frete_padrao': 0.0, 'comissao_padrao': 0.0, 'bonificacao_global': 0.01, 'custo_fixo_global': 0.0}
+    assert parametros_da_tela(tela) == {
+        'frete_padrao': 0.0, 'comissao_padrao': None, 'bonificacao_global': 0.01, 'custo_fixo_global': None
+    }
+
+
+@pytest.mark.parametrize('metodo_inicio', ['fork', 'spawn'])
+def test_varredura_paralela_igual_a_sequencial(metodo_inicio):
+    planilha = _planilha()
+    grade = montar_grade_cenarios(PARAMETROS, comissao_padrao=[0.0, 0.05], frete_padrao=[1.0, 3.0],
+                                  tipo_frete=['CIF', 'FOB'])
+    sequencial = varrer_cenarios(planilha, grade, ['RJ', 'CE'], max_processos=1)
+    paralela = varrer_cenarios(planilha, grade, ['RJ', 'CE'], max_processos=2, tamanho_lote=3,
+                               metodo_inicio=metodo_inicio)
+
+    assert len(sequencial) == len(grade) * 2
+    pd.testing.assert_frame_equal(paralela, sequencial)
+    assert sequencial.loc[0].to_dict() == avaliar_cenario(planilha, grade[0], ['RJ', 'CE'])[0]
@@ -0,0 +1,120 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from services import database_service
+from services.cliente_sync_service import SincronizadorClientes
+from services.database_service import DatabaseService
+
+
+class BancoFake:
+    """Simula as consultas completa e incremental de clientes"""
+
+    def __init__(self):
+        self.completo = pd.DataFrame({
+            'A1_COD': ['000001', '000002', '000003', '000003'],
+            'A1_LOJA': ['01', '01', '01', '01'],
+            'A1_NOME': ['CLIENTE A', 'CLIENTE B', 'CLIENTE C', 'CLIENTE C'],
+            'latitude': [-23.5, -22.9, -19.9, -19.8],
+            '_MARCA': [10, 20, 30, 30],
+        })
+        self.alteracoes = pd.DataFrame(columns=['A1_COD', 'A1_LOJA', 'A1_NOME', 'latitude', '_MARCA', '_ATIVO'])
+        self.consultas_completas = 0
+        self.marcas_consultadas = []
+
+    def carregar_completo(self):
+        self.consultas_completas += 1
+        return self.completo.copy()
+
+    def carregar_alteracoes(self, marca):
+        self.marcas_consultadas.append(marca)
+        return self.alteracoes[self.alteracoes['_MARCA'] >= marca].copy()
+
+
+def test_sincronizacao_incremental_com_tombstones():
+    banco = BancoFake()
+    sincronizador = SincronizadorClientes(banco.carregar_completo, banco.carregar_alteracoes,
+                                          intervalo_sincronizacao=0)
+
+    inicial = sincronizador.obter()
+    assert len(inicial) == 4
+    assert '_MARCA' not in inicial.columns
+    assert sincronizador.marca == 30
+
+    # Alteração de nome, bloqueio de um cliente e cliente novo
+    banco.alteracoes = pd.DataFrame({
+        'A1_COD': ['000001', '000002', '000004'],
+        'A1_LOJA': ['01', '01', '01'],
+        'A1_NOME': ['CLIENTE A NOVO', 'CLIENTE B', 'CLIENTE D'],
+        'latitude': [-23.5, -22.9, -15.0],
+        '_MARCA': [40, 41, 42],
+        '_ATIVO': [1, 0, 1],
+    })
+    atualizado = sincronizador.obter()
+    assert banco.consultas_completas == 1
+    assert banco.marcas_consultadas == [30]
+    assert sincronizador.marca == 42
+    assert sorted(atualizado['A1_COD']) == ['000001', '000003', '000003', '000004']
+    assert atualizado.loc[atualizado['A1_COD'] == '000001', 'A1_NOME'].tolist() == ['CLIENTE A NOVO']
+    assert list(atualizado.columns) == list(inicial.columns)
+    assert sincronizador.estatisticas['tombstones'] == 1
+
+    # Snapshot anterior não é alterado (troca atômica)
+    assert inicial.loc[inicial['A1_COD'] == '000001', 'A1_NOME'].tolist() == ['CLIENTE A']
+
+    # Reaplicar a partir da mesma marca é idempotente
+    pd.testing.assert_frame_equal(sincronizador.obter(), atualizado)
+
+
+def test_erro_mantem_snapshot_anterior():
+    banco = BancoFake()
+    sincronizador = SincronizadorClientes(banco.carregar_completo, banco.carregar_alteracoes,
+                                          intervalo_sincronizacao=0)
+    inicial = sincronizador.obter()
+
+    def falhar(marca):
+        raise ConnectionError("banco indisponível")
+    sincronizador.carregar_alteracoes = falhar
+
+    assert sincronizador.obter() is inicial
+    assert 'indisponível' in sincronizador.estatisticas['ultimo_erro']
+
+
+def test_sem_coluna_de_marca_faz_recarga_completa():
+    banco = BancoFake()
+    banco.completo = banco.completo.drop(columns=['_MARCA'])
+    sincronizador = SincronizadorClientes(banco.carregar_completo, banco.carregar_alteracoes)
+    sincronizador.obter()
+    sincronizador.sincronizar()
+    assert banco.consultas_completas == 2
+    assert banco.marcas_consultadas == []
+
+
+def _read_sql_falhando_com_marca(erro):
+    """pd.read_sql que falha (como o pandas, embrulhando o erro) só na consulta com a marca"""
+    def read_sql(query, conexao, **kwargs):
+        if '_MARCA' in query:
+            try:
+                raise erro
+            except Exception as original:
+                raise pd.errors.DatabaseError(f"Execution failed on sql: {original}") from original
+        return pd.DataFrame({'A1_COD': ['000001']})
+    return read_sql
+
+
+def test_marca_desativada_so_com_coluna_inexistente(tmp_path, monkeypatch):
+    fabrica = lambda: sqlite3.connect(str(tmp_path / 'db.sqlite'), check_same_thread=False)
+
+    transitorio = Exception('HYT00', '[HYT00] [Microsoft][ODBC Driver 17 for SQL Server]Query timeout expired (0)')
+    monkeypatch.setattr(database_service.pd, 'read_sql', _read_sql_falhando_com_marca(transitorio))
+    service = DatabaseService('', fabrica_conexao=fabrica)
+    with pytest.raises(pd.errors.DatabaseError):
+        service._consultar_clientes_completo()
+    assert service.coluna_marca == DatabaseService.COLUNA_MARCA_PADRAO
+
+    coluna = Exception('42S22', "[42S22] [Microsoft][ODBC Driver 17 for SQL Server]Invalid column name 'S_T_A_M_P_'. (207)")
+    monkeypatch.setattr(database_service.pd, 'read_sql', _read_sql_falhando_com_marca(coluna))
+    assert len(service._consultar_clientes_completo()) == 1
+    assert service.coluna_marca is None
+    assert service.metricas_pool()['em_uso'] == 0
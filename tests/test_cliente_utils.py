@@ -0,0 +1,57 @@
+import pandas as pd
+
+from utils.cliente_utils import IndiceClientes, montar_rotulos_clientes, obter_indice_clientes
+
+
+def _clientes():
+    return pd.DataFrame({
+        'A1_NOME': ['SUPERMERCADO SÃO JOÃO LTDA', 'ATACADO CENTRAL', 'MERCADINHO JOAO', 'ATACADO CENTRAL'],
+        'A1_COD': ['000010', '000020', '000030', '000020'],
+        'A1_LOJA': ['01', '01', '01', '01'],
+        'A1_EST': ['SP', 'RJ', 'MG', 'RJ'],
+        'A1_MUN': ['SAO PAULO', 'NITEROI', 'BELO HORIZONTE', 'NITEROI'],
+        'cidade_ibge': ['3550308', '3303302', '3106200', '3303302'],
+        'REDE': ['REDE JOAO', 'ATACADO CENTRAL', '', 'ATACADO CENTRAL'],
+    }, index=[7, 3, 9, 5])
+
+
+def _rotulos_por_iterrows(clientes_df):
+    opcoes_clientes = []
+    for idx, row in clientes_df.iterrows():
+        opcao = f"{row['A1_NOME']} - {row['cidade_ibge']}/{row['A1_EST']} - {row['A1_COD']}/{row['A1_LOJA']}"
+        if row['REDE'] and str(row['REDE']) != str(row['A1_NOME'])[:20]:
+            opcao += f" - [{row['REDE']}]"
+        opcoes_clientes.append(opcao)
+    return opcoes_clientes
+
+
+def test_rotulos_iguais_ao_formato_original():
+    clientes = _clientes()
+    esperados = _rotulos_por_iterrows(clientes)
+    assert montar_rotulos_clientes(clientes).tolist() == esperados
+
+    indice = IndiceClientes(clientes)
+    for rotulo in esperados:
+        assert indice.posicao(rotulo) == esperados.index(rotulo)
+
+
+def test_busca_prefixo_antes_de_substring():
+    indice = IndiceClientes(_clientes())
+    resultado = indice.buscar('joao')
+    # "MERCADINHO JOAO" e "SÃO JOÃO" só contêm o termo; nenhum começa com ele
+    assert len(resultado) == 2
+    assert indice.buscar('mercadinho')[0].startswith('MERCADINHO JOAO')
+    assert indice.buscar('rede')[0].startswith('SUPERMERCADO')
+    assert indice.buscar('000030') == [indice.rotulos[2]]
+    assert indice.buscar('niter', limite=1) == [indice.rotulos[1]]
+    assert indice.buscar('inexistente') == []
+
+
+def test_indice_reaproveitado_enquanto_clientes_nao_mudam():
+    cache = {}
+    primeiro = obter_indice_clientes(_clientes(), cache)
+    assert obter_indice_clientes(_clientes(), cache) is primeiro
+
+    alterados = _clientes()
+    alterados.loc[9, 'A1_NOME'] = 'MERCADINHO NOVO'
+    assert obter_indice_clientes(alterados, cache) is not primeiro
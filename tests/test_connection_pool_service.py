@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from services.connection_pool_service import PoolConexoes
+from services.database_service import DatabaseService
+
+
+def _fabrica(caminho):
+    return lambda: sqlite3.connect(caminho, check_same_thread=False)
+
+
+def test_pool_reaproveita_conexoes(tmp_path):
+    pool = PoolConexoes(_fabrica(str(tmp_path / 'db.sqlite')), tamanho_maximo=2)
+    with pool.conexao() as conexao:
+        primeira = conexao
+    with pool.conexao() as conexao:
+        assert conexao is primeira
+
+    metricas = pool.metricas()
+    assert metricas['criadas'] == 1
+    assert metricas['emprestimos'] == 2
+    assert metricas['em_uso'] == 0
+    assert metricas['ociosas'] == 1
+
+
+def test_pool_limitado_aguarda_devolucao(tmp_path):
+    pool = PoolConexoes(_fabrica(str(tmp_path / 'db.sqlite')), tamanho_maximo=1, timeout_espera=0.1)
+    conexao = pool.adquirir()
+    with pytest.raises(TimeoutError):
+        pool.adquirir()
+
+    pool.timeout_espera = 5
+    threading.Timer(0.05, pool.liberar, args=(conexao,)).start()
+    assert pool.adquirir() is conexao
+
+    metricas = pool.metricas()
+    assert metricas['esperas'] == 2
+    assert metricas['criadas'] == 1
+    assert metricas['tempo_espera_total'] > 0
+
+
+def test_pool_descarta_conexao_quebrada_e_ociosa(tmp_path):
+    pool = PoolConexoes(_fabrica(str(tmp_path / 'db.sqlite')), intervalo_verificacao=0)
+    with pool.conexao() as conexao:
+        quebrada = conexao
+    quebrada.close()
+
+    # Verificação de saúde troca a conexão fechada por uma nova
+    with pool.conexao() as conexao:
+        assert conexao is not quebrada
+        conexao.execute("SELECT 1")
+
+    # Erro durante o uso descarta a conexão
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.conexao() as conexao:
+            conexao.execute("SELECT * FROM tabela_inexistente")
+    assert pool.metricas()['abertas'] == 0
+
+    pool.tempo_ocioso_maximo = 0.01
+    with pool.conexao():
+        pass
+    time.sleep(0.02)
+    metricas = pool.metricas()
+    assert metricas['ociosas'] == 0
+    assert metricas['descartadas'] == 3
+
+
+def test_database_service_usa_pool(tmp_path):
+    service = DatabaseService('', fabrica_conexao=_fabrica(str(tmp_path / 'db.sqlite')), tamanho_pool=2)
+    assert service.verificar_conexao()
+    assert service.verificar_conexao()
+    assert service.metricas_pool()['criadas'] == 1
+
+
+def test_pool_libera_vaga_em_excecao_fora_de_exception(tmp_path):
+    class Interrupcao(BaseException):
+        """Como as exceções de controle do Streamlit (StopException, RerunException)"""
+
+    pool = PoolConexoes(_fabrica(str(tmp_path / 'db.sqlite')), tamanho_maximo=1, timeout_espera=0.1)
+    with pytest.raises(Interrupcao):
+        with pool.conexao():
+            raise Interrupcao()
+    metricas = pool.metricas()
+    assert metricas['em_uso'] == 0
+    assert metricas['abertas'] == 0
+    with pool.conexao() as conexao:
+        conexao.execute("SELECT 1")
+
+
+def test_fechar_descarta_conexoes_emprestadas_na_devolucao(tmp_path):
+    pool = PoolConexoes(_fabrica(str(tmp_path / 'db.sqlite')), tamanho_maximo=2)
+    with pool.conexao():
+        pass
+    emprestada = pool.adquirir()
+    pool.adquirir()
+    pool.fechar()
+    assert pool.metricas()['abertas'] == 2
+
+    pool.liberar(emprestada)
+    metricas = pool.metricas()
+    assert metricas['abertas'] == 1
+    assert metricas['ociosas'] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        emprestada.execute("SELECT 1")
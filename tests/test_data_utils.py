@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from services.cliente_sync_service import SincronizadorClientes
+from utils.cliente_utils import IndiceClientes
+from utils.data_utils import compactar_clientes, compactar_tabela_frete, relatorio_memoria
+from utils.frete_utils import FreightTariffIndex
+
+
+def _clientes(n=600):
+    df = pd.DataFrame({
+        'A1_COD': [f'{i:06d}' for i in range(n)],
+        'A1_LOJA': ['01'] * n,
+        'A1_NOME': [f'CLIENTE {i} LTDA' for i in range(n)],
+        'REDE': [f'REDE {i % 20}' if i % 3 else None for i in range(n)],
+        'A1_EST': [['SP', 'MG', 'RJ'][i % 3] for i in range(n)],
+        'A1_MUN': [f'SÃO JOSÉ {i % 25}' for i in range(n)],
+        'A1_END': [f'RUA {i}' for i in range(n)],
+        'cidade_ibge': [str(3550308 + i % 25) for i in range(n)],
+        'latitude': [str(-23.5505 - i / 1000) for i in range(n)],
+        'longitude': [str(-46.6333 - i / 1000) for i in range(n)],
+        'A1_LC': [1000.5 * (i % 7) for i in range(n)],
+    })
+    # A consulta antiga trazia A1_END duas vezes
+    return pd.concat([df, df[['A1_END']]], axis=1)
+
+
+def test_compactar_clientes_preserva_valores_e_reduz_memoria():
+    clientes = _clientes()
+    compactado = compactar_clientes(clientes)
+
+    assert list(compactado.columns).count('A1_END') == 1
+    for coluna in ['A1_EST', 'REDE', 'A1_MUN', 'cidade_ibge']:
+        assert isinstance(compactado[coluna].dtype, pd.CategoricalDtype)
+    assert compactado['A1_LC'].dtype == np.float32
+    assert compactado['latitude'].dtype == np.float64
+    assert compactado['latitude'].tolist() == [float(v) for v in clientes['latitude']]
+    assert compactado['REDE'].isna().sum() == clientes['REDE'].isna().sum()
+
+    relatorio = relatorio_memoria(clientes, compactado)
+    assert relatorio['total_depois'] < relatorio['total_antes']
+    assert relatorio['reducao_percentual'] > 30
+    assert relatorio['colunas']['A1_END']['antes'] == 2 * relatorio['colunas']['A1_END']['depois']
+
+
+def test_indice_de_clientes_igual_apos_compactacao():
+    clientes = _clientes().loc[:, lambda df: ~df.columns.duplicated()]
+    original = IndiceClientes(clientes)
+    compactado = IndiceClientes(compactar_clientes(clientes))
+
+    assert compactado.rotulos == original.rotulos
+    assert compactado.buscar('sao jose 1') == original.buscar('sao jose 1')
+    assert compactado.buscar('rede 7') == original.buscar('rede 7')
+
+
+def test_compactar_tabela_frete_mantem_busca_e_so_reduz_tarifa_exata():
+    n = 200
+    faixas = ['0-100', '101-200', '201-400', '401+']
+    tabela = pd.DataFrame({
+        'cidade_ibge': [str(3550308 + i % 50) for i in range(n)],
+        'CIDADE': [f'CIDADE {i % 50}' for i in range(n)],
+        'FAIXA_KM': [faixas[i % 4] for i in range(n)],
+        'TBL_TRCK': [float(100 + i) for i in range(n)],
+        'TBL_CRRT': [100.1 + i for i in range(n)],
+    })
+    compactada = compactar_tabela_frete(tabela)
+
+    assert compactada['TBL_TRCK'].dtype == np.float32
+    assert compactada['TBL_CRRT'].dtype == np.float64  # 100.1 não é exato em float32
+    assert isinstance(compactada['FAIXA_KM'].dtype, pd.CategoricalDtype)
+
+    original, indice = FreightTariffIndex(tabela), FreightTariffIndex(compactada)
+    for ibge in ['3550310', '3550399', '3551000']:
+        for faixa in ['101-200', '150', '999']:
+            for tipo in ['truck', 'carreta']:
+                assert indice.buscar(ibge, faixa, tipo) == original.buscar(ibge, faixa, tipo)
+
+
+def test_sincronizador_compacta_snapshot_apos_alteracoes():
+    completo = _clientes(90).loc[:, lambda df: ~df.columns.duplicated()].assign(_MARCA=1)
+    alteracoes = completo.head(2).assign(A1_MUN='NOVA CIDADE', _MARCA=2, _ATIVO=1)
+    sincronizador = SincronizadorClientes(lambda: completo.copy(), lambda marca: alteracoes.copy(),
+                                          intervalo_sincronizacao=0, pos_processar=compactar_clientes)
+
+    assert isinstance(sincronizador.obter()['A1_MUN'].dtype, pd.CategoricalDtype)
+    atualizado = sincronizador.sincronizar()
+    assert isinstance(atualizado['A1_MUN'].dtype, pd.CategoricalDtype)
+    assert (atualizado['A1_MUN'] == 'NOVA CIDADE').sum() == 2
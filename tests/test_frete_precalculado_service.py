@@ -0,0 +1,129 @@
+import pandas as pd
+
+from services.frete_precalculado_service import FretePrecalculadoService
+from services.geo_cache_service import GeocodeCache, RotaCache
+from services.geolocation_service import GeolocationService
+from utils.data_utils import extrair_faixas_km_ordenadas
+from utils.frete_utils import FreightTariffIndex, obter_faixa_km_exata
+
+ORIGEM = GeolocationService.ORIGENS_DISPONIVEIS["Matriz (SP)"]
+
+
+class GeoContador(GeolocationService):
+    """Serviço offline que registra quantos destinos foram calculados"""
+
+    def __init__(self, tmp_path, com_rotas=True):
+        cache = GeocodeCache(str(tmp_path / 'g.sqlite'))
+        cache.gravar(ORIGEM, -23.5, -46.6)
+        super().__init__(None, cache_geocode=cache, cache_rotas=RotaCache())
+        self.destinos_calculados = 0
+        if com_rotas:
+            # Rotas já consultadas na API: distâncias com status OK
+            for lat, lng in zip(_clientes()['latitude'], _clientes()['longitude']):
+                self.gravar_rota(lat, lng)
+
+    def gravar_rota(self, lat, lng):
+        km = round(self.haversine(-23.5, -46.6, lat, lng) * 1.2 + 5, 1)
+        self.cache_rotas.gravar((-23.5, -46.6), (lat, lng), f"{km} km", "1 h", km)
+
+    def calcular_distancias_lote(self, origem, destinos, **kwargs):
+        self.destinos_calculados += len(destinos)
+        return super().calcular_distancias_lote(origem, destinos, **kwargs)
+
+
+def _clientes():
+    return pd.DataFrame({
+        'A1_COD': ['000001', '000002', '000003'],
+        'A1_LOJA': ['01', '01', '02'],
+        'A1_CEP': ['01001000', '20040002', '30130010'],
+        'A1_EST': ['SP', 'RJ', 'MG'],
+        'latitude': [-23.55, -22.90, -19.92],
+        'longitude': [-46.63, -43.17, -43.94],
+        'cidade_ibge': ['3550308', '3304557', '3106200'],
+    })
+
+
+def _tabela():
+    return pd.DataFrame({
+        'cidade_ibge': ['3550308', '3304557', '3304557', '3106200'],
+        'FAIXA_KM': ['0 - 100', '301 - 600', '601 - 1000', '601 - 1000'],
+        'TBL_TRCK': [1.0, 2.5, 3.0, 3.5],
+        'TBL_CRRT': [0.8, 2.0, 2.4, 2.9],
+    })
+
+
+FAIXAS = extrair_faixas_km_ordenadas(_tabela())
+
+
+def test_atualizacao_incremental(tmp_path):
+    geo = GeoContador(tmp_path)
+    service = FretePrecalculadoService(geo, caminho=str(tmp_path / 'frete.sqlite'))
+
+    estatisticas = service.atualizar(_clientes(), _tabela(), FAIXAS, [ORIGEM])
+    assert estatisticas == {'recalculados': 3, 'mantidos': 0, 'removidos': 0}
+
+    # Registro idêntico ao cálculo ao vivo (faixa + busca inteligente)
+    registro = service.obter('000002', '01', ORIGEM)
+    assert registro['faixa_km'] == obter_faixa_km_exata(registro['distancia_km'], FAIXAS)
+    indice = FreightTariffIndex(_tabela())
+    assert (registro['truck_valor'], registro['truck_faixa'], registro['truck_metodo']) == \
+        indice.buscar('3304557', registro['faixa_km'], 'truck')
+    assert FretePrecalculadoService.resultado_frete(registro)['carreta']['valor'] == registro['carreta_valor']
+
+    # Nada mudou: nenhum destino recalculado
+    geo.destinos_calculados = 0
+    assert service.atualizar(_clientes(), _tabela(), FAIXAS, [ORIGEM])['recalculados'] == 0
+    assert geo.destinos_calculados == 0
+
+    # CEP alterado em um cliente e tarifa alterada em outro IBGE
+    clientes = _clientes()
+    clientes.loc[0, ['A1_CEP', 'latitude']] = ['01310100', -23.56]
+    tabela = _tabela()
+    tabela.loc[tabela['cidade_ibge'] == '3106200', 'TBL_TRCK'] = 4.0
+    estatisticas = service.atualizar(clientes, tabela, FAIXAS, [ORIGEM])
+    assert estatisticas['recalculados'] == 2
+    assert geo.destinos_calculados == 2
+    assert service.obter('000003', '02', ORIGEM)['truck_valor'] == 4.0
+
+    # Cliente inativo sai da tabela
+    estatisticas = service.atualizar(clientes.iloc[:2], tabela, FAIXAS, [ORIGEM])
+    assert estatisticas['removidos'] == 1
+    assert service.obter('000003', '02', ORIGEM) is None
+
+
+def test_atualizacao_em_segundo_plano(tmp_path):
+    geo = GeoContador(tmp_path)
+    service = FretePrecalculadoService(geo, caminho=str(tmp_path / 'frete.sqlite'))
+
+    assert service.iniciar_atualizacao(_clientes(), _tabela(), FAIXAS, [ORIGEM])
+    service.aguardar(timeout=30)
+    status = service.status_atualizacao()
+    assert not status['em_execucao']
+    assert status['resultado']['recalculados'] == 3
+
+    # Dentro do intervalo mínimo não dispara de novo
+    assert not service.iniciar_atualizacao(_clientes(), _tabela(), FAIXAS, [ORIGEM])
+    assert service.obter('000001', '01', ORIGEM) is not None
+
+
+def test_distancia_estimada_volta_a_ser_calculada(tmp_path):
+    geo = GeoContador(tmp_path, com_rotas=False)
+    service = FretePrecalculadoService(geo, caminho=str(tmp_path / 'frete.sqlite'))
+    service.atualizar(_clientes(), _tabela(), FAIXAS, [ORIGEM])
+    assert service.obter('000002', '01', ORIGEM)['status'] == 'ESTIMADA'
+
+    # Sem rota real, a estimativa é refeita; com a rota, o registro fica OK e estável
+    assert service.atualizar(_clientes(), _tabela(), FAIXAS, [ORIGEM])['recalculados'] == 3
+    geo.gravar_rota(-22.90, -43.17)
+    service.atualizar(_clientes(), _tabela(), FAIXAS, [ORIGEM])
+    assert service.obter('000002', '01', ORIGEM)['status'] == 'OK'
+    assert service.atualizar(_clientes(), _tabela(), FAIXAS, [ORIGEM])['recalculados'] == 2
+
+
+def test_assinatura_inclui_faixas():
+    tabela = _tabela()
+    outras_faixas = FAIXAS + [(1001, float('inf'), '1001+')]
+    assinaturas = FretePrecalculadoService.assinar_tarifas(tabela, FAIXAS)
+    alteradas = FretePrecalculadoService.assinar_tarifas(tabela, outras_faixas)
+    assert all(assinaturas[chave] != alteradas[chave] for chave in assinaturas)
+    assert assinaturas == FretePrecalculadoService.assinar_tarifas(tabela, list(FAIXAS))
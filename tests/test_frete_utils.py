@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from utils.frete_utils import (
+    FreightTariffIndex, buscar_frete_inteligente, extrair_distancia_da_faixa
+)
+
+
+def _buscar_por_varredura(df_clientes: pd.DataFrame, cidade_ibge: str, faixa_km: str, tipo_veiculo='truck') -> tuple:
+    """Varredura original do DataFrame, usada como referência"""
+    
+    # Primeira tentativa: busca exata por cidade_ibge e faixa
+    linha_exata = df_clientes[
+        (df_clientes['cidade_ibge'] == cidade_ibge) &
+        (df_clientes['FAIXA_KM'] == faixa_km)
+    ]
+    
+    if not linha_exata.empty:
+        # Encontrou correspondência exata
+        if tipo_veiculo == 'truck':
+            valor = linha_exata.iloc[0]['TBL_TRCK'] if not pd.isna(linha_exata.iloc[0]['TBL_TRCK']) else 0.0
+        elif tipo_veiculo == 'carreta':
+            valor = linha_exata.iloc[0]['TBL_CRRT'] if 'TBL_CRRT' in linha_exata.columns and not pd.isna(linha_exata.iloc[0]['TBL_CRRT']) else 0.0
+        else:
+            valor = 0.0
+        
+        if valor > 0:
+            return float(valor), faixa_km, "exata"
+    
+    # Segunda tentativa: buscar por IBGE e calcular pela faixa mais próxima
+    linhas_ibge = df_clientes[df_clientes['cidade_ibge'] == cidade_ibge]
+    
+    if not linhas_ibge.empty:
+        # Extrair distância da faixa solicitada para comparação
+        distancia_solicitada = extrair_distancia_da_faixa(faixa_km)
+        
+        if distancia_solicitada is not None:
+            # Encontrar a faixa mais próxima disponível para este IBGE
+            melhor_faixa = None
+            menor_diferenca = float('inf')
+            melhor_linha = None
+            
+            for _, linha in linhas_ibge.iterrows():
+                faixa_disponivel = linha['FAIXA_KM']
+                distancia_disponivel = extrair_distancia_da_faixa(faixa_disponivel)
+                
+                if distancia_disponivel is not None:
+                    diferenca = abs(distancia_solicitada - distancia_disponivel)
+                    if diferenca < menor_diferenca:
+                        menor_diferenca = diferenca
+                        melhor_faixa = faixa_disponivel
+                        melhor_linha = linha
+            
+            # Se encontrou uma faixa próxima, calcular o valor
+            if melhor_linha is not None:
+                if tipo_veiculo == 'truck':
+                    valor = melhor_linha['TBL_TRCK'] if not pd.isna(melhor_linha['TBL_TRCK']) else 0.0
+                elif tipo_veiculo == 'carreta':
+                    valor = melhor_linha['TBL_CRRT'] if 'TBL_CRRT' in melhor_linha and not pd.isna(melhor_linha['TBL_CRRT']) else 0.0
+                else:
+                    valor = 0.0
+                
+                if valor > 0:
+                    return float(valor), melhor_faixa, f"aproximada (IBGE {cidade_ibge})"
+        
+        # Se não conseguiu calcular por proximidade, pegar qualquer valor do IBGE
+        if tipo_veiculo == 'truck':
+            valores_validos = linhas_ibge['TBL_TRCK'].dropna()
+            if not valores_validos.empty:
+                primeira_linha = linhas_ibge[linhas_ibge['TBL_TRCK'].notna()].iloc[0]
+                return float(valores_validos.iloc[0]), primeira_linha['FAIXA_KM'], f"IBGE {cidade_ibge} (primeira disponível)"
+        elif tipo_veiculo == 'carreta':
+            if 'TBL_CRRT' in linhas_ibge.columns:
+                valores_validos = linhas_ibge['TBL_CRRT'].dropna()
+                if not valores_validos.empty:
+                    primeira_linha = linhas_ibge[linhas_ibge['TBL_CRRT'].notna()].iloc[0]
+                    return float(valores_validos.iloc[0]), primeira_linha['FAIXA_KM'], f"IBGE {cidade_ibge} (primeira disponível)"
+    
+    # Terceira tentativa: buscar por região (primeiros dígitos do IBGE)
+    if len(cidade_ibge) >= 4:
+        prefixo_ibge = cidade_ibge[:4]
+        linhas_similar = df_clientes[df_clientes['cidade_ibge'].str.startswith(prefixo_ibge)]
+        
+        if not linhas_similar.empty:
+            if tipo_veiculo == 'truck':
+                valores_validos = linhas_similar['TBL_TRCK'].dropna()
+                if not valores_validos.empty:
+                    return float(valores_validos.median()), "regional", f"regional ({prefixo_ibge}*)"
+            elif tipo_veiculo == 'carreta':
+                if 'TBL_CRRT' in linhas_similar.columns:
+                    valores_validos = linhas_similar['TBL_CRRT'].dropna()
+                    if not valores_validos.empty:
+                        return float(valores_validos.median()), "regional", f"regional ({prefixo_ibge}*)"
+    
+    # Se nada funcionou, retorna 0
+    return 0.0, "não encontrada", "não encontrado"
+
+
+def _tabela_fretes(n=600, seed=3):
+    rng = np.random.default_rng(seed)
+    faixas = ['0-50', '51-100', '101-150', '100-200', '150', '201-300', '301-400', '1000+', 'xx']
+    ibges = [str(3550308 + i) for i in range(40)] + ['3304557', '3304558', '123']
+    truck = np.round(rng.uniform(500, 5000, n), 2)
+    truck[rng.random(n) < 0.15] = np.nan
+    carreta = np.round(rng.uniform(900, 9000, n), 2)
+    carreta[rng.random(n) < 0.3] = np.nan
+    carreta[rng.random(n) < 0.05] = 0.0
+    return pd.DataFrame({
+        'cidade_ibge': rng.choice(ibges, n),
+        'FAIXA_KM': rng.choice(faixas, n),
+        'TBL_TRCK': truck,
+        'TBL_CRRT': carreta,
+    })
+
+
+def test_indice_igual_a_varredura():
+    df = _tabela_fretes()
+    indice = FreightTariffIndex(df)
+    consultas_ibge = list(df['cidade_ibge'].unique()) + ['3550999', '9999999', '12']
+    consultas_faixa = ['0-50', '125', '175', '1000+', '250-260', 'xx', 'nan', '5000']
+    for ibge in consultas_ibge:
+        for faixa in consultas_faixa:
+            for tipo in ['truck', 'carreta', 'bitrem']:
+                assert indice.buscar(ibge, faixa, tipo) == _buscar_por_varredura(df, ibge, faixa, tipo)
+
+
+def test_indice_sem_coluna_carreta_e_metodos():
+    df = pd.DataFrame({
+        'cidade_ibge': ['3550308', '3550308', '3304557'],
+        'FAIXA_KM': ['0-50', '101-150', '0-50'],
+        'TBL_TRCK': [1000.0, 2000.0, np.nan],
+    })
+    indice = FreightTariffIndex(df)
+    assert indice.buscar('3550308', '0-50') == (1000.0, '0-50', 'exata')
+    assert indice.buscar('3550308', '151-200') == (2000.0, '101-150', 'aproximada (IBGE 3550308)')
+    assert indice.buscar('3304557', '0-50') == (0.0, 'não encontrada', 'não encontrado')
+    assert indice.buscar('3550999', '0-50') == (1500.0, 'regional', 'regional (3550*)')
+
+    resultado = buscar_frete_inteligente(indice, '3550308', '0-50')
+    assert resultado['carreta']['valor'] == 0.0
+    assert resultado == buscar_frete_inteligente(df, '3550308', '0-50')
@@ -0,0 +1,85 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from config.veiculos import ConfiguracaoVeiculos
+from services.frota_service import OtimizadorFrota, calcular_frete_frota
+from utils.frete_utils import calcular_frete_otimizado
+
+RESULTADO_FRETE = {
+    'truck': {'valor': 2000.0, 'faixa_usada': '0-100', 'metodo': 'exato'},
+    'carreta': {'valor': 3500.0, 'faixa_usada': '0-100', 'metodo': 'exato'},
+    'capacidades': {'truck': 870, 'carreta': 1740}
+}
+
+
+def _custo_forca_bruta(otimizador, volume):
+    faixas = [range(int(np.ceil(volume / c)) + 1) for c in otimizador.capacidades]
+    return min(
+        float(np.dot(n, otimizador.custos)) for n in itertools.product(*faixas)
+        if np.dot(n, otimizador.capacidades) >= volume
+    )
+
+
+def test_dp_igual_forca_bruta_em_todo_o_catalogo():
+    otimizador = OtimizadorFrota.do_frete(RESULTADO_FRETE, list(ConfiguracaoVeiculos.CATALOGO))
+    volumes = np.array([0, 1, 180, 181, 500, 870, 1000, 2000, 2610, 5000, 7777])
+    resultado = otimizador.otimizar(volumes)
+
+    for volume, custo in zip(volumes, resultado['custo_total']):
+        assert custo == pytest.approx(_custo_forca_bruta(otimizador, volume) if volume else 0.0)
+    # Composição reconstruída bate com o custo e cobre o volume
+    quantidades = resultado[otimizador.nomes].to_numpy()
+    assert np.allclose(quantidades @ otimizador.custos, resultado['custo_total'])
+    assert (quantidades @ otimizador.capacidades >= volumes).all()
+
+
+def test_curva_vetorizada_igual_a_chamadas_individuais():
+    otimizador = OtimizadorFrota.do_frete(RESULTADO_FRETE)
+    curva = otimizador.otimizar(np.arange(1, 6001))
+    for volume in (1, 870, 871, 1741, 2611, 6000):
+        individual = OtimizadorFrota.do_frete(RESULTADO_FRETE).otimizar([volume]).iloc[0]
+        assert curva.iloc[volume - 1]['custo_total'] == individual['custo_total']
+
+
+def test_perfil_limita_capacidade_por_peso():
+    # 20 kg por caixa: truck leva 600 caixas (12000 kg), carreta 1400 (28000 kg)
+    otimizador = OtimizadorFrota.do_frete(RESULTADO_FRETE, perfil={'peso_caixa': 20.0})
+    assert dict(zip(otimizador.nomes, otimizador.capacidades)) == {'carreta': 1400, 'truck': 600}
+
+
+def test_frete_frota_recomenda_mistura_mais_barata():
+    simples = calcular_frete_otimizado(RESULTADO_FRETE, 2000)
+    misto = calcular_frete_frota(RESULTADO_FRETE, 2000)
+    assert simples['frete_total'] == 6000.0  # 3 trucks
+    assert misto['veiculo_otimo'] == 'frota_mista'
+    assert misto['frete_total'] == 5500.0
+    assert misto['detalhes']['melhor_cenario']['composicao'] == {'carreta': 1, 'truck': 1}
+    assert misto['economia'] == 1500.0
+
+    # Um único tipo já é o ótimo: resultado original
+    assert calcular_frete_frota(RESULTADO_FRETE, 500) == calcular_frete_otimizado(RESULTADO_FRETE, 500)
+
+
+def test_frete_por_caixa_na_convencao_da_tabela():
+    otimizador = OtimizadorFrota.do_frete(RESULTADO_FRETE)
+    volumes = [500, 870, 1500, 1740, 2000, 3000]
+    curva = otimizador.otimizar(volumes)
+    for volume, linha in zip(volumes, curva.itertuples()):
+        assert linha.frete_por_caixa == pytest.approx(linha.custo_total / linha.capacidade_total)
+        assert linha.frete_por_caixa == pytest.approx(calcular_frete_frota(RESULTADO_FRETE, volume)['frete_por_caixa'])
+
+
+def test_curva_de_custo_por_caixa_embarcada():
+    curva = OtimizadorFrota.do_frete(RESULTADO_FRETE).otimizar([1, 435, 870, 871])
+    assert curva['custo_por_caixa'].tolist() == pytest.approx([2000.0, 2000.0 / 435, 2000.0 / 870, 3500.0 / 871])
+    # O frete da tabela não muda enquanto a frota é a mesma
+    assert curva['frete_por_caixa'].tolist()[:3] == pytest.approx([2000.0 / 870] * 3)
+
+
+def test_capacidades_vem_do_catalogo(monkeypatch):
+    monkeypatch.setitem(ConfiguracaoVeiculos.CATALOGO, 'truck', dict(ConfiguracaoVeiculos.CATALOGO['truck'], caixas=900))
+    assert ConfiguracaoVeiculos.capacidades_caixas() == {'truck': 900, 'carreta': 1740}
+    otimizador = OtimizadorFrota.do_frete(RESULTADO_FRETE)
+    assert dict(zip(otimizador.nomes, otimizador.capacidades)) == {'carreta': 1740, 'truck': 900}
@@ -0,0 +1,246 @@
+import pandas as pd
+
+from services.geo_cache_service import GeocodeCache, RotaCache
+from services.geolocation_service import GeolocationService
+
+
+class RespostaFake:
+    def __init__(self, dados):
+        self.dados = dados
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.dados
+
+
+class HttpFake:
+    """Substitui requests.get e registra as URLs chamadas"""
+
+    def __init__(self, coords=(-23.5, -46.6)):
+        self.coords = coords
+        self.urls = []
+
+    def __call__(self, url, timeout=None):
+        self.urls.append(url)
+        lat, lng = self.coords
+        return RespostaFake({
+            'status': 'OK',
+            'results': [{'geometry': {'location': {'lat': lat, 'lng': lng}}}]
+        })
+
+
+def test_geocode_usa_cache_persistente(tmp_path):
+    caminho = str(tmp_path / 'geocode.sqlite')
+    http = HttpFake()
+    service = GeolocationService('chave', cache_geocode=GeocodeCache(caminho), http_get=http)
+
+    assert service.geocode('Rua A, 10, São Paulo, SP, Brasil') == (-23.5, -46.6)
+    assert service.geocode('rua a,10,  SAO PAULO, sp, Brasil') == (-23.5, -46.6)
+    assert len(http.urls) == 1
+
+    # Novo processo: o cache em disco continua válido
+    outro_http = HttpFake()
+    outro = GeolocationService('chave', cache_geocode=GeocodeCache(caminho), http_get=outro_http)
+    assert outro.geocode('Rua A, 10, São Paulo, SP, Brasil') == (-23.5, -46.6)
+    assert outro_http.urls == []
+    assert outro.cache_geocode.estatisticas()['hits'] == 1
+
+
+def test_geocode_cache_ttl_e_lru(tmp_path):
+    cache = GeocodeCache(str(tmp_path / 'geocode.sqlite'), ttl_segundos=3600, max_entradas=2)
+    cache.gravar('A', 1.0, 1.0)
+    cache.gravar('B', 2.0, 2.0)
+    assert cache.obter('A') == (1.0, 1.0)
+    cache.gravar('C', 3.0, 3.0)
+    assert cache.obter('B') is None
+    assert cache.obter('A') == (1.0, 1.0)
+    assert cache.estatisticas()['entradas'] == 2
+
+    cache._conexao.execute("UPDATE geocode SET criado_em = 0")
+    assert cache.obter('C') is None
+    assert cache.estatisticas()['entradas'] == 1
+
+
+def test_pre_carregar_origens(tmp_path):
+    http = HttpFake()
+    service = GeolocationService('chave', cache_geocode=GeocodeCache(str(tmp_path / 'g.sqlite')), http_get=http)
+    service.pre_carregar_origens()
+    service.pre_carregar_origens()
+    assert len(http.urls) == len(GeolocationService.ORIGENS_DISPONIVEIS)
+    for endereco in GeolocationService.ORIGENS_DISPONIVEIS.values():
+        assert service.geocode(endereco) == (-23.5, -46.6)
+    assert len(http.urls) == len(GeolocationService.ORIGENS_DISPONIVEIS)
+
+
+class DistanceMatrixFake:
+    def __init__(self):
+        self.urls = []
+
+    def __call__(self, url, timeout=None):
+        self.urls.append(url)
+        return RespostaFake({'rows': [{'elements': [{
+            'status': 'OK',
+            'distance': {'text': '1,159 km'},
+            'duration': {'text': '14 horas'}
+        }]}]})
+
+
+def test_calcular_distancia_usa_cache_de_rotas(tmp_path):
+    http = DistanceMatrixFake()
+    rotas = RotaCache()
+    service = GeolocationService('chave', cache_geocode=GeocodeCache(str(tmp_path / 'g.sqlite')),
+                                 http_get=http, cache_rotas=rotas)
+    outra_sessao = GeolocationService('chave', cache_geocode=GeocodeCache(str(tmp_path / 'g.sqlite')),
+                                      http_get=http, cache_rotas=rotas)
+
+    assert service.calcular_distancia((-23.50001, -46.6), (-22.9, -43.2)) == ('1,159 km', '14 horas', None)
+    assert outra_sessao.calcular_distancia((-23.50002, -46.6), (-22.9, -43.2)) == ('1,159 km', '14 horas', None)
+    assert len(http.urls) == 1
+    assert rotas.obter((-23.5, -46.6), (-22.9, -43.2))['distancia_km'] == 1159.0
+
+    rotas.ttl_segundos = 1e-9
+    service.calcular_distancia((-23.5, -46.6), (-22.9, -43.2))
+    assert len(http.urls) == 2
+
+
+class DistanceMatrixLoteFake:
+    """Responde cada destino com distância igual à sua latitude absoluta"""
+
+    def __init__(self):
+        self.urls = []
+
+    def __call__(self, url, timeout=None):
+        import urllib.parse
+        self.urls.append(url)
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+        destinos = query['destinations'][0].split('|')
+        elementos = []
+        for destino in destinos:
+            lat = abs(float(destino.split(',')[0]))
+            if lat == 99:
+                elementos.append({'status': 'ZERO_RESULTS'})
+            else:
+                elementos.append({'status': 'OK', 'distance': {'text': f'{lat:.0f} km'},
+                                  'duration': {'text': '1 hora'}})
+        return RespostaFake({'rows': [{'elements': elementos}]})
+
+
+def test_calcular_distancias_lote(tmp_path):
+    http = DistanceMatrixLoteFake()
+    service = GeolocationService('chave', cache_geocode=GeocodeCache(str(tmp_path / 'g.sqlite')),
+                                 http_get=http, cache_rotas=RotaCache())
+    clientes = pd.DataFrame({
+        'latitude': [float(i) for i in range(1, 61)] + [None, 99.0, 5.0],
+        'longitude': [-46.0] * 63,
+    }, index=[f'C{i}' for i in range(63)])
+
+    resultado = service.calcular_distancias_lote((-23.5, -46.6), clientes)
+
+    # 60 destinos distintos + 1 sem rota -> 3 requisições de até 25
+    assert len(http.urls) == 3
+    assert list(resultado.index) == list(clientes.index)
+    assert resultado.loc['C0', 'distancia_km'] == 1.0
+    assert resultado.loc['C59', 'distancia_km'] == 60.0
+    assert resultado.loc['C60', 'status'] == 'SEM_COORDENADAS'
+    assert resultado.loc['C61', 'status'] == 'ZERO_RESULTS'
+    assert resultado.loc['C62', 'distancia_km'] == 5.0
+
+    # Segunda passada: tudo do cache, exceto o destino sem rota
+    service.calcular_distancias_lote((-23.5, -46.6), clientes)
+    assert len(http.urls) == 4
+
+
+def test_haversine_vetorizado_confere_com_escalar():
+    destinos = [(-22.9, -43.2), (-19.9, -43.9), (-23.5, -46.6)]
+    vetor = GeolocationService.haversine_vetorizado(
+        -23.5, -46.6, [d[0] for d in destinos], [d[1] for d in destinos]
+    )
+    for (lat, lng), valor in zip(destinos, vetor):
+        assert abs(GeolocationService.haversine(-23.5, -46.6, lat, lng) - valor) < 1e-9
+
+
+def test_modo_offline_calibra_fator_por_uf(tmp_path):
+    origem = (-23.5, -46.6)
+    rotas = RotaCache()
+    service = GeolocationService(None, cache_geocode=GeocodeCache(str(tmp_path / 'g.sqlite')),
+                                 http_get=HttpFake(), cache_rotas=rotas)
+    assert service.offline
+    assert service.geocode('Rua Desconhecida, 1') == (None, None)
+    assert service.calcular_rota_completa('A', 'B')['sucesso'] is False
+
+    # Rotas já consultadas em MG rodam 1.5x a linha reta
+    for lat in (-19.0, -19.5, -20.0):
+        km = GeolocationService.haversine(origem[0], origem[1], lat, -44.0) * 1.5
+        rotas.gravar(origem, (lat, -44.0), f"{km:.1f} km", "1 h", km, uf='MG')
+    fatores = service.calibrar_fatores_rodoviarios()
+    assert abs(fatores['MG'] - 1.5) < 1e-3
+
+    destinos = pd.DataFrame({
+        'latitude': [-19.2, -22.9, 0.0],
+        'longitude': [-43.9, -43.2, 0.0],
+        'A1_EST': ['MG', 'RJ', 'RJ'],
+    })
+    estimadas = service.estimar_distancias_offline(origem, destinos)
+    linha_reta = GeolocationService.haversine(origem[0], origem[1], -19.2, -43.9)
+    assert abs(estimadas.iloc[0] - linha_reta * 1.5) < 1e-6
+    # RJ sem amostras suficientes usa o fator geral
+    assert abs(estimadas.iloc[1] - GeolocationService.haversine(origem[0], origem[1], -22.9, -43.2) * fatores['*']) < 1e-6
+    assert pd.isna(estimadas.iloc[2])
+
+
+def test_modo_offline_sem_amostras_usa_fator_padrao(tmp_path):
+    service = GeolocationService('', cache_geocode=GeocodeCache(str(tmp_path / 'g.sqlite')),
+                                 cache_rotas=RotaCache())
+    assert service.calcular_distancia((-23.5, -46.6), (-22.9, -43.2))[2] is not None
+    estimada = service.estimar_distancia_offline((-23.5, -46.6), (-22.9, -43.2), 'RJ')
+    esperada = GeolocationService.haversine(-23.5, -46.6, -22.9, -43.2) * GeolocationService.FATOR_RODOVIARIO_PADRAO
+    assert abs(estimada - esperada) < 1e-6
+
+
+def test_calibracao_offline_usa_amostras_persistidas(tmp_path):
+    caminho = str(tmp_path / 'g.sqlite')
+    origem = (-23.5, -46.6)
+    destinos = [(-16.0, -47.0), (-16.5, -47.5), (-17.0, -48.0)]
+    online = GeolocationService('chave', cache_geocode=GeocodeCache(caminho),
+                                http_get=DistanceMatrixFake(), cache_rotas=RotaCache())
+    for destino in destinos:
+        assert online.calcular_distancia(origem, destino, 'GO')[2] is None
+
+    # Outro processo, sem a chave e com o cache de rotas em memória vazio
+    offline = GeolocationService(None, cache_geocode=GeocodeCache(caminho), cache_rotas=RotaCache())
+    fatores = offline.calibrar_fatores_rodoviarios()
+    razoes = [1159 / GeolocationService.haversine(origem[0], origem[1], lat, lng) for lat, lng in destinos]
+    assert abs(fatores['GO'] - sorted(razoes)[1]) < 1e-3
+
+
+def test_fatores_calibrados_ficam_em_cache(tmp_path):
+    rotas = RotaCache()
+    service = GeolocationService(None, cache_geocode=GeocodeCache(str(tmp_path / 'g.sqlite')), cache_rotas=rotas)
+    chamadas = []
+    listar = service.amostras_rota.listar
+    service.amostras_rota.listar = lambda: chamadas.append(1) or listar()
+
+    origem = (-23.5, -46.6)
+    for lat in (-19.0, -19.5, -20.0):
+        km = GeolocationService.haversine(origem[0], origem[1], lat, -44.0) * 1.5
+        rotas.gravar(origem, (lat, -44.0), f"{km:.1f} km", "1 h", km, uf='MG')
+    destinos = pd.DataFrame({'latitude': [-19.2] * 3, 'longitude': [-43.9] * 3, 'A1_EST': ['MG'] * 3})
+    service.estimar_distancias_offline(origem, destinos)
+    service.estimar_distancias_offline(origem, destinos)
+    assert len(chamadas) == 1
+
+    # Rota nova invalida os fatores
+    km = GeolocationService.haversine(origem[0], origem[1], -21.0, -44.0) * 1.6
+    rotas.gravar(origem, (-21.0, -44.0), f"{km:.1f} km", "1 h", km, uf='MG')
+    service.estimar_distancias_offline(origem, destinos)
+    assert len(chamadas) == 2
+
+
+def test_origens_tem_coordenadas_sem_cache_e_sem_api(tmp_path):
+    cache = GeocodeCache(str(tmp_path / 'g.sqlite'))
+    service = GeolocationService(None, cache_geocode=cache, cache_rotas=RotaCache())
+    for nome, endereco in GeolocationService.ORIGENS_DISPONIVEIS.items():
+        assert service.geocode(endereco) == GeolocationService.COORDENADAS_ORIGENS[nome]
+        assert not cache.contem(endereco)
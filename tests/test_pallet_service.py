@@ -20,3 +20,38 @@ def test_calculo_pallets_e_sugestoes():
     assert a['resto_caixas'] == 25
     assert info['truck_qtd'] >= 1
     assert any(s['produto'] == 'A' and s['quantidade'] == 25 for s in info['sugestoes'])
+
+
+def _logistica_por_merge(log_df, prod_df, codigo_prod='Descrição'):
+    df_merge = prod_df[[codigo_prod, 'Quantidade']].merge(log_df, left_on=codigo_prod, right_on='CODIGO', how='left')
+    df_merge['CXS_PLT'] = pd.to_numeric(df_merge['CXS_PLT'], errors='coerce').fillna(1)
+    df_merge['PESO'] = pd.to_numeric(df_merge['PESO'], errors='coerce').fillna(0)
+    df_merge['pallets_fechados'] = (df_merge['Quantidade'] // df_merge['CXS_PLT']).astype(int)
+    df_merge['resto_caixas'] = (df_merge['Quantidade'] % df_merge['CXS_PLT']).astype(int)
+    sugestoes = []
+    for _, row in df_merge.iterrows():
+        if row['resto_caixas'] > 0:
+            sugestoes.append({'produto': row[codigo_prod], 'quantidade': int(row['CXS_PLT'] - row['resto_caixas'])})
+    return df_merge, sugestoes
+
+
+def test_busca_indexada_igual_ao_merge():
+    log_df = pd.DataFrame({
+        'CODIGO': [f'P{i}' for i in range(200)],
+        'CXS_PLT': [str(20 + i % 30) if i % 17 else 'x' for i in range(200)],
+        'PESO': [0.5 + i % 9 for i in range(200)],
+        'EMBALAGEM': ['CX'] * 200,
+    })
+    prod_df = pd.DataFrame({
+        'Descrição': [f'P{(i * 7) % 230}' for i in range(120)],
+        'Quantidade': [(i * 37) % 500 for i in range(120)],
+    }, index=range(1000, 1120))
+
+    info = LogisticsService(log_df).calcular_logistica(prod_df)
+    esperado, sugestoes = _logistica_por_merge(log_df, prod_df)
+
+    assert info['sugestoes'] == sugestoes
+    detalhes = info['detalhes']
+    for coluna in ['Descrição', 'Quantidade', 'CODIGO', 'CXS_PLT', 'PESO', 'EMBALAGEM', 'pallets_fechados', 'resto_caixas']:
+        assert detalhes[coluna].tolist() == esperado[coluna].tolist(), coluna
+    assert info['peso_total'] == float((esperado['Quantidade'] * esperado['PESO']).sum())
@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+
+from services import planilha_service
+from services.planilha_service import PlanilhaCustosService
+
+
+def _gravar_planilha(caminho, custo=9.02):
+    pd.DataFrame({
+        ' Descrição ': ['AGUA SANITARIA 5L', 'AMACIANTE 2L'],
+        'UF': ['SP', 'RJ'],
+        'Custo NET': [custo, 7.91],
+        'Contrato': [0, 1],
+        'MVA ': ['0.5686', '0.4'],
+    }).to_excel(caminho, index=False)
+
+
+def test_planilha_lida_uma_vez_e_tipada(tmp_path, monkeypatch):
+    caminho = str(tmp_path / 'custos.xlsx')
+    _gravar_planilha(caminho)
+    service = PlanilhaCustosService(str(tmp_path))
+
+    df = service.carregar(caminho)
+    assert list(df.columns) == ['Descrição', 'UF', 'Custo NET', 'Contrato', 'MVA']
+    assert df['MVA'].dtype == 'float64'
+    assert os.path.exists(service.caminho_cache(caminho))
+
+    # Reruns leem o cache colunar, sem passar pelo Excel
+    def falhar(*args, **kwargs):
+        raise AssertionError("read_excel não deveria ser chamado")
+    monkeypatch.setattr(planilha_service.pd, 'read_excel', falhar)
+    pd.testing.assert_frame_equal(service.carregar(caminho), df)
+
+
+def test_planilha_alterada_invalida_cache(tmp_path):
+    caminho = str(tmp_path / 'custos.xlsx')
+    _gravar_planilha(caminho)
+    service = PlanilhaCustosService(str(tmp_path))
+    antigo = service.caminho_cache(caminho)
+    service.carregar(caminho)
+
+    _gravar_planilha(caminho, custo=10.5)
+    os.utime(caminho, ns=(1, 1))
+    df = service.carregar(caminho)
+    assert df.loc[0, 'Custo NET'] == 10.5
+    assert not os.path.exists(antigo)
+    assert os.path.exists(service.caminho_cache(caminho))
@@ -0,0 +1,124 @@
+import pandas as pd
+import pytest
+
+import precificar_lote
+from services.cenarios_service import precificar_pedidos
+
+PARAMETROS = {'frete_padrao': 2.0, 'contrato_percentual': 0.02}
+
+
+def _planilha():
+    return pd.DataFrame([
+        {'UF': uf, 'Descrição': f'PRODUTO {p}', 'Preço de Venda': 20.0 + p, 'Custo NET': 10.0 + p,
+         'Custo Fixo': 1.5, 'IPI': 0.05, 'MVA': 0.4, 'COFINS': 0.076, 'PIS': 0.0165}
+        for uf in ['RJ', 'MG', 'CE'] for p in range(3)
+    ])
+
+
+def _pedidos(n=60):
+    return pd.DataFrame({
+        'Pedido': [f'{i // 3:05d}' for i in range(n)],
+        'Cliente': [f'{i % 7:06d}' for i in range(n)],
+        'UF': [['rj', 'MG', 'CE', 'SP'][i % 4] for i in range(n)],
+        'Descrição': [f'PRODUTO {i % 4}' for i in range(n)],
+        'Quantidade': [10 * (i + 1) for i in range(n)],
+    })
+
+
+def test_precificar_pedidos_usa_quantidade_do_pedido_e_marca_ausentes():
+    pedidos = _pedidos(8).assign(UF=lambda d: d['UF'].str.upper())
+    resultado = precificar_pedidos(_planilha(), pedidos, PARAMETROS)
+
+    assert len(resultado) == len(pedidos)
+    ok = resultado['Situação'] == 'OK'
+    # SP não está na planilha e PRODUTO 3 não existe
+    ausentes = pedidos['UF'].eq('SP') | pedidos['Descrição'].eq('PRODUTO 3')
+    assert (~ok).tolist() == ausentes.tolist()
+    assert (resultado.loc[ok, 'Qtd'] == resultado.loc[ok, 'Quantidade']).all()
+    assert resultado.loc[~ok, 'Lucro Líquido'].isna().all()
+
+
+def test_precificar_pedidos_sem_preco_na_planilha():
+    # Como a planilha distribuída: Preço de Venda vazio em todas as linhas
+    planilha = _planilha().assign(**{'Preço de Venda': float('nan')})
+    pedidos = _pedidos(8).assign(UF=lambda d: d['UF'].str.upper())
+    pedidos['Preço de Venda'] = [25.0, None] * 4
+
+    resultado = precificar_pedidos(planilha, pedidos, PARAMETROS)
+    encontrados = ~(pedidos['UF'].eq('SP') | pedidos['Descrição'].eq('PRODUTO 3'))
+    com_preco = encontrados & pedidos['Preço de Venda'].notna()
+    assert (resultado.loc[com_preco, 'Situação'] == 'OK').all()
+    assert (resultado.loc[encontrados & ~com_preco, 'Situação'] == 'SEM_PRECO').all()
+    assert resultado.loc[com_preco, 'Lucro Líquido'].notna().all()
+    assert resultado.loc[resultado['Situação'] != 'OK', 'Lucro Líquido'].isna().all()
+
+    # Preço vazio no pedido mantém o da planilha
+    resultado = precificar_pedidos(_planilha(), pedidos, PARAMETROS)
+    assert (resultado.loc[encontrados, 'Situação'] == 'OK').all()
+    assert (resultado.loc[encontrados, 'Preço Venda'] > 0).all()
+
+
+@pytest.mark.parametrize('processos', [1, 2])
+def test_precificar_arquivo_em_blocos(tmp_path, processos):
+    entrada = tmp_path / 'pedidos.csv'
+    _pedidos().to_csv(entrada, sep=';', index=False)
+    saida = tmp_path / 'resultados.csv'
+
+    linhas = precificar_lote.precificar_arquivo(str(entrada), str(saida), _planilha(), PARAMETROS,
+                                                processos=processos, tamanho_bloco=7)
+    resultado = pd.read_csv(saida, dtype={'Pedido': str, 'Cliente': str})
+
+    esperado = precificar_pedidos(_planilha(), _pedidos().assign(UF=lambda d: d['UF'].str.upper()), PARAMETROS)
+    assert linhas == len(esperado) == len(resultado)
+    assert resultado['Cliente'].tolist() == esperado['Cliente'].tolist()
+    pd.testing.assert_series_equal(resultado['Lucro Líquido'], esperado['Lucro Líquido'].astype(float))
+
+
+def test_frete_caixa_do_pedido_por_linha():
+    pedidos = _pedidos(8).assign(UF=lambda d: d['UF'].str.upper())
+    pedidos['Frete Caixa'] = [0.8, None] * 4
+    resultado = precificar_pedidos(_planilha(), pedidos, PARAMETROS)
+
+    ok = resultado['Situação'] == 'OK'
+    frete_por_caixa = resultado['Frete Total'] / resultado['Qtd']
+    assert (frete_por_caixa[ok & pedidos['Frete Caixa'].notna()] == 0.8).all()
+    assert (frete_por_caixa[ok & pedidos['Frete Caixa'].isna()] == PARAMETROS['frete_padrao']).all()
+
+
+def _pedidos_com_observacao(n=20):
+    # Coluna repassada vazia nos primeiros blocos e com texto depois
+    return _pedidos(n).assign(Observação=[None] * (n // 2) + ['URGENTE'] * (n - n // 2))
+
+
+def test_blocos_com_os_mesmos_tipos(tmp_path):
+    entrada = tmp_path / 'pedidos.csv'
+    _pedidos_com_observacao().to_csv(entrada, index=False)
+    blocos = [precificar_lote._validar_colunas(b) for b in precificar_lote.ler_pedidos_em_blocos(str(entrada), 4)]
+
+    tipos = {tuple(b.dtypes.astype(str)) for b in blocos}
+    assert len(tipos) == 1
+    assert blocos[0]['Pedido'].iloc[0] == '00000'
+    assert blocos[0]['Observação'].isna().all() and blocos[0]['Quantidade'].dtype == float
+
+
+@pytest.mark.parametrize('processos', [1, 2])
+def test_precificar_arquivo_parquet_em_blocos(tmp_path, processos):
+    pytest.importorskip('pyarrow')
+    entrada = tmp_path / 'pedidos.csv'
+    _pedidos_com_observacao().to_csv(entrada, index=False)
+    saida = tmp_path / 'resultados.parquet'
+
+    linhas = precificar_lote.precificar_arquivo(str(entrada), str(saida), _planilha(), PARAMETROS,
+                                                processos=processos, tamanho_bloco=4)
+    resultado = pd.read_parquet(saida)
+    assert linhas == len(resultado) == 20
+    assert resultado['Observação'].tolist()[-1] == 'URGENTE'
+    assert resultado['Pedido'].iloc[0] == '00000'
+
+
+def test_cli_sem_colunas_obrigatorias(tmp_path):
+    entrada = tmp_path / 'pedidos.csv'
+    pd.DataFrame({'UF': ['RJ'], 'Quantidade': [1]}).to_csv(entrada, index=False)
+    with pytest.raises(ValueError, match='Descrição'):
+        precificar_lote.precificar_arquivo(str(entrada), str(tmp_path / 'saida.csv'), _planilha(), PARAMETROS,
+                                           processos=1)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from core.recalculo_incremental import RecalculoIncremental, linhas_alteradas
+from services.calculation_service import CalculadoraResultados
+
+
+def test_recalculo_incremental_igual_ao_calculo_completo(quadro_produtos):
+    df = quadro_produtos(300, seed=3)
+    for tipo_frete in ['CIF', 'FOB']:
+        recalculo = RecalculoIncremental(tipo_frete)
+        calculadora = CalculadoraResultados(tipo_frete)
+        pd.testing.assert_frame_equal(recalculo.calcular(df), calculadora.calcular_resultados_dataframe(df))
+
+        editado = df.copy()
+        editado.loc[[5, 17], 'Preço de Venda'] += 1.5
+        editado.loc[40, 'Quantidade'] = 0.0
+        obtido = recalculo.calcular(editado)
+        pd.testing.assert_frame_equal(obtido, calculadora.calcular_resultados_dataframe(editado))
+        assert recalculo.estatisticas['linhas_recalculadas'] == 300 + 3
+
+        # Desfazer a edição reaproveita a memória
+        pd.testing.assert_frame_equal(recalculo.calcular(df), calculadora.calcular_resultados_dataframe(df))
+        assert recalculo.estatisticas['linhas_recalculadas'] == 300 + 3
+
+
+def test_recalculo_limpa_memoria_quando_colunas_mudam(quadro_produtos):
+    df = quadro_produtos(50, seed=3)
+    recalculo = RecalculoIncremental('CIF', max_entradas=60)
+    recalculo.calcular(df)
+    sem_custo_fixo = df.drop(columns=['Custo Fixo'])
+    pd.testing.assert_frame_equal(
+        recalculo.calcular(sem_custo_fixo),
+        CalculadoraResultados('CIF').calcular_resultados_dataframe(sem_custo_fixo)
+    )
+    assert recalculo.entradas == 50
+
+    # Limite de entradas: mantém só as linhas do quadro atual
+    editado = sem_custo_fixo.copy()
+    editado['Quantidade'] += 1
+    recalculo.calcular(editado)
+    assert recalculo.entradas == 50
+
+
+def test_linhas_alteradas(quadro_produtos):
+    df = quadro_produtos(10, seed=3)
+    editado = df.copy()
+    editado.loc[3, 'Comissão'] = 0.07
+    mascara = linhas_alteradas(df, editado, ['Comissão', 'Bonificação'])
+    assert np.flatnonzero(mascara).tolist() == [3]
+    assert not linhas_alteradas(df, editado, ['Bonificação']).any()
+    assert linhas_alteradas(None, editado).all()
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from core.servicos import ContainerServicos
+from services.cache_service import cache_swr
+
+
+class BancoReferencias:
+    """Carregadores com cache SWR como no DatabaseService; `versao` troca a tabela entregue"""
+
+    def __init__(self):
+        self.versao = 1
+
+    @cache_swr(ttl_segundos=3600)
+    def _consultar_tabela_frete(self):
+        return pd.DataFrame({
+            'cidade_ibge': ['3550308', '3550308'],
+            'FAIXA_KM': ['0 - 100', '101 - 300'],
+            'TBL_TRCK': [1.0 * self.versao, 2.0],
+            'TBL_CRRT': [0.8, 1.6],
+        })
+
+    def carregar_tabela_frete(self):
+        return self._consultar_tabela_frete()
+
+    @cache_swr(ttl_segundos=3600)
+    def _consultar_produtos(self):
+        return pd.DataFrame({'CODIGO': ['P0'], 'CXS_PLT': [30], 'PESO': [10.0]})
+
+    def carregar_produtos_truck_carreta(self):
+        return self._consultar_produtos()
+
+
+def test_container_refaz_indice_quando_swr_atualiza(tmp_path, monkeypatch):
+    monkeypatch.setenv('FORMA_PRECO_CACHE_DIR', str(tmp_path))
+    monkeypatch.delenv('GOOGLE_MAPS_API_KEY', raising=False)
+    banco = BancoReferencias()
+    container = ContainerServicos(str(tmp_path / 'inexistente.xlsx'), db_service=banco)
+    indice, logistica = container.indice_frete, container.logistics_service
+    assert container.indice_frete.buscar('3550308', '0 - 100', 'truck')[0] == 1.0
+    assert ('success', '✅ 2 faixas de frete carregadas!') in container.mensagens
+
+    # Sem valor novo no cache nada é refeito
+    container.atualizar_referencias()
+    assert container.indice_frete is indice
+
+    # Atualização em segundo plano entrega outra tabela: índice novo, logística mantida
+    banco.versao = 3
+    cache = banco._caches_swr['_consultar_tabela_frete']
+    cache.ttl_segundos = 0
+    container.atualizar_referencias()
+    cache.aguardar(5)
+    cache.ttl_segundos = 3600
+    container.atualizar_referencias()
+    assert container.indice_frete is not indice
+    assert container.indice_frete.buscar('3550308', '0 - 100', 'truck')[0] == 3.0
+    assert container.logistics_service is logistica
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.calculation_service import CalculadoraResultados
+from services.frota_service import OtimizadorFrota, calcular_frete_frota
+from services.logistics_service import LogisticsService
+from services.sugestao_pedido_service import SugestorQuantidades
+
+RESULTADO_FRETE = {
+    'truck': {'valor': 2000.0},
+    'carreta': {'valor': 3500.0},
+    'capacidades': {'truck': 870, 'carreta': 1740}
+}
+
+
+@pytest.fixture
+def montar_pedido(quadro_produtos):
+    """Pedido com os mesmos preços, custos e alíquotas em todos os produtos"""
+    def montar(quantidades):
+        n = len(quantidades)
+        return quadro_produtos(n, **{
+            'Descrição': [f'P{i}' for i in range(n)], 'Quantidade': np.array(quantidades, dtype=float),
+            'Preço de Venda': 30.0, 'Custo NET': 18.0, 'Custo Fixo': 1.0, 'Frete Caixa': 0.0,
+            'IPI': 0.0, 'MVA': 0.0, 'ICMS Interno Destino': 0.18, 'FCP': 0.0,
+            'Comissão': 0.03, 'Bonificação': 0.0,
+        })
+    return montar
+
+
+def _sugestor():
+    log_df = pd.DataFrame({'CODIGO': ['P0', 'P1', 'P2'], 'CXS_PLT': [30, 40, 50], 'PESO': 10.0})
+    return SugestorQuantidades(LogisticsService(log_df), RESULTADO_FRETE)
+
+
+def test_sugestoes_reduzem_custo_por_caixa(montar_pedido):
+    # 880 caixas: passa 10 caixas de um truck (uma carreta quase vazia)
+    pedido = montar_pedido([300, 290, 290])
+    resultado = _sugestor().sugerir(pedido)
+
+    base = resultado['base']
+    assert base['volume'] == 880
+    assert base['frete_total'] == 3500.0
+    assert base['custo_por_caixa'] == 3500.0 / 880
+    assert base['frete_por_caixa'] == 3500.0 / 1740
+    sugestoes = resultado['sugestoes']
+    assert not sugestoes.empty
+    assert (sugestoes['custo_por_caixa'] < base['custo_por_caixa']).all()
+    assert sugestoes['custo_por_caixa'].is_monotonic_increasing
+    # A melhor completa a carreta ou libera o veículo extra
+    melhor = sugestoes.iloc[0]
+    assert melhor['volume'] in (870, 1740)
+    assert sum(melhor['ajustes'].values()) == melhor['caixas_ajustadas']
+
+
+def test_liberar_veiculo(montar_pedido):
+    # 1750 caixas: passa 10 caixas de uma carreta (carreta + truck)
+    resultado = _sugestor().sugerir(montar_pedido([600, 580, 570]))
+    assert resultado['base']['frete_total'] == 5500.0
+    liberar = resultado['sugestoes'][resultado['sugestoes']['volume'] == 1740]
+    assert not liberar.empty
+    assert (liberar['frete_total'] == 3500.0).all()
+    assert (liberar['frete_por_caixa'] == 3500.0 / 1740).all()
+
+
+def test_margem_da_sugestao_igual_calculadora(montar_pedido):
+    # O simulador grava em "Frete Caixa" o frete por caixa de calcular_frete_frota
+    for quantidades in ([600, 580, 570], [300, 290, 290]):
+        pedido = montar_pedido(quantidades)
+        sugestao = _sugestor().sugerir(pedido)['sugestoes'].iloc[0]
+
+        ajustado = pedido.copy()
+        for produto, delta in sugestao['ajustes'].items():
+            ajustado.loc[ajustado['Descrição'] == produto, 'Quantidade'] += delta
+        frete = calcular_frete_frota(RESULTADO_FRETE, ajustado['Quantidade'].sum())
+        assert frete['frete_total'] == sugestao['frete_total']
+        ajustado['Frete Caixa'] = frete['frete_por_caixa']
+        resultados = CalculadoraResultados('CIF').calcular_resultados_dataframe(ajustado)
+        margem = resultados['Lucro Líquido'].sum() / resultados['Subtotal'].sum() * 100
+        assert abs(margem - sugestao['margem_liquida_pct']) < 1e-9
+
+
+def test_avaliacao_igual_ao_pedido_empilhado(montar_pedido):
+    # Só as linhas alteradas são recalculadas: mesmo resultado do cálculo de todas as linhas
+    rng = np.random.default_rng(7)
+    pedido = montar_pedido(rng.integers(1, 120, 40))
+    pedido['Preço de Venda'] = np.round(rng.uniform(20, 40, 40), 2)
+    sugestor = _sugestor()
+    quantidade = pedido['Quantidade'].to_numpy(dtype=np.int64)
+    candidatos, _ = sugestor._gerar_candidatos(pedido['Descrição'].to_numpy(), quantidade,
+                                               np.full(40, 30), quantidade % 30)
+    avaliacao = sugestor._avaliar(pedido, candidatos)
+
+    k, n = candidatos.shape
+    empilhado = pedido.iloc[np.tile(np.arange(n), k)].reset_index(drop=True)
+    empilhado['Quantidade'] = candidatos.ravel()
+    empilhado['Frete Caixa'] = np.repeat(avaliacao['frete_por_caixa'].to_numpy(), n)
+    resultados = CalculadoraResultados('CIF').calcular_resultados_dataframe(empilhado)
+    grupo = np.repeat(np.arange(k), n)
+    lucro = np.bincount(grupo, resultados['Lucro Líquido'], minlength=k)
+    np.testing.assert_allclose(avaliacao['lucro_liquido'], lucro, rtol=1e-9)
+
+
+def test_frota_injetada_reaproveitada(montar_pedido):
+    log_df = pd.DataFrame({'CODIGO': ['P0', 'P1', 'P2'], 'CXS_PLT': [30, 40, 50], 'PESO': 10.0})
+    frota = OtimizadorFrota.do_frete(RESULTADO_FRETE)
+    sugestor = SugestorQuantidades(LogisticsService(log_df), RESULTADO_FRETE, frota=frota)
+    assert sugestor.frota is frota
+    pd.testing.assert_frame_equal(
+        sugestor.sugerir(montar_pedido([300, 290, 290]))['sugestoes'],
+        _sugestor().sugerir(montar_pedido([300, 290, 290]))['sugestoes']
+    )
+
+
+def test_ajustes_respeitam_limite(montar_pedido):
+    pedido = montar_pedido([25, 35, 45])
+    sugestor = _sugestor()
+    resultado = sugestor.sugerir(pedido, max_sugestoes=50)
+    limite = pedido['Quantidade'].sum() * sugestor.LIMITE_AJUSTE_PERCENTUAL
+    for ajustes in resultado['sugestoes']['ajustes']:
+        assert sum(abs(v) for v in ajustes.values()) <= limite
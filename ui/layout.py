@@ -15,6 +15,9 @@ from .components import (
     ExportacaoComponent, MapasComponent
 )
 from utils.format_utils import montar_endereco_geocode
+from utils.cliente_utils import obter_indice_clientes
+from core.recalculo_incremental import linhas_alteradas
+from services.cenarios_service import pivotar_matriz, resumir_matriz_por_uf
 from utils.data_utils import (
     converter_percentuais_para_edicao, converter_percentuais_de_edicao,
     garantir_tipos_numericos
@@ -24,6 +27,8 @@ from utils.data_utils import (
 class SimuladorLayout:
     """Gerencia o layout e interface do simulador"""
     
+    LIMITE_RESULTADOS_BUSCA = 50
+    
     def __init__(self, state_manager, geolocation_service=None):
         self.state = state_manager
         self.geo_service = geolocation_service
@@ -50,13 +55,23 @@ class SimuladorLayout:
         dados_cliente_selecionado = None
         
         if opcao_cliente == "Sim" and not clientes_df.empty:
-            # Criar lista de opções mais informativas
-            opcoes_clientes = []
-            for idx, row in clientes_df.iterrows():
-                opcao = f"{row['A1_NOME']} - {row['cidade_ibge']}/{row['A1_EST']} - {row['A1_COD']}/{row['A1_LOJA']}"
-                if row['REDE'] and str(row['REDE']) != str(row['A1_NOME'])[:20]:
-                    opcao += f" - [{row['REDE']}]"
-                opcoes_clientes.append(opcao)
+            # Rótulos e índice de busca calculados uma vez por carga de clientes
+            indice_clientes = obter_indice_clientes(clientes_df, st.session_state, "ui.indice_clientes")
+            
+            termo_busca = st.text_input(
+                "🔎 Buscar cliente (nome, código, rede ou cidade):",
+                key="text_input_busca_cliente"
+            )
+            if termo_busca.strip():
+                opcoes_clientes = indice_clientes.buscar(termo_busca, self.LIMITE_RESULTADOS_BUSCA)
+                if not opcoes_clientes:
+                    st.info("ℹ️ Nenhum cliente encontrado para a busca.")
+            else:
+                # Sem busca: só os primeiros rótulos (e o cliente já selecionado)
+                opcoes_clientes = indice_clientes.rotulos[:self.LIMITE_RESULTADOS_BUSCA]
+                selecionado = st.session_state.get("selectbox_cliente_principal")
+                if selecionado and selecionado not in opcoes_clientes and indice_clientes.posicao(selecionado) is not None:
+                    opcoes_clientes = [selecionado] + opcoes_clientes
             
             # Selectbox com informações completas
             cliente_escolhido_display = st.selectbox(
@@ -68,7 +83,7 @@ class SimuladorLayout:
             
             # Extrair o índice da opção selecionada
             if cliente_escolhido_display:
-                indice_selecionado = opcoes_clientes.index(cliente_escolhido_display)
+                indice_selecionado = indice_clientes.posicao(cliente_escolhido_display)
                 dados_cliente_selecionado = clientes_df.iloc[indice_selecionado].to_dict()
                 
                 # Exibir informações do cliente selecionado
@@ -225,7 +240,7 @@ class SimuladorLayout:
         origem_coords = self.state.get_frete('coordenadas_origem')
         destino_coords = self.state.get_frete('coordenadas_destino')
         
-        if origem_coords and destino_coords and self.geo_service:
+        if origem_coords and destino_coords and self.geo_service and self.geo_service.api_key:
             MapasComponent.exibir_mapas_rota(
                 self.geo_service.api_key, origem_coords, destino_coords, origem
             )
@@ -389,7 +404,7 @@ class SimuladorLayout:
     
     def exibir_controles_principais(self) -> Optional[str]:
         """Exibe os controles principais"""
-        col1, col2 = st.columns([3, 1])
+        col1, col2, col3, col4 = st.columns([3, 1.5, 2, 1])
         
         with col1:
             if st.button(
@@ -400,6 +415,25 @@ class SimuladorLayout:
                 return 'equilibrio'
         
         with col2:
+            margem_alvo = st.number_input(
+                "Margem líquida alvo (%)",
+                min_value=-100.0, max_value=99.0,
+                value=self.state.get_simulacao('margem_alvo', 0.10) * 100,
+                step=0.5,
+                label_visibility="collapsed",
+                key="number_input_margem_alvo"
+            )
+            self.state.set_simulacao('margem_alvo', margem_alvo / 100)
+        
+        with col3:
+            if st.button(
+                f"💲 Preço p/ margem de {margem_alvo:.1f}%",
+                use_container_width=True,
+                key="button_calcular_preco_alvo"
+            ):
+                return 'preco_alvo'
+        
+        with col4:
             if st.button(
                 "🔄 Resetar", 
                 use_container_width=True,
@@ -502,7 +536,9 @@ class SimuladorLayout:
         comissoes_editadas = self.state.get_edicoes('comissoes_editadas', {})
         bonificacoes_editadas = self.state.get_edicoes('bonificacoes_editadas', {})
         
-        for index in df_processado.index:
+        # Só as linhas com comissão ou bonificação diferentes do quadro original são conferidas
+        alteradas = linhas_alteradas(df_para_edicao, df_processado, ["Comissão", "Bonificação"])
+        for index in df_processado.index[alteradas]:
             if index < len(df_para_edicao):
                 produto = df_processado.at[index, "Descrição"]
                 
@@ -565,8 +601,8 @@ class SimuladorLayout:
         """Exibe resumo executivo"""
         ResumoExecutivoComponent.exibir_resumo(df_display)
 
-    def exibir_resumo_logistico(self, info: dict):
-        """Exibe resumo de peso e veículos"""
+    def exibir_resumo_logistico(self, info: dict, carregamento: Optional[dict] = None):
+        """Exibe resumo de peso e veículos (e o carregamento otimizado, se informado)"""
         if not info:
             return
         st.markdown("### 🚚 Resumo Logístico")
@@ -577,11 +613,53 @@ class SimuladorLayout:
             st.metric("Trucks", info['truck_qtd'])
         with col3:
             st.metric("Carretas", info['carreta_qtd'])
+        if carregamento and carregamento['veiculos']:
+            st.markdown("#### 🧩 Carregamento Otimizado")
+            quantidades = carregamento['quantidades']
+            st.write(
+                f"{quantidades.get('truck', 0)} truck(s) e {quantidades.get('carreta', 0)} carreta(s)"
+                + ("" if carregamento['otimo'] else " (heurística)")
+            )
+            df_veiculos = pd.DataFrame(carregamento['veiculos'])
+            st.dataframe(df_veiculos[['veiculo', 'tipo', 'pallets', 'peso', 'volume', 'ocupacao_pallets',
+                                      'ocupacao_peso', 'ocupacao_volume']], use_container_width=True)
+            if carregamento['pallets_excedentes']:
+                st.warning(f"⚠️ {carregamento['pallets_excedentes']} pallet(s) excedem a capacidade de qualquer veículo")
         if info.get('sugestoes'):
             st.markdown("#### 📦 Sugestões para Completar Pallets")
             for s in info['sugestoes']:
                 st.write(f"{s['produto']}: +{s['quantidade']} un.")
     
+    def exibir_sugestoes_pedido(self, resultado: dict):
+        """Exibe ajustes de quantidade que reduzem o custo de frete por caixa embarcada"""
+        sugestoes = resultado['sugestoes']
+        if sugestoes.empty:
+            return
+        base = resultado['base']
+        with st.expander(f"💡 Sugestões de Quantidade ({len(sugestoes)})", expanded=False):
+            st.caption(
+                f"Pedido atual: {base['volume']:.0f} caixas, frete R$ {base['frete_total']:.2f} "
+                f"(R$ {base['custo_por_caixa']:.2f}/caixa embarcada, R$ {base['frete_por_caixa']:.2f}/caixa "
+                f"na tabela), margem líquida {base['margem_liquida_pct']:.1f}%"
+            )
+            tabela = sugestoes.drop(columns=['ajustes']).rename(columns={
+                'sugestao': 'Sugestão', 'caixas_ajustadas': 'Δ Caixas', 'volume': 'Caixas', 'veiculos': 'Veículos',
+                'frete_total': 'Frete Total', 'custo_por_caixa': 'Custo/Caixa Embarcada',
+                'variacao_custo_caixa': 'Δ Custo/Caixa', 'frete_por_caixa': 'Frete/Caixa (tabela)',
+                'lucro_liquido': 'Lucro Líquido', 'margem_liquida_pct': 'Margem %', 'variacao_margem_pct': 'Δ Margem (p.p.)'
+            })
+            st.dataframe(tabela.round(2), use_container_width=True, hide_index=True)
+    
+    def exibir_curva_frete(self, curva: pd.DataFrame, veiculos: list):
+        """Exibe a curva de custo por caixa embarcada x volume da frota de menor custo"""
+        with st.expander("📈 Curva de Frete por Volume", expanded=False):
+            st.line_chart(curva.set_index('volume')[['custo_por_caixa']])
+            st.caption("Custo real por caixa embarcada (frete total / caixas) da combinação de veículos "
+                       "mais barata para cada volume; Frete/Caixa da tabela = frete total / capacidade")
+            pontos = curva[curva['volume'] % 100 == 0]
+            st.dataframe(pontos[['volume', 'custo_total', 'custo_por_caixa', 'frete_por_caixa', 'ocupacao'] + veiculos],
+                         use_container_width=True, hide_index=True)
+    
     def exibir_detalhamento_calculo(self, df_final: pd.DataFrame, resultados: pd.DataFrame):
         """Exibe detalhamento do cálculo do primeiro produto"""
         if len(resultados) > 0:
@@ -625,6 +703,25 @@ class SimuladorLayout:
                 - **Margem: {primeiro['Margem Líquida %']:.1f}%**
                 """)
     
+    def exibir_opcao_matriz_uf(self) -> bool:
+        """Exibe a opção de comparar os produtos atuais em todas as UFs"""
+        return st.checkbox("🗺️ Comparar todas as UFs de destino", key="checkbox_matriz_uf")
+    
+    def exibir_matriz_uf(self, matriz: pd.DataFrame):
+        """Exibe o resumo por UF e o mapa produto × UF de um indicador"""
+        st.markdown("### 🗺️ Comparativo por UF de Destino")
+        if matriz.empty:
+            st.info("ℹ️ Nenhum produto da planilha encontrado para as UFs de destino.")
+            return
+        
+        indicador = st.selectbox(
+            "Indicador:",
+            ["Margem Líquida %", "Lucro Líquido", "Total NF", "ICMS-ST", "Ponto Equilíbrio"],
+            key="selectbox_indicador_matriz_uf"
+        )
+        st.dataframe(resumir_matriz_por_uf(matriz), use_container_width=True, hide_index=True)
+        st.dataframe(pivotar_matriz(matriz, indicador), use_container_width=True)
+    
     def exibir_secao_exportacao(self, df_final: pd.DataFrame, resultados: pd.DataFrame, df_display: pd.DataFrame):
         """Exibe seção de exportação"""
         uf_origem = self.state.get_simulacao('uf_origem', 'SP')
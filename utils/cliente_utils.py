@@ -0,0 +1,94 @@
+"""
+Utilitários de Clientes
+=======================
+Rótulos e busca rápida para a seleção de clientes na interface.
+"""
+
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+def normalizar_texto_busca(serie: pd.Series) -> pd.Series:
+    """Remove acentos e coloca em minúsculas para comparação na busca"""
+    # astype(object) antes do fillna: colunas category não aceitam '' como valor novo
+    texto = serie.astype(object).fillna('').astype(str).str.normalize('NFKD')
+    texto = texto.str.encode('ascii', errors='ignore').str.decode('ascii')
+    return texto.str.casefold().str.strip()
+
+
+def montar_rotulos_clientes(clientes_df: pd.DataFrame) -> pd.Series:
+    """Rótulo 'Nome - IBGE/UF - Código/Loja [- [Rede]]' de todos os clientes, sem iterrows"""
+    nome = clientes_df['A1_NOME'].astype(str)
+    rotulos = (
+        nome + ' - ' + clientes_df['cidade_ibge'].astype(str) + '/' + clientes_df['A1_EST'].astype(str)
+        + ' - ' + clientes_df['A1_COD'].astype(str) + '/' + clientes_df['A1_LOJA'].astype(str)
+    )
+    
+    # Rede só aparece quando difere do nome truncado (padrão da consulta de clientes)
+    rede = clientes_df['REDE']
+    rede_str = rede.astype(str)
+    exibir_rede = rede.notna() & (rede_str != '') & (rede_str != nome.str[:20])
+    return rotulos.where(~exibir_rede, rotulos + ' - [' + rede_str + ']')
+
+
+def assinatura_clientes(clientes_df: pd.DataFrame) -> int:
+    """Assinatura barata do DataFrame de clientes para invalidar o índice em cache"""
+    colunas = [c for c in IndiceClientes.COLUNAS_ROTULO if c in clientes_df.columns]
+    hashes = pd.util.hash_pandas_object(clientes_df[colunas], index=False)
+    return hash((len(clientes_df), int(hashes.sum())))
+
+
+class IndiceClientes:
+    """Rótulos pré-calculados, mapa rótulo -> posição e busca por nome, código, rede e cidade"""
+    
+    COLUNAS_ROTULO = ['A1_NOME', 'cidade_ibge', 'A1_EST', 'A1_COD', 'A1_LOJA', 'REDE']
+    COLUNAS_BUSCA = ['A1_NOME', 'A1_COD', 'REDE', 'A1_MUN']
+    
+    def __init__(self, clientes_df: pd.DataFrame):
+        self.assinatura = assinatura_clientes(clientes_df)
+        self.rotulos: List[str] = montar_rotulos_clientes(clientes_df).tolist()
+        
+        # Rótulos repetidos apontam para a primeira ocorrência, como list.index
+        self.posicoes: Dict[str, int] = {}
+        for posicao, rotulo in enumerate(self.rotulos):
+            self.posicoes.setdefault(rotulo, posicao)
+        
+        self._campos_busca = [
+            normalizar_texto_busca(clientes_df[coluna]).reset_index(drop=True)
+            for coluna in self.COLUNAS_BUSCA if coluna in clientes_df.columns
+        ]
+    
+    def __len__(self) -> int:
+        return len(self.rotulos)
+    
+    def posicao(self, rotulo: str) -> Optional[int]:
+        """Posição (iloc) do cliente correspondente ao rótulo"""
+        return self.posicoes.get(rotulo)
+    
+    def buscar(self, termo: str, limite: int = 50) -> List[str]:
+        """Rótulos dos clientes que contêm o termo: primeiro os que começam com ele"""
+        termo = normalizar_texto_busca(pd.Series([termo])).iat[0]
+        if not termo:
+            return self.rotulos[:limite]
+        
+        prefixo = pd.Series(False, index=range(len(self.rotulos)))
+        contem = prefixo.copy()
+        for campo in self._campos_busca:
+            prefixo |= campo.str.startswith(termo)
+            contem |= campo.str.contains(termo, regex=False)
+        
+        posicoes = list(prefixo[prefixo].index[:limite])
+        if len(posicoes) < limite:
+            apenas_contem = contem & ~prefixo
+            posicoes += list(apenas_contem[apenas_contem].index[:limite - len(posicoes)])
+        return [self.rotulos[p] for p in posicoes]
+
+
+def obter_indice_clientes(clientes_df: pd.DataFrame, cache: dict, chave: str = 'indice_clientes') -> IndiceClientes:
+    """Reaproveita o índice guardado em `cache` (ex.: session_state) enquanto os clientes não mudarem"""
+    indice = cache.get(chave)
+    if indice is None or indice.assinatura != assinatura_clientes(clientes_df):
+        indice = IndiceClientes(clientes_df)
+        cache[chave] = indice
+    return indice
@@ -4,8 +4,9 @@ Utilitários de Dados
 Funções para manipulação e formatação de dados.
 """
 
+import numpy as np
 import pandas as pd
-from typing import Any
+from typing import Any, Dict, Iterable, Optional
 
 
 def arredondar_valor(valor: Any, decimais: int = 2) -> float:
@@ -112,10 +113,10 @@ def preparar_dados_para_exportacao(df_input: pd.DataFrame, resultados: pd.DataFr
     return df_export
 
 
-def extrair_faixas_km_ordenadas(df_clientes: pd.DataFrame) -> list:
-    """Extrai e ordena as faixas de KM disponíveis da base de clientes"""
+def extrair_faixas_km_ordenadas(df_fretes: pd.DataFrame) -> list:
+    """Extrai e ordena as faixas de KM disponíveis da tabela de fretes"""
     faixas = []
-    faixas_unicas = df_clientes['FAIXA_KM'].dropna().unique()
+    faixas_unicas = df_fretes['FAIXA_KM'].dropna().unique()
     
     for faixa in faixas_unicas:
         try:
@@ -139,4 +140,93 @@ def extrair_faixas_km_ordenadas(df_clientes: pd.DataFrame) -> list:
     
     # Ordenar por valor inicial
     faixas.sort(key=lambda x: x[0])
-    return faixas
\ No newline at end of file
+    return faixas
+
+
+# Colunas candidatas à compactação (ver compactar_clientes / compactar_tabela_frete)
+COLUNAS_CATEGORICAS_CLIENTES = ['A1_EST', 'REDE', 'A1_MUN', 'A1_BAIRRO', 'cidade_ibge', 'A1_RISCO']
+COLUNAS_COORDENADAS = ['latitude', 'longitude']
+COLUNAS_VALOR_CLIENTES = ['A1_LC', 'A1_MCOMPRA']
+COLUNAS_CATEGORICAS_FRETE = ['cidade_ibge', 'CIDADE', 'FAIXA_KM']
+COLUNAS_VALOR_FRETE = ['TBL_TRCK', 'TBL_CRRT']
+LIMITE_CARDINALIDADE_CATEGORIA = 0.5  # categoria só compensa se houver repetição suficiente
+
+
+def converter_categorias(df: pd.DataFrame, colunas: Iterable[str],
+                         limite: float = LIMITE_CARDINALIDADE_CATEGORIA) -> pd.DataFrame:
+    """Converte para category as colunas de texto com poucos valores distintos (in place)"""
+    for col in colunas:
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype) or df.empty:
+            continue
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        if df[col].nunique(dropna=True) <= limite * len(df):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def reduzir_float(serie: pd.Series) -> pd.Series:
+    """Converte para float32 somente se todos os valores sobreviverem à conversão"""
+    numerica = pd.to_numeric(serie, errors='coerce')
+    if numerica.notna().sum() != serie.notna().sum():
+        return serie
+    numerica = numerica.astype('float64')
+    reduzida = numerica.astype('float32')
+    if np.array_equal(reduzida.to_numpy(dtype='float64'), numerica.to_numpy(), equal_nan=True):
+        return reduzida
+    return numerica
+
+
+def compactar_clientes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduz a memória do DataFrame de clientes: remove colunas repetidas, usa category
+    nas colunas de baixa cardinalidade e tipos numéricos nas coordenadas e valores.
+    """
+    df = df.loc[:, ~df.columns.duplicated()].copy()
+    converter_categorias(df, COLUNAS_CATEGORICAS_CLIENTES)
+    
+    # Coordenadas ficam em float64: float32 desloca até ~0,5 m e muda as chaves de rota em cache
+    for col in COLUNAS_COORDENADAS:
+        if col in df.columns and not pd.api.types.is_float_dtype(df[col]):
+            try:
+                # astype usa o parse exato do Python (to_numeric pode errar no último dígito)
+                df[col] = df[col].astype('float64')
+            except (ValueError, TypeError):
+                pass
+    
+    for col in COLUNAS_VALOR_CLIENTES:
+        if col in df.columns:
+            df[col] = reduzir_float(df[col])
+    return df
+
+
+def compactar_tabela_frete(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduz a memória da tabela de fretes (IBGE, cidade e faixa como category; tarifas em float32 se exato)"""
+    df = df.loc[:, ~df.columns.duplicated()].copy()
+    converter_categorias(df, COLUNAS_CATEGORICAS_FRETE)
+    for col in COLUNAS_VALOR_FRETE:
+        if col in df.columns:
+            df[col] = reduzir_float(df[col])
+    return df
+
+
+def relatorio_memoria(antes: pd.DataFrame, depois: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Memória (bytes, contando o conteúdo das strings) por coluna e total, antes e depois da compactação"""
+    relatorio: Dict[str, Any] = {'linhas': len(antes), 'colunas': {}}
+    
+    for etapa, df in (('antes', antes), ('depois', depois)):
+        if df is None:
+            continue
+        bytes_colunas = df.memory_usage(deep=True, index=False)
+        relatorio[f'total_{etapa}'] = int(bytes_colunas.sum())
+        # Colunas repetidas (ex.: A1_END duas vezes) somam na mesma entrada
+        for col, valor, tipo in zip(df.columns, bytes_colunas.to_numpy(), df.dtypes):
+            info = relatorio['colunas'].setdefault(str(col), {})
+            info[etapa] = info.get(etapa, 0) + int(valor)
+            info[f'tipo_{etapa}'] = str(tipo)
+    
+    if depois is not None:
+        relatorio['reducao_percentual'] = (
+            100.0 * (1 - relatorio['total_depois'] / relatorio['total_antes']) if relatorio['total_antes'] else 0.0
+        )
+    return relatorio
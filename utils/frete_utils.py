@@ -5,8 +5,13 @@ Funções para cálculo e otimização de frete.
 """
 
 import math
+from bisect import bisect_left
+from typing import Dict, Tuple, Union
+
+import numpy as np
 import pandas as pd
-import streamlit as st
+
+from config.veiculos import ConfiguracaoVeiculos
 
 
 def extrair_distancia_da_faixa(faixa: str) -> float:
@@ -59,102 +64,182 @@ def obter_faixa_km_exata(distancia_km: float, faixas: list) -> str:
     return 'Indefinida'
 
 
-def buscar_frete_por_faixa(df_clientes: pd.DataFrame, cidade_ibge: str, faixa_km: str, tipo_veiculo='truck') -> tuple:
+def atribuir_faixas_km(distancias_km: pd.Series, faixas: list) -> pd.Series:
+    """Aplica obter_faixa_km_exata a uma série de distâncias (NaN -> 'Indefinida')"""
+    distancias = pd.to_numeric(distancias_km, errors='coerce')
+    faixas_por_distancia = {
+        distancia: obter_faixa_km_exata(distancia, faixas)
+        for distancia in distancias.dropna().unique()
+    }
+    return distancias.map(faixas_por_distancia).fillna('Indefinida')
+
+
+class FreightTariffIndex:
+    """
+    Índice pré-calculado da tabela de fretes (TRANSP_TARGET).
+
+    Construído uma única vez a partir do DataFrame com cidade_ibge, FAIXA_KM,
+    TBL_TRCK e TBL_CRRT, substitui as varreduras completas do DataFrame por
+    consultas em dicionário e busca binária nos pontos médios das faixas.
+    Reproduz as mesmas regras (exata, aproximada, primeira disponível e
+    regional) e os mesmos textos de método de buscar_frete_por_faixa.
+    """
+
+    COLUNAS_VEICULO = {'truck': 'TBL_TRCK', 'carreta': 'TBL_CRRT'}
+
+    def __init__(self, df_fretes: pd.DataFrame):
+        # (ibge, faixa) -> {'truck': valor, 'carreta': valor} da primeira linha
+        self._exatas: Dict[Tuple[str, str], Dict[str, float]] = {}
+        # ibge -> pontos médios ordenados e dados da primeira linha de cada ponto
+        self._faixas_por_ibge: Dict[str, dict] = {}
+        # (ibge, tipo) -> (valor, faixa) da primeira linha com valor preenchido
+        self._primeira_disponivel: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        # (prefixo, tipo) -> mediana regional
+        self._medianas_regionais: Dict[Tuple[str, str], float] = {}
+        self._ibges = set()
+
+        if df_fretes is None or df_fretes.empty or 'cidade_ibge' not in df_fretes.columns:
+            return
+
+        df = pd.DataFrame({
+            'cidade_ibge': df_fretes['cidade_ibge'],
+            'FAIXA_KM': df_fretes['FAIXA_KM'] if 'FAIXA_KM' in df_fretes.columns else np.nan,
+        })
+        for tipo, coluna in self.COLUNAS_VEICULO.items():
+            df[tipo] = (pd.to_numeric(df_fretes[coluna], errors='coerce')
+                        if coluna in df_fretes.columns else np.nan)
+        df = df[df['cidade_ibge'].notna()].reset_index(drop=True)
+        df['cidade_ibge'] = df['cidade_ibge'].astype(str)
+        self._ibges = set(df['cidade_ibge'])
+
+        self._indexar_exatas(df)
+        self._indexar_faixas(df)
+        self._indexar_primeira_disponivel(df)
+        self._indexar_regioes(df)
+
+    def _indexar_exatas(self, df: pd.DataFrame):
+        """Primeira linha de cada par (IBGE, faixa)"""
+        primeiras = df[df['FAIXA_KM'].notna()].drop_duplicates(['cidade_ibge', 'FAIXA_KM'], keep='first')
+        for ibge, faixa, truck, carreta in zip(primeiras['cidade_ibge'], primeiras['FAIXA_KM'],
+                                                primeiras['truck'], primeiras['carreta']):
+            self._exatas[(ibge, faixa)] = {'truck': truck, 'carreta': carreta}
+
+    def _indexar_faixas(self, df: pd.DataFrame):
+        """Pontos médios das faixas por IBGE, ordenados para busca binária"""
+        faixas_unicas = df['FAIXA_KM'].dropna().unique()
+        distancias = {faixa: extrair_distancia_da_faixa(faixa) for faixa in faixas_unicas}
+        distancia = pd.to_numeric(df['FAIXA_KM'].map(distancias), errors='coerce').astype(float)
+        df = df.assign(_ordem=np.arange(len(df)), _distancia=distancia)
+        df = df[np.isfinite(df['_distancia'])]
+
+        # Para pontos médios repetidos vale a primeira linha, como na varredura original
+        df = df.drop_duplicates(['cidade_ibge', '_distancia'], keep='first')
+        df = df.sort_values(['cidade_ibge', '_distancia'], kind='mergesort')
+
+        for ibge, grupo in df.groupby('cidade_ibge', sort=False):
+            self._faixas_por_ibge[ibge] = {
+                'distancias': grupo['_distancia'].tolist(),
+                'ordem': grupo['_ordem'].tolist(),
+                'faixas': grupo['FAIXA_KM'].tolist(),
+                'truck': grupo['truck'].tolist(),
+                'carreta': grupo['carreta'].tolist(),
+            }
+
+    def _indexar_primeira_disponivel(self, df: pd.DataFrame):
+        """Primeira linha com valor preenchido por IBGE e tipo de veículo"""
+        for tipo in self.COLUNAS_VEICULO:
+            primeiras = df[df[tipo].notna()].drop_duplicates('cidade_ibge', keep='first')
+            for ibge, valor, faixa in zip(primeiras['cidade_ibge'], primeiras[tipo], primeiras['FAIXA_KM']):
+                self._primeira_disponivel[(ibge, tipo)] = (float(valor), faixa)
+
+    def _indexar_regioes(self, df: pd.DataFrame):
+        """Mediana dos valores por prefixo de 4 dígitos do IBGE"""
+        df = df[df['cidade_ibge'].str.len() >= 4]
+        prefixos = df['cidade_ibge'].str[:4]
+        for tipo in self.COLUNAS_VEICULO:
+            medianas = df[tipo].groupby(prefixos).median().dropna()
+            for prefixo, mediana in medianas.items():
+                self._medianas_regionais[(prefixo, tipo)] = float(mediana)
+
+    def _faixa_mais_proxima(self, cidade_ibge: str, distancia_solicitada: float):
+        """Busca binária da faixa com ponto médio mais próximo (empate: primeira na tabela)"""
+        faixas = self._faixas_por_ibge.get(cidade_ibge)
+        if not faixas or not math.isfinite(distancia_solicitada):
+            return None
+
+        distancias = faixas['distancias']
+        posicao = bisect_left(distancias, distancia_solicitada)
+        candidatos = [i for i in (posicao - 1, posicao) if 0 <= i < len(distancias)]
+        melhor = min(
+            candidatos,
+            key=lambda i: (abs(distancia_solicitada - distancias[i]), faixas['ordem'][i])
+        )
+        return faixas, melhor
+
+    def buscar(self, cidade_ibge: str, faixa_km: str, tipo_veiculo: str = 'truck') -> tuple:
+        """Mesmo contrato de buscar_frete_por_faixa: (valor_frete, faixa_usada, metodo_usado)"""
+        if tipo_veiculo not in self.COLUNAS_VEICULO:
+            tipo_veiculo = None
+
+        # Primeira tentativa: busca exata por cidade_ibge e faixa
+        linha_exata = self._exatas.get((cidade_ibge, faixa_km))
+        if linha_exata is not None and tipo_veiculo:
+            valor = linha_exata[tipo_veiculo]
+            valor = 0.0 if pd.isna(valor) else valor
+            if valor > 0:
+                return float(valor), faixa_km, "exata"
+
+        # Segunda tentativa: faixa mais próxima do mesmo IBGE
+        if cidade_ibge in self._ibges:
+            distancia_solicitada = extrair_distancia_da_faixa(faixa_km)
+            if distancia_solicitada is not None:
+                encontrada = self._faixa_mais_proxima(cidade_ibge, distancia_solicitada)
+                if encontrada is not None and tipo_veiculo:
+                    faixas, i = encontrada
+                    valor = faixas[tipo_veiculo][i]
+                    valor = 0.0 if pd.isna(valor) else valor
+                    if valor > 0:
+                        return float(valor), faixas['faixas'][i], f"aproximada (IBGE {cidade_ibge})"
+
+            # Se não conseguiu calcular por proximidade, pegar qualquer valor do IBGE
+            if tipo_veiculo and (cidade_ibge, tipo_veiculo) in self._primeira_disponivel:
+                valor, faixa = self._primeira_disponivel[(cidade_ibge, tipo_veiculo)]
+                return valor, faixa, f"IBGE {cidade_ibge} (primeira disponível)"
+
+        # Terceira tentativa: buscar por região (primeiros dígitos do IBGE)
+        if len(cidade_ibge) >= 4 and tipo_veiculo:
+            prefixo_ibge = cidade_ibge[:4]
+            mediana = self._medianas_regionais.get((prefixo_ibge, tipo_veiculo))
+            if mediana is not None:
+                return mediana, "regional", f"regional ({prefixo_ibge}*)"
+
+        # Se nada funcionou, retorna 0
+        return 0.0, "não encontrada", "não encontrado"
+
+
+def _como_indice(tabela_fretes: Union[pd.DataFrame, 'FreightTariffIndex']) -> FreightTariffIndex:
+    """Aceita o índice pronto ou constrói um a partir do DataFrame"""
+    if isinstance(tabela_fretes, FreightTariffIndex):
+        return tabela_fretes
+    return FreightTariffIndex(tabela_fretes)
+
+
+def buscar_frete_por_faixa(df_clientes: Union[pd.DataFrame, FreightTariffIndex], cidade_ibge: str,
+                           faixa_km: str, tipo_veiculo='truck') -> tuple:
     """
     Busca o valor do frete de forma inteligente:
     1. Primeiro: busca exata por IBGE + faixa
     2. Segundo: busca por IBGE e calcula pela faixa mais próxima
     3. Retorna: (valor_frete, faixa_usada, metodo_usado)
+
+    Aceita um FreightTariffIndex já construído (O(log n) por consulta) ou o
+    DataFrame de fretes, caso em que o índice é montado para a consulta.
     """
-    
-    # Primeira tentativa: busca exata por cidade_ibge e faixa
-    linha_exata = df_clientes[
-        (df_clientes['cidade_ibge'] == cidade_ibge) &
-        (df_clientes['FAIXA_KM'] == faixa_km)
-    ]
-    
-    if not linha_exata.empty:
-        # Encontrou correspondência exata
-        if tipo_veiculo == 'truck':
-            valor = linha_exata.iloc[0]['TBL_TRCK'] if not pd.isna(linha_exata.iloc[0]['TBL_TRCK']) else 0.0
-        elif tipo_veiculo == 'carreta':
-            valor = linha_exata.iloc[0]['TBL_CRRT'] if 'TBL_CRRT' in linha_exata.columns and not pd.isna(linha_exata.iloc[0]['TBL_CRRT']) else 0.0
-        else:
-            valor = 0.0
-        
-        if valor > 0:
-            return float(valor), faixa_km, "exata"
-    
-    # Segunda tentativa: buscar por IBGE e calcular pela faixa mais próxima
-    linhas_ibge = df_clientes[df_clientes['cidade_ibge'] == cidade_ibge]
-    
-    if not linhas_ibge.empty:
-        # Extrair distância da faixa solicitada para comparação
-        distancia_solicitada = extrair_distancia_da_faixa(faixa_km)
-        
-        if distancia_solicitada is not None:
-            # Encontrar a faixa mais próxima disponível para este IBGE
-            melhor_faixa = None
-            menor_diferenca = float('inf')
-            melhor_linha = None
-            
-            for _, linha in linhas_ibge.iterrows():
-                faixa_disponivel = linha['FAIXA_KM']
-                distancia_disponivel = extrair_distancia_da_faixa(faixa_disponivel)
-                
-                if distancia_disponivel is not None:
-                    diferenca = abs(distancia_solicitada - distancia_disponivel)
-                    if diferenca < menor_diferenca:
-                        menor_diferenca = diferenca
-                        melhor_faixa = faixa_disponivel
-                        melhor_linha = linha
-            
-            # Se encontrou uma faixa próxima, calcular o valor
-            if melhor_linha is not None:
-                if tipo_veiculo == 'truck':
-                    valor = melhor_linha['TBL_TRCK'] if not pd.isna(melhor_linha['TBL_TRCK']) else 0.0
-                elif tipo_veiculo == 'carreta':
-                    valor = melhor_linha['TBL_CRRT'] if 'TBL_CRRT' in melhor_linha and not pd.isna(melhor_linha['TBL_CRRT']) else 0.0
-                else:
-                    valor = 0.0
-                
-                if valor > 0:
-                    return float(valor), melhor_faixa, f"aproximada (IBGE {cidade_ibge})"
-        
-        # Se não conseguiu calcular por proximidade, pegar qualquer valor do IBGE
-        if tipo_veiculo == 'truck':
-            valores_validos = linhas_ibge['TBL_TRCK'].dropna()
-            if not valores_validos.empty:
-                primeira_linha = linhas_ibge[linhas_ibge['TBL_TRCK'].notna()].iloc[0]
-                return float(valores_validos.iloc[0]), primeira_linha['FAIXA_KM'], f"IBGE {cidade_ibge} (primeira disponível)"
-        elif tipo_veiculo == 'carreta':
-            if 'TBL_CRRT' in linhas_ibge.columns:
-                valores_validos = linhas_ibge['TBL_CRRT'].dropna()
-                if not valores_validos.empty:
-                    primeira_linha = linhas_ibge[linhas_ibge['TBL_CRRT'].notna()].iloc[0]
-                    return float(valores_validos.iloc[0]), primeira_linha['FAIXA_KM'], f"IBGE {cidade_ibge} (primeira disponível)"
-    
-    # Terceira tentativa: buscar por região (primeiros dígitos do IBGE)
-    if len(cidade_ibge) >= 4:
-        prefixo_ibge = cidade_ibge[:4]
-        linhas_similar = df_clientes[df_clientes['cidade_ibge'].str.startswith(prefixo_ibge)]
-        
-        if not linhas_similar.empty:
-            if tipo_veiculo == 'truck':
-                valores_validos = linhas_similar['TBL_TRCK'].dropna()
-                if not valores_validos.empty:
-                    return float(valores_validos.median()), "regional", f"regional ({prefixo_ibge}*)"
-            elif tipo_veiculo == 'carreta':
-                if 'TBL_CRRT' in linhas_similar.columns:
-                    valores_validos = linhas_similar['TBL_CRRT'].dropna()
-                    if not valores_validos.empty:
-                        return float(valores_validos.median()), "regional", f"regional ({prefixo_ibge}*)"
-    
-    # Se nada funcionou, retorna 0
-    return 0.0, "não encontrada", "não encontrado"
+    return _como_indice(df_clientes).buscar(cidade_ibge, faixa_km, tipo_veiculo)
 
 
-def buscar_frete_inteligente(df_clientes: pd.DataFrame, cidade_ibge: str, faixa_km: str) -> dict:
+def buscar_frete_inteligente(df_clientes: Union[pd.DataFrame, FreightTariffIndex], cidade_ibge: str,
+                             faixa_km: str) -> dict:
     """
     Busca valores de frete de forma inteligente para otimização de veículo
     Retorna: {
@@ -166,12 +251,13 @@ def buscar_frete_inteligente(df_clientes: pd.DataFrame, cidade_ibge: str, faixa_
     resultado = {
         'truck': {'valor': 0.0, 'faixa_usada': 'não encontrada', 'metodo': 'não encontrado'},
         'carreta': {'valor': 0.0, 'faixa_usada': 'não encontrada', 'metodo': 'não encontrado'},
-        'capacidades': {'truck': 870, 'carreta': 1740}  # Capacidades médias da tabela
+        'capacidades': ConfiguracaoVeiculos.capacidades_caixas()
     }
     
-    # Buscar ambos os tipos
+    # Buscar ambos os tipos no mesmo índice
+    indice = _como_indice(df_clientes)
     for tipo_veiculo in ['truck', 'carreta']:
-        valor, faixa_usada, metodo = buscar_frete_por_faixa(df_clientes, cidade_ibge, faixa_km, tipo_veiculo)
+        valor, faixa_usada, metodo = indice.buscar(cidade_ibge, faixa_km, tipo_veiculo)
         resultado[tipo_veiculo] = {
             'valor': valor,
             'faixa_usada': faixa_usada,